@@ -0,0 +1,297 @@
+import pipeline_management as pm
+from fake_gstd import FakeGstdServer
+
+import os
+import sys
+import json
+import time
+import shutil
+import getopt
+import datetime
+import tempfile
+import contextlib
+import multiprocessing
+from traceback import print_exc
+
+# phases of an IngestSession life cycle that are timed, in the order they are run
+BENCHMARK_PHASES = ('init', 'construct', 'start_cameras', 'start_buffers', 'start_recording', 'image_snapshot',
+                    'video_snapshot', 'shutdown')
+# video snapshot duration used during benchmark (minimum allowed); subtracted from the phase time
+BENCHMARK_VIDEO_SNAP_DURATION = 5
+
+
+class TimedClient:
+    """
+    Wraps a GstdClient so that the round-trip latency of every command is recorded. Records are put on a
+        multiprocessing queue so that commands issued from snapshot jobs and detached processes are also captured.
+    """
+    def __init__(self, client, record_queue):
+        """
+        :param client: GstdClient (or compatible) connection to wrap
+        :param record_queue: multiprocessing.Queue to receive (phase, command, seconds) records
+        :return: None
+        """
+        self._client = client
+        self._record_queue = record_queue
+        self.phase = None
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def timed_command(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._record_queue.put((self.phase, name, time.perf_counter() - t0))
+        return timed_command
+
+
+def write_benchmark_config(config_file, num_cameras, workers):
+    """
+    Writes a session configuration with synthetic cameras, all features enabled, and one __WORKER__ block per fake
+        GStreamer Daemon. Camera addresses are never contacted, since the fake daemon does not stream.
+    :param config_file: file to write
+    :param num_cameras: number of synthetic cameras
+    :param workers: list of (address, port) of the fake daemons
+    :return: None
+    """
+    with open(config_file, 'w') as f:
+        for i in range(num_cameras):
+            f.write("__CAMERA__\n")
+            f.write("name==bench{:03d}\n".format(i))
+            f.write("rtsp_authentication==user:password\n")
+            f.write("rtsp_address==10.0.{}.{}/axis-media/media.amp\n".format(i // 250, i % 250 + 1))
+        f.write("__IMAGE-SNAPSHOT__\nenable==true\n")
+        f.write("__VIDEO-SNAPSHOT__\nenable==true\nbuffer_time==60\n")
+        f.write("__PERSISTENT-RECORDING__\nenable==true\n")
+        f.write("recording_filename==./recording/record_{cam_name}_%05d.mp4\n")
+        for i, (address, port) in enumerate(workers):
+            f.write("__WORKER__\n")
+            f.write("name==fake{}\naddress=={}\nport=={}\nlaunch==false\n".format(i, address, port))
+
+
+def _percentile(sorted_values, pct):
+    # nearest-rank percentile of an already-sorted list
+    if len(sorted_values) == 0:
+        return None
+    rank = max(1, int(round(pct / 100. * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(records):
+    """
+    Summarizes command latency records by command and by phase.
+    :param records: list of (phase, command, seconds)
+    :return: dictionary of {command: {'count', 'mean', 'p50', 'p95', 'max'}}, dictionary of {phase: command count}
+    """
+    by_command = {}
+    phase_counts = {}
+    for phase, command, seconds in records:
+        by_command.setdefault(command, []).append(seconds)
+        phase_counts[phase] = phase_counts.get(phase, 0) + 1
+    summary = {}
+    for command, values in sorted(by_command.items()):
+        values.sort()
+        summary[command] = {'count': len(values), 'mean': sum(values) / len(values),
+                            'p50': _percentile(values, 50), 'p95': _percentile(values, 95), 'max': values[-1]}
+    return summary, phase_counts
+
+
+def run_session_benchmark(num_cameras, servers, root_directory, verbose=False):
+    """
+    Runs one full IngestSession life cycle against the fake daemons and times each phase.
+    :param num_cameras: number of synthetic cameras
+    :param servers: list of running FakeGstdServer
+    :param root_directory: session root directory for this run
+    :param verbose: T/F show the session's log output on stderr
+    :return: dictionary with phase times (seconds) and command latency summary
+    """
+    config_file = os.path.join(root_directory, 'benchmark_{}.config'.format(num_cameras))
+    write_benchmark_config(config_file, num_cameras, [(srv.address, srv.port) for srv in servers])
+    for srv in servers:
+        srv.pipelines = {}
+        srv.reset_log()
+    record_queue = multiprocessing.Queue(-1)
+    phases = {}
+    timed_clients = []
+
+    def set_phase(phase):
+        for tc in timed_clients:
+            tc.phase = phase
+
+    stderr_target = sys.stderr if verbose else open(os.devnull, 'w')
+    session = None
+    try:
+        with contextlib.redirect_stderr(stderr_target):
+            t0 = time.perf_counter()
+            session = pm.IngestSession(session_root_directory=root_directory, session_config_file=config_file)
+            phases['init'] = time.perf_counter() - t0
+            # wrap the worker clients before any pipelines are created, so every pipeline command is timed
+            for worker_name in list(session.clients.keys()):
+                tc = TimedClient(session.clients[worker_name], record_queue)
+                session.clients[worker_name] = tc
+                timed_clients.append(tc)
+
+            steps = (('construct', session.construct_pipelines),
+                     ('start_cameras', session.start_cameras),
+                     ('start_buffers', session.start_buffers),
+                     ('start_recording', session.start_persistent_recording_all_cameras),
+                     ('image_snapshot', lambda: session.take_image_snapshot(
+                         cameras='all', file_relative_location='./benchmark/imgsnap_{cam_name}.jpg', join=True)),
+                     ('video_snapshot', lambda: session.take_video_snapshot(
+                         duration=BENCHMARK_VIDEO_SNAP_DURATION,
+                         file_relative_location='./benchmark/vidsnap.mp4', join=True)))
+            for phase, step in steps:
+                set_phase(phase)
+                t0 = time.perf_counter()
+                step()
+                phases[phase] = time.perf_counter() - t0
+            phases['video_snapshot'] -= BENCHMARK_VIDEO_SNAP_DURATION
+
+            set_phase('shutdown')
+            t0 = time.perf_counter()
+            session.stop_persistent_recording_all_cameras()
+            session.stop_all_pipelines()
+            session.deconstruct_all_pipelines()
+            session.kill_gstd()
+            phases['shutdown'] = time.perf_counter() - t0
+    finally:
+        if session is not None:
+            session.stop_all_processes()
+            session.handler.pop_application()
+        if stderr_target is not sys.stderr:
+            stderr_target.close()
+
+    # collect latency records, including those sent from snapshot jobs and detached processes
+    records = []
+    while True:
+        try:
+            records.append(record_queue.get(timeout=0.2))
+        except Exception:
+            break
+    commands, phase_counts = summarize_latencies(records)
+    return {'cameras': num_cameras, 'phases': phases, 'phase_command_counts': phase_counts, 'commands': commands,
+            'server_commands': [srv.command_stats() for srv in servers]}
+
+
+def compare_to_baseline(report, baseline, tolerance, min_delta):
+    """
+    Compares phase times against a previous benchmark report for matching camera counts.
+    :param report: current benchmark report
+    :param baseline: previous benchmark report
+    :param tolerance: allowed fractional increase in phase time (e.g., 0.25 = 25%)
+    :param min_delta: increases smaller than this many seconds are never flagged (timing noise on short phases)
+    :return: list of (cameras, phase, baseline seconds, current seconds) that regressed
+    """
+    baseline_runs = {run['cameras']: run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in report['runs']:
+        base = baseline_runs.get(run['cameras'])
+        if base is None:
+            continue
+        for phase, seconds in run['phases'].items():
+            base_seconds = base['phases'].get(phase)
+            if base_seconds is None:
+                continue
+            if seconds > base_seconds * (1 + tolerance) and seconds - base_seconds > min_delta:
+                regressions.append((run['cameras'], phase, base_seconds, seconds))
+    return regressions
+
+
+def main(argv):
+    usage = """
+    benchmark_session.py [-h] [-c <camera-counts>] [-w <num-workers>] [-l <command-latency>] [-o <output-file>]
+                         [-b <baseline-file>] [-t <tolerance>] [--keep_waits] [--verbose]
+    -h/--help: print usage information, then exit
+    -c/--cameras= 1,10,50,100 : comma-delineated camera counts to benchmark (default 1,10,50,100)
+    -w/--workers= : number of fake GStreamer Daemons to partition cameras across (default 1)
+    -l/--command_latency= : simulated daemon processing time per command, in seconds (default 0)
+    -o/--output= : JSON file to write benchmark report (default benchmark_<datetime>.json)
+    -b/--baseline= : previous JSON report to compare against; exit code 1 if any phase regressed
+    -t/--tolerance= : allowed fractional increase of phase time relative to baseline (default 0.25)
+    --min_delta= : phase time increases below this many seconds are not regressions (default 0.05)
+    --keep_waits: keep the fixed settle times (CAMERA_START_WAIT, etc.) instead of zeroing them
+    --verbose: show the session log output
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'hc:w:l:o:b:t:', ['help', 'cameras=', 'workers=', 'command_latency=',
+                                                          'output=', 'baseline=', 'tolerance=', 'min_delta=',
+                                                          'keep_waits', 'verbose'])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    camera_counts = [1, 10, 50, 100]
+    num_workers = 1
+    command_latency = 0.0
+    output_file = 'benchmark_{}.json'.format(datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+    baseline_file = None
+    tolerance = 0.25
+    min_delta = 0.05
+    keep_waits = False
+    verbose = False
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-c', '--cameras'):
+            camera_counts = [int(c) for c in arg.split(',')]
+        elif opt in ('-w', '--workers'):
+            num_workers = int(arg)
+        elif opt in ('-l', '--command_latency'):
+            command_latency = float(arg)
+        elif opt in ('-o', '--output'):
+            output_file = arg
+        elif opt in ('-b', '--baseline'):
+            baseline_file = arg
+        elif opt in ('-t', '--tolerance'):
+            tolerance = float(arg)
+        elif opt == '--min_delta':
+            min_delta = float(arg)
+        elif opt == '--keep_waits':
+            keep_waits = True
+        elif opt == '--verbose':
+            verbose = True
+
+    if keep_waits is False:
+        # measure control-path cost only; fixed settle times would otherwise dominate every phase
+        for wait in ('CAMERA_START_WAIT', 'BUFFER_START_WAIT', 'RECORDING_START_WAIT', 'IMAGE_ENCODE_SPIN_UP',
+                     'IMAGE_SNAP_EXECUTE_TIME'):
+            setattr(pm, wait, 0)
+
+    servers = [FakeGstdServer(command_latency=command_latency).start() for _ in range(num_workers)]
+    root_directory = tempfile.mkdtemp(prefix='ingest_benchmark_')
+    report = {'datetime': datetime.datetime.now().isoformat(), 'workers': num_workers,
+              'command_latency': command_latency, 'keep_waits': keep_waits, 'runs': []}
+    try:
+        for num_cameras in camera_counts:
+            print("Benchmarking {} cameras on {} worker(s)...".format(num_cameras, num_workers))
+            run = run_session_benchmark(num_cameras, servers, root_directory, verbose=verbose)
+            report['runs'].append(run)
+            print("  " + ", ".join(["{}={:.3f}s".format(phase, run['phases'][phase])
+                                    for phase in BENCHMARK_PHASES if phase in run['phases']]))
+    finally:
+        for srv in servers:
+            srv.stop()
+        shutil.rmtree(root_directory, ignore_errors=True)
+
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Benchmark report written to {}.".format(output_file))
+
+    if baseline_file is not None:
+        with open(baseline_file, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, tolerance, min_delta)
+        if len(regressions) > 0:
+            for cameras, phase, base_seconds, seconds in regressions:
+                print("REGRESSION: {} cameras, {}: {:.3f}s -> {:.3f}s".format(cameras, phase, base_seconds, seconds))
+            sys.exit(1)
+        print("No regressions relative to {} (tolerance {:.0%}).".format(baseline_file, tolerance))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,388 @@
+import os
+import sys
+import json
+import time
+import getopt
+import datetime
+import tempfile
+import subprocess
+import tracemalloc
+from traceback import print_exc
+
+import cv2
+import numpy as np
+
+import utilities
+from parameters import *
+
+# synthetic timestamps start here and advance at the nominal camera frame rate
+SYNTHETIC_START_TIMESTAMP = 1600000000.00
+SYNTHETIC_FRAME_RATE = 29.97
+# frame size used for the synthetic full-frame path (4K, as recorded) and synthetic encoded clip (smaller for speed)
+SYNTHETIC_FRAME_SHAPE = (2160, 3840)
+SYNTHETIC_CLIP_SHAPE = (360, 640)
+
+
+def synthetic_timestamps(num_frames, start=SYNTHETIC_START_TIMESTAMP, frame_rate=SYNTHETIC_FRAME_RATE):
+    """
+    Ground-truth timestamps at the camera's 0.01 second precision.
+    :param num_frames: number of frames
+    :param start: first timestamp
+    :param frame_rate: nominal frame rate
+    :return: numpy array of timestamps
+    """
+    hundredths = np.round(start * 100 + np.arange(num_frames) * 100 / frame_rate).astype(np.int64)
+    return hundredths / 100.
+
+
+def render_timestamp_strip(timestamp, timestamp_geometry, digit_pixels, noise=0.0, rng=None):
+    """
+    Renders the timestamp overlay area for one frame from the stored digit masks, in the geometry of the 4K overlay.
+    :param timestamp: UNIX timestamp with 0.01 second precision
+    :param timestamp_geometry: dictionary of timestamp geometry (utilities.get_timestamp_geometry)
+    :param digit_pixels: dictionary of {digit: h x w mask} (utilities.get_timestamp_digit_pixels)
+    :param noise: standard deviation of Gaussian pixel noise added to the strip (0 = clean)
+    :param rng: numpy random Generator used for noise
+    :return: h x (n*w) x 3 BGR strip (uint8)
+    """
+    g = timestamp_geometry
+    w, h, n = g['w'], g['h'], g['n']
+    text = '{:013.2f}'.format(timestamp)
+    strip = np.zeros((h, n * w), dtype=np.uint8)
+    for j, ch in enumerate(text[:n]):
+        if ch == '.':
+            # decimal point cell is ignored by the parser; draw a dot so the strip looks like the overlay
+            strip[h - 3:h - 1, j * w + w // 2 - 1:j * w + w // 2 + 1] = 255
+        else:
+            strip[:, j * w:(j + 1) * w] = np.asarray(digit_pixels[int(ch)], dtype=np.uint8)
+    strip = np.repeat(strip[:, :, None], 3, axis=2)
+    if noise > 0:
+        if rng is None:
+            rng = np.random.default_rng(0)
+        strip = np.clip(strip.astype(np.float32) + rng.normal(0, noise, strip.shape), 0, 255).astype(np.uint8)
+    return strip
+
+
+def render_timestamp_strips(timestamps, timestamp_geometry, digit_pixels, noise=0.0, seed=0):
+    """
+    Renders a stack of timestamp strips (N x h x (n*w) x 3) for the given timestamps.
+    """
+    rng = np.random.default_rng(seed)
+    return np.stack([render_timestamp_strip(ts, timestamp_geometry, digit_pixels, noise, rng)
+                     for ts in timestamps])
+
+
+def place_strip(frame, strip, timestamp_geometry):
+    """
+    Writes a timestamp strip into a full frame at the overlay position (in place).
+    :return: frame
+    """
+    y1, y2 = timestamp_geometry['y0'], timestamp_geometry['y0'] + timestamp_geometry['h']
+    x1 = timestamp_geometry['x0']
+    frame[y1:y2, x1:x1 + strip.shape[1], :] = strip
+    return frame
+
+
+def write_synthetic_clip(file_path, strips, timestamp_geometry, frame_shape=SYNTHETIC_CLIP_SHAPE,
+                         frame_rate=SYNTHETIC_FRAME_RATE):
+    """
+    Encodes a short MP4 clip (MPEG-4 Part 2 via OpenCV) whose frames carry the given timestamp strips.
+    :return: True if the clip was written
+    """
+    writer = cv2.VideoWriter(file_path, cv2.VideoWriter_fourcc(*'mp4v'), frame_rate,
+                             (frame_shape[1], frame_shape[0]))
+    if not writer.isOpened():
+        return False
+    frame = np.full(frame_shape + (3,), 64, dtype=np.uint8)
+    for strip in strips:
+        writer.write(place_strip(frame, strip, timestamp_geometry))
+    writer.release()
+    return True
+
+
+def read_clip_frames(file_path, max_frames=None):
+    """
+    Decodes frames of a video file into a list of BGR arrays.
+    """
+    cap = cv2.VideoCapture(file_path)
+    frames = []
+    while cap.isOpened() and (max_frames is None or len(frames) < max_frames):
+        ret, frame = cap.read()
+        if frame is None:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def _accuracy(decoded, truth):
+    decoded = np.asarray(decoded, dtype=np.float64)
+    if truth is None:
+        return None
+    return float(np.mean(np.isclose(decoded, truth, rtol=0, atol=0.001)))
+
+
+def _measure(decode_function, num_frames, truth, repeat):
+    """
+    Times a decode function (best of `repeat`), then runs it once more under tracemalloc for peak allocation.
+    :param decode_function: callable returning an array/list of decoded timestamps (NaN/0 for failures)
+    :return: dictionary of results
+    """
+    best = None
+    decoded = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        decoded = decode_function()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    decode_function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    decoded = np.asarray(decoded, dtype=np.float64)
+    return {'frames': num_frames, 'seconds': best, 'fps': num_frames / best if best > 0 else None,
+            'peak_allocation_bytes': peak, 'failures': int(np.sum(~np.isfinite(decoded) | (decoded == 0))),
+            'accuracy': _accuracy(decoded, truth)}, decoded
+
+
+def benchmark_decoders(strips, truth, timestamp_geometry, checksums, batch_size, full_frames, repeat):
+    """
+    Benchmarks the single-frame (full frame and ROI), batched (ROI and full frame), and incremental (ROI) timestamp
+        decoders.
+    :param strips: stack of timestamp strips (N x h x (n*w) x 3)
+    :param truth: ground-truth timestamps (None if unknown; accuracy is then agreement with the single ROI path)
+    :param timestamp_geometry: dictionary of timestamp geometry
+    :param checksums: precomputed digit checksums
+    :param batch_size: frames per call of the batched decoder
+    :param full_frames: number of full (4K) frames used for the full-frame paths (held in memory at once)
+    :param repeat: timing repetitions (best is reported)
+    :return: dictionary of {path: results}
+    """
+    num = strips.shape[0]
+    results = {}
+
+    def single_roi():
+        out = []
+        for strip in strips:
+            ts, _ = utilities.parse_frame_timestamp(timestamp_geometry, checksums, timestamp_pixels=strip)
+            out.append(np.nan if ts is None else ts)
+        return out
+
+    def batch_roi():
+        out = []
+        for i in range(0, num, batch_size):
+            ts, _ = utilities.parse_frame_timestamps_batch(timestamp_geometry, checksums,
+                                                           timestamp_pixels=strips[i:i + batch_size])
+            out.append(ts)
+        return np.concatenate(out)
+
+    def incremental_roi():
+        decoder = utilities.TimestampDecoder(timestamp_geometry, checksums)
+        out = []
+        for strip in strips:
+            ts, _ = decoder.decode(timestamp_pixels=strip)
+            out.append(np.nan if ts is None else ts)
+        return out
+
+    results['single_roi'], reference = _measure(single_roi, num, truth, repeat)
+    if truth is None:
+        results['single_roi']['accuracy'] = None
+    results['batch_roi'], _ = _measure(batch_roi, num, truth if truth is not None else reference, repeat)
+    results['incremental_roi'], _ = _measure(incremental_roi, num, truth if truth is not None else reference, repeat)
+
+    # full frame paths run on a smaller set, since every 4K frame is ~25 MB
+    nfull = min(full_frames, num)
+    if nfull > 0:
+        frames = np.zeros((nfull,) + SYNTHETIC_FRAME_SHAPE + (3,), dtype=np.uint8)
+        for i in range(nfull):
+            place_strip(frames[i], strips[i], timestamp_geometry)
+        full_truth = truth[:nfull] if truth is not None else reference[:nfull]
+
+        def single_full():
+            out = []
+            for frame in frames:
+                ts, _ = utilities.parse_frame_timestamp(timestamp_geometry, checksums, frame_pixels=frame)
+                out.append(np.nan if ts is None else ts)
+            return out
+
+        def batch_full():
+            ts, _ = utilities.parse_frame_timestamps_batch(timestamp_geometry, checksums, frames=frames)
+            return ts
+
+        results['single_full'], _ = _measure(single_full, nfull, full_truth, repeat)
+        results['batch_full'], _ = _measure(batch_full, nfull, full_truth, repeat)
+        del frames
+    return results
+
+
+def _ffprobe(args, file_path):
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0"] + args + \
+          ["-of", "default=nokey=1:noprint_wrappers=1", file_path]
+    fcp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    return int(fcp.stdout.strip().split('\n')[0])
+
+
+def _cv2_property_count(file_path):
+    cap = cv2.VideoCapture(file_path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return count
+
+
+def _cv2_grab_count(file_path):
+    cap = cv2.VideoCapture(file_path)
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+# frame count methods, from container metadata (fast) to full decode (slow, but exact)
+FRAME_COUNT_METHODS = (
+    ('ffprobe_nb_frames', lambda fp: _ffprobe(["-show_entries", "stream=nb_frames"], fp)),
+    ('ffprobe_count_packets', lambda fp: _ffprobe(["-count_packets", "-show_entries", "stream=nb_read_packets"], fp)),
+    ('ffprobe_count_frames', lambda fp: _ffprobe(["-count_frames", "-show_entries", "stream=nb_read_frames"], fp)),
+    ('cv2_frame_count_property', _cv2_property_count),
+    ('cv2_grab', _cv2_grab_count),
+)
+
+
+def benchmark_frame_counts(file_paths, reference_counts=None):
+    """
+    Times each frame count method on each file. The reference count is the known frame count (synthetic clips), or
+        else the decoded count from `ffprobe -count_frames`, or else from cv2 grab.
+    :param file_paths: list of MP4 files
+    :param reference_counts: optional {file_path: known frame count}
+    :return: dictionary of {file_path: {method: {'count', 'seconds', 'matches_reference'} or {'error'}}}
+    """
+    results = {}
+    for fp in file_paths:
+        file_results = {}
+        for method, count_function in FRAME_COUNT_METHODS:
+            t0 = time.perf_counter()
+            try:
+                count = count_function(fp)
+            except FileNotFoundError:
+                file_results[method] = {'error': 'ffprobe not found'}
+                continue
+            except (ValueError, IndexError):
+                file_results[method] = {'error': 'invalid output'}
+                continue
+            file_results[method] = {'count': count, 'seconds': time.perf_counter() - t0}
+        reference = None if reference_counts is None else reference_counts.get(fp)
+        for method in ('ffprobe_count_frames', 'cv2_grab'):
+            if reference is None and 'count' in file_results[method]:
+                reference = file_results[method]['count']
+        for method_results in file_results.values():
+            if 'count' in method_results:
+                method_results['matches_reference'] = method_results['count'] == reference
+        results[fp] = {'reference_count': reference, 'methods': file_results}
+    return results
+
+
+def main(argv):
+    usage = """
+    benchmark_timestamps.py [-h] [-n <num-frames>] [-b <batch-size>] [-f <full-frames>] [-c <clip-files>] [-o <output>]
+    -h/--help: print usage information, then exit
+    -n/--num_frames= : number of synthetic timestamp strips to decode (default 3000)
+    -b/--batch_size= : frames per call for the batched decoder (default 256)
+    -f/--full_frames= : number of full 4K frames for the full-frame decoder paths (default 16)
+    -r/--repeat= : timing repetitions per path; best is reported (default 3)
+    --noise= : std. dev. of Gaussian pixel noise added to synthetic strips (default 0)
+    -c/--clips= : comma-delineated list of recorded MP4 segments to use in addition to a synthetic encoded clip;
+        decoder accuracy on these is agreement with the single-frame decoder, as there is no ground truth
+    -m/--max_clip_frames= : maximum frames decoded from each clip (default 900)
+    -o/--output= : JSON report file (default benchmark_timestamps_<datetime>.json)
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'hn:b:f:r:c:m:o:', ['help', 'num_frames=', 'batch_size=', 'full_frames=',
+                                                            'repeat=', 'noise=', 'clips=', 'max_clip_frames=',
+                                                            'output='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    num_frames = 3000
+    batch_size = 256
+    full_frames = 16
+    repeat = 3
+    noise = 0.0
+    clips = []
+    max_clip_frames = 900
+    output_file = 'benchmark_timestamps_{}.json'.format(datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-n', '--num_frames'):
+            num_frames = int(arg)
+        elif opt in ('-b', '--batch_size'):
+            batch_size = int(arg)
+        elif opt in ('-f', '--full_frames'):
+            full_frames = int(arg)
+        elif opt in ('-r', '--repeat'):
+            repeat = int(arg)
+        elif opt == '--noise':
+            noise = float(arg)
+        elif opt in ('-c', '--clips'):
+            clips = arg.split(',')
+        elif opt in ('-m', '--max_clip_frames'):
+            max_clip_frames = int(arg)
+        elif opt in ('-o', '--output'):
+            output_file = arg
+
+    geometry = utilities.get_timestamp_geometry()
+    checksums = utilities.get_precomputed_checksums()
+    digit_pixels = utilities.get_timestamp_digit_pixels()
+    report = {'datetime': datetime.datetime.now().isoformat(), 'num_frames': num_frames, 'batch_size': batch_size,
+              'full_frames': full_frames, 'repeat': repeat, 'noise': noise, 'opencv_version': cv2.__version__,
+              'numpy_version': np.__version__}
+
+    # synthetic strips, rendered directly from the digit masks
+    print("Decoding {} synthetic timestamp strips.".format(num_frames))
+    truth = synthetic_timestamps(num_frames)
+    strips = render_timestamp_strips(truth, geometry, digit_pixels, noise=noise)
+    report['synthetic'] = benchmark_decoders(strips, truth, geometry, checksums, batch_size, full_frames, repeat)
+
+    # synthetic encoded clip, so that decoding and frame counting go through a real container and codec
+    clip_dir = tempfile.mkdtemp(prefix='timestamp_benchmark_')
+    clip_file = os.path.join(clip_dir, 'record_synthetic_00000.mp4')
+    clip_frames = min(num_frames, max_clip_frames)
+    reference_counts = {}
+    if write_synthetic_clip(clip_file, strips[:clip_frames], geometry):
+        reference_counts[clip_file] = clip_frames
+        clips = [clip_file] + clips
+    else:
+        print("Could not write synthetic clip with OpenCV; skipping encoded clip.")
+
+    report['clips'] = {}
+    for fp in clips:
+        print("Decoding timestamps from {}.".format(fp))
+        frames = read_clip_frames(fp, max_frames=max_clip_frames)
+        if len(frames) == 0:
+            report['clips'][fp] = {'error': 'no frames decoded'}
+            continue
+        y1, y2, x1, x2 = utilities.get_timestamp_pixel_limits()
+        clip_strips = np.stack([frame[y1:y2, x1:x2, :] for frame in frames])
+        del frames
+        clip_truth = truth[:clip_strips.shape[0]] if fp in reference_counts else None
+        report['clips'][fp] = benchmark_decoders(clip_strips, clip_truth, geometry, checksums, batch_size,
+                                                 full_frames=0, repeat=repeat)
+
+    print("Timing frame count methods.")
+    report['frame_counts'] = benchmark_frame_counts(clips, reference_counts=reference_counts)
+    for fp in reference_counts:
+        os.remove(fp)
+    os.rmdir(clip_dir)
+
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    for path, res in report['synthetic'].items():
+        print("{:>15}: {:10.1f} fps, accuracy {:.4f}, peak alloc. {:.1f} MB".format(
+            path, res['fps'], res['accuracy'], res['peak_allocation_bytes'] / 1e6))
+    print("Benchmark report written to {}.".format(output_file))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import getopt
+import select
+import threading
+import socketserver
+from traceback import print_exc
+
+# GStreamer Daemon response codes used by the stand-in (subset of gstd's GstdReturnCode)
+GSTD_EOK = 0
+GSTD_BAD_COMMAND = 3
+GSTD_NO_RESOURCE = 4
+GSTD_EXISTING_NAME = 6
+GSTD_EVENT_ERROR = 18
+
+
+class _FakeGstdHandler(socketserver.BaseRequestHandler):
+    """
+    Handles one client connection to the stand-in daemon. pygstc sends one space-separated command per request and
+        waits for a JSON response terminated by a null byte.
+    """
+    def handle(self):
+        while True:
+            try:
+                data = self.request.recv(65536)
+                if not data:
+                    return
+                # long pipeline descriptions can arrive in more than one segment
+                while select.select([self.request], [], [], 0)[0]:
+                    more = self.request.recv(65536)
+                    if not more:
+                        break
+                    data += more
+            except OSError:
+                return
+            response = self.server.fake.execute(data.decode('utf-8'))
+            try:
+                self.request.sendall((json.dumps(response) + '\x00').encode('utf-8'))
+            except OSError:
+                return
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeGstdServer:
+    """
+    Local stand-in for GStreamer Daemon that speaks the pygstc TCP protocol, so that IngestSession control paths can
+        be exercised and timed without gstd, interpipe, or cameras. Pipelines, element properties, and EOS state are
+        tracked well enough for the session to run; nothing is actually streamed. Every command is recorded with its
+        arrival time and service time.
+    """
+    def __init__(self, address='127.0.0.1', port=0, command_latency=0.0, eos_latency=0.0):
+        """
+        :param address: address on which to listen
+        :param port: TCP port on which to listen (0 = pick a free port; see `self.port` after start)
+        :param command_latency: seconds of simulated processing time added to every command
+        :param eos_latency: seconds after an EOS event before the pipeline posts its EOS bus message (only playing
+            pipelines accept EOS, as with gstd)
+        :return: None
+        """
+        self.command_latency = command_latency
+        self.eos_latency = eos_latency
+        self.pipelines = {}             # {pipeline_name: {'description', 'state', 'properties', 'eos_time'}}
+        self.bus_timeouts = {}          # {pipeline_name: bus read timeout in seconds (None = block)}
+        self.command_log = []           # [(arrival time, command, service seconds), ...]
+        self._lock = threading.Lock()
+        self._server = _ThreadingTCPServer((address, port), _FakeGstdHandler)
+        self._server.fake = self
+        self.address, self.port = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_log(self):
+        with self._lock:
+            self.command_log = []
+
+    @staticmethod
+    def _response(code=GSTD_EOK, response=None, description=None):
+        descriptions = {GSTD_EOK: 'Success', GSTD_BAD_COMMAND: 'Bad command', GSTD_NO_RESOURCE: 'No resource',
+                        GSTD_EXISTING_NAME: 'Existing name', GSTD_EVENT_ERROR: 'Event error'}
+        if description is None:
+            description = descriptions.get(code, 'Error')
+        return {'code': code, 'description': description, 'response': response}
+
+    def execute(self, command_line):
+        """
+        Executes one protocol command against the stand-in state.
+        :param command_line: space-separated command string, as sent by pygstc
+        :return: response dictionary
+        """
+        t0 = time.time()
+        if self.command_latency > 0:
+            time.sleep(self.command_latency)
+        parts = command_line.strip().split(' ')
+        command, args = parts[0], parts[1:]
+        try:
+            response = self._dispatch(command, args)
+        except (IndexError, ValueError):
+            response = self._response(GSTD_BAD_COMMAND)
+        with self._lock:
+            self.command_log.append((t0, command, time.time() - t0))
+        return response
+
+    def _dispatch(self, command, args):
+        if command == 'pipeline_create':
+            name = args[0]
+            with self._lock:
+                if name in self.pipelines:
+                    return self._response(GSTD_EXISTING_NAME)
+                self.pipelines[name] = {'description': ' '.join(args[1:]), 'state': 'null', 'properties': {},
+                                        'eos_time': None}
+            return self._response()
+        if command in ('list_pipelines', 'debug_enable', 'debug_threshold', 'debug_color', 'debug_reset'):
+            if command == 'list_pipelines':
+                return self._response(response={'nodes': [{'name': name} for name in self.pipelines]})
+            return self._response()
+        # everything else refers to an existing pipeline
+        name = args[0]
+        pipeline = self.pipelines.get(name)
+        if pipeline is None:
+            return self._response(GSTD_NO_RESOURCE)
+        if command in ('pipeline_play', 'pipeline_pause', 'pipeline_stop'):
+            pipeline['state'] = {'pipeline_play': 'playing', 'pipeline_pause': 'paused',
+                                 'pipeline_stop': 'null'}[command]
+            if command in ('pipeline_play', 'pipeline_stop'):
+                pipeline['eos_time'] = None
+            return self._response()
+        if command == 'pipeline_delete':
+            with self._lock:
+                del self.pipelines[name]
+            return self._response()
+        if command == 'event_eos':
+            # as with gstd, EOS only reaches the sinks (and the bus) of a playing pipeline
+            if pipeline['state'] != 'playing':
+                return self._response(GSTD_EVENT_ERROR)
+            pipeline['eos_time'] = time.time() + self.eos_latency
+            return self._response()
+        if command == 'element_set':
+            pipeline['properties'][(args[1], args[2])] = ' '.join(args[3:])
+            return self._response()
+        if command == 'element_get':
+            value = pipeline['properties'].get((args[1], args[2]))
+            return self._response(response={'name': args[2], 'value': value, 'param': {}})
+        if command == 'bus_timeout':
+            timeout_ns = int(args[1])
+            self.bus_timeouts[name] = None if timeout_ns < 0 else timeout_ns / 1e9
+            return self._response()
+        if command == 'bus_read':
+            return self._bus_read(name, pipeline)
+        if command == 'signal_connect':
+            # a real daemon answers when the signal fires; report one buffer per nominal frame period
+            time.sleep(1 / 29.97)
+            return self._response(response={'name': args[2], 'arguments': []})
+        if command in ('pipeline_verbose', 'bus_filter', 'signal_timeout', 'signal_disconnect', 'event_seek',
+                       'event_flush_start', 'event_flush_stop', 'action_emit'):
+            return self._response()
+        return self._response(GSTD_BAD_COMMAND)
+
+    def _bus_read(self, name, pipeline):
+        # only EOS messages are produced by the stand-in
+        timeout = self.bus_timeouts.get(name)
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            eos_time = pipeline['eos_time']
+            now = time.time()
+            if eos_time is not None and now >= eos_time:
+                return self._response(response={'type': 'eos', 'source': name, 'timestamp': str(now),
+                                                'seqnum': 0})
+            if deadline is not None and now >= deadline:
+                return self._response(response=None)
+            time.sleep(0.005)
+
+    def command_stats(self):
+        """
+        Summarizes the recorded commands by command name.
+        :return: dictionary of {command: {'count', 'service_mean', 'service_max'}}
+        """
+        stats = {}
+        with self._lock:
+            for t0, command, service in self.command_log:
+                st = stats.setdefault(command, {'count': 0, 'service_total': 0.0, 'service_max': 0.0})
+                st['count'] += 1
+                st['service_total'] += service
+                st['service_max'] = max(st['service_max'], service)
+        for st in stats.values():
+            st['service_mean'] = st.pop('service_total') / st['count']
+        return stats
+
+
+def main(argv):
+    usage = """
+    fake_gstd.py [-h] -p <port>[,<port>,...] [-a <address>] [-l <command-latency>] [-e <eos-latency>]
+    -h/--help: print usage information, then exit
+    -p/--ports= 5000,5002 : (required) comma-delineated list of ports; one stand-in daemon is started on each
+    -a/--address= : address on which to listen (default 127.0.0.1)
+    -l/--command_latency= : seconds of simulated processing time for every command (default 0)
+    -e/--eos_latency= : seconds between EOS event and the EOS bus message (default 0)
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'hp:a:l:e:', ['help', 'ports=', 'address=', 'command_latency=',
+                                                      'eos_latency='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    ports = None
+    address = '127.0.0.1'
+    command_latency = 0.0
+    eos_latency = 0.0
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-p', '--ports'):
+            ports = [int(p) for p in arg.split(',')]
+        elif opt in ('-a', '--address'):
+            address = arg
+        elif opt in ('-l', '--command_latency'):
+            command_latency = float(arg)
+        elif opt in ('-e', '--eos_latency'):
+            eos_latency = float(arg)
+    if ports is None:
+        print("Must supply at least one port.")
+        print("Usage:", usage)
+        sys.exit(2)
+    servers = [FakeGstdServer(address=address, port=port, command_latency=command_latency,
+                              eos_latency=eos_latency).start() for port in ports]
+    print("Stand-in GStreamer Daemons listening on {} (PID {}). Ctrl-C to stop.".format(
+        ['{}:{}'.format(srv.address, srv.port) for srv in servers], os.getpid()))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for srv in servers:
+            srv.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
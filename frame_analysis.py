@@ -0,0 +1,322 @@
+import os
+import sys
+import csv
+import json
+import getopt
+from traceback import print_exc
+
+import numpy as np
+
+from parameters import *
+from frame_store import FrameTimestampStore
+
+
+class _RegressionAccumulator:
+    """
+    Streaming least-squares fit of timestamp vs. frame number, merged chunk by chunk from centered co-moments (Chan et
+        al. parallel update), so that weeks of frames can be fit without holding them or losing precision to large sums.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean_k = 0.
+        self.mean_t = 0.
+        self.m2_k = 0.
+        self.c_kt = 0.
+
+    def add(self, k, t):
+        """
+        :param k: numpy array of frame numbers
+        :param t: numpy array of timestamps (relative to a fixed reference, to keep precision)
+        :return: None
+        """
+        nb = len(k)
+        if nb == 0:
+            return
+        mean_kb, mean_tb = k.mean(), t.mean()
+        dk, dt = k - mean_kb, t - mean_tb
+        m2_kb, c_ktb = (dk * dk).sum(), (dk * dt).sum()
+        n = self.n + nb
+        delta_k, delta_t = mean_kb - self.mean_k, mean_tb - self.mean_t
+        self.m2_k += m2_kb + delta_k * delta_k * self.n * nb / n
+        self.c_kt += c_ktb + delta_k * delta_t * self.n * nb / n
+        self.mean_k += delta_k * nb / n
+        self.mean_t += delta_t * nb / n
+        self.n = n
+
+    def slope(self):
+        return self.c_kt / self.m2_k if self.m2_k > 0 else None
+
+
+class CameraFrameAnalysis:
+    """
+    Streaming inter-frame analysis for one camera's timestamps, fed one segment at a time in segment order. Tracks gap
+        events (inter-frame delta above `gap_factor` nominal frame periods), estimated dropped frames, repeats and
+        backward steps, the first timestamp of each segment, and a linear fit of timestamp against frame number
+        (counting estimated dropped frames) for clock drift relative to the nominal frame rate.
+    """
+    def __init__(self, camera, nominal_fps=NOMINAL_CAMERA_FRAME_RATE, gap_factor=DEFAULT_FRAME_GAP_FACTOR,
+                 num_largest_gaps=10, event_writer=None):
+        """
+        :param camera: camera name
+        :param nominal_fps: nominal camera frame rate
+        :param gap_factor: inter-frame delta, in nominal frame periods, above which a gap event is recorded
+        :param num_largest_gaps: number of largest gap events kept for the report
+        :param event_writer: optional csv.writer that receives every gap event as it is found
+        :return: None
+        """
+        self.camera = camera
+        self.period = 1. / nominal_fps
+        self.gap_factor = gap_factor
+        self.num_largest_gaps = num_largest_gaps
+        self.event_writer = event_writer
+        self.frames = 0
+        self.valid_frames = 0
+        self.segments = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.gap_events = 0
+        self.dropped_frames = 0
+        self.repeats = 0
+        self.backward_steps = 0
+        self.largest_gaps = []          # [(duration, segment, frame index, start timestamp, dropped), ...]
+        self.segment_first_timestamps = {}
+        self.regression = _RegressionAccumulator()
+        self._frame_number = 0          # frame number of the last valid frame, counting estimated dropped frames
+        self._trailing_invalid = 0      # invalid frames after the last valid frame of the previous segment
+
+    def add_segment(self, segment, records):
+        """
+        :param segment: segment number
+        :param records: structured array with 'timestamp' and 'valid' fields (e.g., memory-mapped from the store)
+        :return: None
+        """
+        self.segments += 1
+        self.frames += len(records)
+        valid = np.asarray(records['valid'])
+        idx = np.flatnonzero(valid)
+        if len(idx) == 0:
+            self._trailing_invalid += len(records)
+            return
+        ts = np.asarray(records['timestamp'])[idx]
+        self.valid_frames += len(ts)
+        self.segment_first_timestamps[segment] = float(ts[0])
+        if self.first_timestamp is None:
+            self.first_timestamp = float(ts[0])
+            prev = None
+        else:
+            prev = self.last_timestamp
+        # deltas include the step from the previous segment's last valid frame; delta i ends at frame i + end_offset
+        # frames between two valid frames (unreadable timestamps) are not counted as dropped
+        if prev is None:
+            deltas, end_offset = np.diff(ts), 1
+            frame_steps = np.diff(idx)
+        else:
+            deltas, end_offset = np.diff(ts, prepend=prev), 0
+            frame_steps = np.diff(idx, prepend=-1 - self._trailing_invalid)
+        self._trailing_invalid = len(records) - 1 - int(idx[-1])
+        steps = frame_steps.astype(np.int64)
+        self.repeats += int(np.count_nonzero(deltas == 0))
+        self.backward_steps += int(np.count_nonzero(deltas < 0))
+        gaps = deltas > self.gap_factor * self.period * frame_steps
+        if np.any(gaps):
+            dropped = np.maximum(np.rint(deltas[gaps] / self.period).astype(np.int64) - frame_steps[gaps], 0)
+            steps[gaps] += dropped
+            self.gap_events += int(np.count_nonzero(gaps))
+            self.dropped_frames += int(dropped.sum())
+            end_pos = np.flatnonzero(gaps) + end_offset
+            events = [(float(d), segment, int(idx[e]), float(ts[e] - d), int(dr))
+                      for d, e, dr in zip(deltas[gaps], end_pos, dropped)]
+            if self.event_writer is not None:
+                for duration, sg, frame_index, start, dr in events:
+                    self.event_writer.writerow([self.camera, sg, frame_index, start, duration, dr])
+            self.largest_gaps = sorted(self.largest_gaps + events, reverse=True)[:self.num_largest_gaps]
+        # frame numbers advance by one per recorded frame, plus the estimated dropped frames in each gap
+        k = self._frame_number + np.cumsum(steps)
+        if prev is None:
+            k = np.concatenate([[self._frame_number], k])
+        # repeats and backward steps are excluded from the drift fit
+        fit = np.ones(len(ts), dtype=bool)
+        fit[end_offset:] = deltas > 0
+        self.regression.add(k[fit].astype(np.float64), ts[fit] - self.first_timestamp)
+        self._frame_number = int(k[-1])
+        self.last_timestamp = float(ts[-1])
+
+    def report(self):
+        """
+        :return: dictionary of results for this camera
+        """
+        span = None if self.first_timestamp is None else self.last_timestamp - self.first_timestamp
+        expected = None if span is None else int(round(span / self.period)) + 1
+        slope = self.regression.slope()
+        drift = None
+        if slope is not None:
+            drift = {'fit_frame_period': slope, 'fit_fps': 1. / slope,
+                     'drift_ppm': (slope / self.period - 1.) * 1e6,
+                     'drift_seconds_per_day': (slope / self.period - 1.) * 86400}
+        return {'segments': self.segments, 'frames': self.frames, 'valid_frames': self.valid_frames,
+                'invalid_frames': self.frames - self.valid_frames,
+                'first_timestamp': self.first_timestamp, 'last_timestamp': self.last_timestamp,
+                'span_seconds': span, 'expected_frames': expected,
+                'received_fps': None if not span else (self.valid_frames - 1) / span,
+                'gap_events': self.gap_events, 'dropped_frames': self.dropped_frames,
+                'drop_rate': None if not expected else self.dropped_frames / float(expected),
+                'repeats': self.repeats, 'backward_steps': self.backward_steps,
+                'largest_gaps': [{'seconds': d, 'segment': sg, 'frame_index': fi, 'start_timestamp': st,
+                                  'dropped_frames': dr} for d, sg, fi, st, dr in self.largest_gaps],
+                'drift': drift}
+
+
+def cross_camera_offsets(camera_analyses, reference=None):
+    """
+    Clock offsets between cameras, from the first timestamp of each recording segment. Segments of all cameras are
+        split by the same recording pipeline, so per-segment differences reflect each camera's clock offset (plus
+        stream latency). Offsets are relative to the named reference camera, or else to the per-segment median.
+    :param camera_analyses: dictionary of {camera: CameraFrameAnalysis}
+    :param reference: optional reference camera name
+    :return: dictionary of {camera: {'segments', 'median', 'min', 'max'}} offsets in seconds
+    """
+    cameras = list(camera_analyses.keys())
+    all_segments = sorted(set().union(*[ca.segment_first_timestamps.keys() for ca in camera_analyses.values()]))
+    if len(cameras) == 0 or len(all_segments) == 0:
+        return {}
+    first = np.full((len(cameras), len(all_segments)), np.nan)
+    seg_pos = {sg: j for j, sg in enumerate(all_segments)}
+    for i, cam in enumerate(cameras):
+        for sg, ts in camera_analyses[cam].segment_first_timestamps.items():
+            first[i, seg_pos[sg]] = ts
+    if reference is not None and reference in cameras:
+        ref = first[cameras.index(reference)]
+    else:
+        with np.errstate(all='ignore'):
+            ref = np.nanmedian(first, axis=0)
+    offsets = first - ref[None, :]
+    report = {}
+    for i, cam in enumerate(cameras):
+        cam_offsets = offsets[i][np.isfinite(offsets[i])]
+        if len(cam_offsets) == 0:
+            continue
+        report[cam] = {'segments': int(len(cam_offsets)), 'median': float(np.median(cam_offsets)),
+                       'min': float(cam_offsets.min()), 'max': float(cam_offsets.max())}
+    return report
+
+
+def analyze_store(store, cameras=None, nominal_fps=NOMINAL_CAMERA_FRAME_RATE, gap_factor=DEFAULT_FRAME_GAP_FACTOR,
+                  events_filename=None, reference_camera=None, verbose=True):
+    """
+    Runs the streaming analysis over every camera and segment in a frame timestamp store. Only one segment is read at
+        a time (memory-mapped), so memory use does not grow with session length.
+    :param store: FrameTimestampStore
+    :param cameras: optional list of camera names to analyze (default all)
+    :param nominal_fps: nominal camera frame rate
+    :param gap_factor: inter-frame delta, in nominal frame periods, above which a gap event is recorded
+    :param events_filename: optional CSV file to receive every gap event
+    :param reference_camera: optional reference camera for cross-camera offsets (default per-segment median)
+    :param verbose: T/F print progress
+    :return: report dictionary
+    """
+    if cameras is None:
+        cameras = store.cameras()
+    events_file = None
+    event_writer = None
+    if events_filename is not None:
+        events_file = open(events_filename, 'w')
+        event_writer = csv.writer(events_file, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+        event_writer.writerow(["camera", "segment", "frame-index", "gap-start-timestamp", "gap-seconds",
+                               "dropped-frames"])
+    analyses = {}
+    try:
+        for cam in cameras:
+            if verbose is True:
+                print("Analyzing camera {} ({} segments).".format(cam, len(store.segments(cam))))
+            ca = CameraFrameAnalysis(cam, nominal_fps=nominal_fps, gap_factor=gap_factor, event_writer=event_writer)
+            for sg in store.segments(cam):
+                ca.add_segment(sg, store.load(cam, sg, mmap=True))
+            analyses[cam] = ca
+    finally:
+        if events_file is not None:
+            events_file.close()
+    return {'nominal_fps': nominal_fps, 'gap_factor': gap_factor,
+            'cameras': {cam: ca.report() for cam, ca in analyses.items()},
+            'offsets': cross_camera_offsets(analyses, reference=reference_camera)}
+
+
+def main(argv):
+    usage = """
+    frame_analysis.py [-h] -s <session-directory> [-o <report-file>] [-e <events-file>] [-c <cameras>]
+    -h/--help: print usage information, then exit
+    -s/--session_directory= : (required, unless --store_directory) session directory with a frame timestamp store
+    --store_directory= : frame timestamp store location (default: frame_timestamps in the session directory)
+    -o/--output_filename= : JSON report file (default frame_analysis.json in the session or store directory)
+    -e/--events_filename= : CSV file to receive every gap event (default: not written)
+    -c/--cameras= : comma-delineated list of cameras to analyze (default all)
+    -r/--reference_camera= : camera to which clock offsets are relative (default: per-segment median of all cameras)
+    --fps= : nominal camera frame rate (default {})
+    --gap_factor= : inter-frame delta, in nominal frame periods, above which a gap is recorded (default {})
+    """.format(NOMINAL_CAMERA_FRAME_RATE, DEFAULT_FRAME_GAP_FACTOR)
+    try:
+        opts, args = getopt.getopt(argv, 'hs:o:e:c:r:', ['help', 'session_directory=', 'store_directory=',
+                                                        'output_filename=', 'events_filename=', 'cameras=',
+                                                        'reference_camera=', 'fps=', 'gap_factor='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    session_directory = None
+    store_directory = None
+    output_filename = None
+    events_filename = None
+    cameras = None
+    reference_camera = None
+    nominal_fps = NOMINAL_CAMERA_FRAME_RATE
+    gap_factor = DEFAULT_FRAME_GAP_FACTOR
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-s', '--session_directory'):
+            session_directory = arg
+        elif opt == '--store_directory':
+            store_directory = arg
+        elif opt in ('-o', '--output_filename'):
+            output_filename = arg
+        elif opt in ('-e', '--events_filename'):
+            events_filename = arg
+        elif opt in ('-c', '--cameras'):
+            cameras = arg.split(',')
+        elif opt in ('-r', '--reference_camera'):
+            reference_camera = arg
+        elif opt == '--fps':
+            nominal_fps = float(arg)
+        elif opt == '--gap_factor':
+            gap_factor = float(arg)
+    if session_directory is None and store_directory is None:
+        print("Must supply session directory or store directory.")
+        print("Usage:", usage)
+        sys.exit(2)
+    if store_directory is None:
+        store_directory = os.path.join(session_directory, DEFAULT_FRAME_TIMESTAMP_STORE)
+    if not os.path.exists(os.path.join(store_directory, 'index.json')):
+        print("No frame timestamp store at {}. Run `query_frames.py -t` first.".format(store_directory))
+        sys.exit(2)
+    if output_filename is None:
+        output_filename = os.path.join(session_directory if session_directory is not None else store_directory,
+                                       'frame_analysis.json')
+
+    store = FrameTimestampStore(store_directory=store_directory)
+    report = analyze_store(store, cameras=cameras, nominal_fps=nominal_fps, gap_factor=gap_factor,
+                           events_filename=events_filename, reference_camera=reference_camera)
+    with open(output_filename, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("\n{:>10} {:>10} {:>10} {:>8} {:>10} {:>10} {:>12}".format(
+        'camera', 'frames', 'dropped', 'gaps', 'drop %', 'drift ppm', 'offset (s)'))
+    for cam, res in report['cameras'].items():
+        drift = res['drift']['drift_ppm'] if res['drift'] is not None else float('nan')
+        offset = report['offsets'].get(cam, {}).get('median', float('nan'))
+        drop_rate = res['drop_rate'] * 100 if res['drop_rate'] is not None else float('nan')
+        print("{:>10} {:>10} {:>10} {:>8} {:>10.3f} {:>10.1f} {:>12.3f}".format(
+            cam, res['frames'], res['dropped_frames'], res['gap_events'], drop_rate, drift, offset))
+    print("Report written to {}.".format(output_filename))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import getopt
+import bisect
+import threading
+from collections import OrderedDict
+from traceback import print_exc
+
+import utilities
+import query_frames
+from parameters import *
+
+
+class FrameServer:
+    """
+    Random-access frame server over the recordings of one session. Keeps a bounded number of open decoder handles
+        (least recently used closed first) and caches decoded frames in an LRU bounded by total bytes, in blocks of
+        DEFAULT_FRAME_SERVER_BLOCK_FRAMES aligned to the GOPs (keyframe to next keyframe), so that nearby frame requests
+        from review and labelling tools cost a cache lookup, or at most one block decode, instead of re-opening the
+        file and decoding from the segment start. Blocks keep long GOPs of large frames (e.g., 4K) cacheable. Safe to
+        share between threads: the shared lock only covers cache and handle bookkeeping, and decoding holds a lock of
+        its segment only, so cache hits and requests for other segments are served while a block is decoded.
+    """
+    def __init__(self, session_directory, cache_megabytes=DEFAULT_FRAME_SERVER_CACHE_MB,
+                 max_open_handles=DEFAULT_FRAME_SERVER_OPEN_HANDLES, store_directory=None):
+        """
+        :param session_directory: session directory, containing _SESSION_INFO.txt and _SESSION_CONFIG.config
+        :param cache_megabytes: memory bound of the decoded-frame cache
+        :param max_open_handles: maximum number of video files held open at once
+        :param store_directory: frame timestamp store location, for requests by timestamp (see time_query.py)
+        :return: None
+        """
+        self.session_directory = session_directory
+        self.store_directory = store_directory
+        self.cache_bytes = int(cache_megabytes * 2 ** 20)
+        self.max_open_handles = max_open_handles
+        self.recording_directories, self.file_name_formats, self.camera_names = utilities.get_recording_params(
+            session_root_directory=session_directory, verbose=False)
+        self._lock = threading.Lock()
+        self._segment_locks = {}         # {(camera, segment): Lock held while probing or decoding the segment}
+        self._segment_files = {}         # {(camera, segment): file path}
+        self._keyframes = {}             # {(camera, segment): sorted list of keyframe indices}
+        self._handles = OrderedDict()    # {(camera, segment): [VideoCapture, next frame position]}, LRU order, idle
+        self._blocks = OrderedDict()     # {(camera, segment, block start): [frame, ...]}, LRU order
+        self._cached_bytes = 0
+        self._time_index = None
+        self.counters = {'requests': 0, 'hits': 0, 'misses': 0, 'seeks': 0, 'decoded_frames': 0,
+                         'block_evictions': 0, 'handle_opens': 0, 'handle_closes': 0}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Rescans the recording directories for segment files (e.g., after new segments are recorded).
+        :return: None
+        """
+        files = utilities.find_files(recording_directories=self.recording_directories,
+                                     file_name_formats=self.file_name_formats, camera_names=self.camera_names,
+                                     verbose=False)
+        with self._lock:
+            self._segment_files = {(vfc, vfi): os.path.join(vfdr, vfn) for vfdr, vfn, vfi, vfc in files}
+
+    def _segment_keyframes(self, camera, segment):
+        # keyframe indices from the container (no decoding); fixed-size blocks if they can't be read
+        key = (camera, segment)
+        if key not in self._keyframes:
+            try:
+                packets = query_frames.get_video_packet_times(self._segment_files[key])
+            except FileNotFoundError:
+                # no ffprobe available
+                packets = None
+            if packets is not None and any([k for t, k in packets]):
+                self._keyframes[key] = [i for i, (t, k) in enumerate(packets) if k is True]
+            else:
+                self._keyframes[key] = None
+        return self._keyframes[key]
+
+    def _block_range(self, camera, segment, frame_index):
+        # (first, last + 1) frame indices of the block containing the frame; blocks are counted from the start of the
+        # GOP and don't cross into the next one, so a block decode never seeks back further than its own keyframe
+        keyframes = self._segment_keyframes(camera, segment)
+        gop_start, gop_stop = 0, None
+        if keyframes is not None:
+            i = bisect.bisect_right(keyframes, frame_index)
+            gop_start = keyframes[i - 1] if i > 0 else 0
+            gop_stop = keyframes[i] if i < len(keyframes) else None
+        start = frame_index - (frame_index - gop_start) % DEFAULT_FRAME_SERVER_BLOCK_FRAMES
+        stop = start + DEFAULT_FRAME_SERVER_BLOCK_FRAMES
+        return start, stop if gop_stop is None else min(stop, gop_stop)
+
+    def _checkout_handle(self, camera, segment):
+        # handles in use are taken out of the LRU, so they can't be closed by another thread while decoding
+        import cv2
+        key = (camera, segment)
+        with self._lock:
+            handle = self._handles.pop(key, None)
+        if handle is not None:
+            return handle
+        cap = cv2.VideoCapture(self._segment_files[key])
+        if not cap.isOpened():
+            raise IOError("Cannot open file \"{}\"".format(self._segment_files[key]))
+        with self._lock:
+            self.counters['handle_opens'] += 1
+        return [cap, 0]
+
+    def _return_handle(self, camera, segment, handle):
+        # called with self._lock held; closes least recently used idle handles beyond the limit
+        self._handles[(camera, segment)] = handle
+        while len(self._handles) > self.max_open_handles:
+            _, (old_cap, _) = self._handles.popitem(last=False)
+            old_cap.release()
+            self.counters['handle_closes'] += 1
+
+    def _decode_block(self, handle, start, stop):
+        # called with the segment lock held (not self._lock); returns the frames and whether a seek was needed
+        import cv2
+        cap, position = handle
+        # reading on from where the handle stopped avoids a seek (common when stepping through a segment, as each block
+        # decode leaves the handle at the start of the next block)
+        seeked = position != start
+        if seeked:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        frames = []
+        while stop is None or start + len(frames) < stop:
+            ret, frame = cap.read()
+            if frame is None:
+                break
+            frames.append(frame)
+        handle[1] = start + len(frames)
+        return frames, seeked
+
+    def _cache_block(self, key, frames):
+        block_bytes = sum([f.nbytes for f in frames])
+        if len(frames) == 0 or block_bytes > self.cache_bytes:
+            return
+        while self._cached_bytes + block_bytes > self.cache_bytes and len(self._blocks) > 0:
+            _, old_frames = self._blocks.popitem(last=False)
+            self._cached_bytes -= sum([f.nbytes for f in old_frames])
+            self.counters['block_evictions'] += 1
+        self._blocks[key] = frames
+        self._cached_bytes += block_bytes
+
+    def get_frame(self, camera, segment, frame_index):
+        """
+        :param camera: camera name
+        :param segment: recording segment number
+        :param frame_index: frame index within the segment
+        :return: frame pixels (BGR numpy array, shared with the cache; copy before modifying), or None if the segment
+            or frame does not exist
+        """
+        with self._lock:
+            self.counters['requests'] += 1
+            if (camera, segment) not in self._segment_files:
+                return None
+            segment_lock = self._segment_locks.setdefault((camera, segment), threading.Lock())
+        with segment_lock:
+            start, stop = self._block_range(camera, segment, frame_index)
+            key = (camera, segment, start)
+            with self._lock:
+                frames = self._blocks.get(key)
+                if frames is not None:
+                    self.counters['hits'] += 1
+                    self._blocks.move_to_end(key)
+                else:
+                    self.counters['misses'] += 1
+            if frames is None:
+                handle = self._checkout_handle(camera, segment)
+                try:
+                    frames, seeked = self._decode_block(handle, start, stop)
+                finally:
+                    with self._lock:
+                        self._return_handle(camera, segment, handle)
+                with self._lock:
+                    self.counters['seeks'] += int(seeked)
+                    self.counters['decoded_frames'] += len(frames)
+                    self._cache_block(key, frames)
+        if frame_index - start >= len(frames):
+            return None
+        return frames[frame_index - start]
+
+    def get_frame_at(self, camera, timestamp):
+        """
+        Serves the first frame of a camera at or after a wall-clock time, located with the session time index.
+        :param camera: camera name
+        :param timestamp: seconds since epoch
+        :return: (segment number, frame index, frame pixels); (None, None, None) if no recording at that time
+        """
+        if self._time_index is None:
+            from time_query import SessionTimeIndex
+            self._time_index = SessionTimeIndex(session_directory=self.session_directory,
+                                                store_directory=self.store_directory).load()
+        matches = self._time_index.locate(start_time=timestamp, cameras=[camera])[camera]
+        if len(matches) == 0:
+            return None, None, None
+        segment, path, first_frame, last_frame, estimated = matches[0]
+        return segment, first_frame, self.get_frame(camera, segment, first_frame)
+
+    def stats(self):
+        """
+        :return: dictionary of request counters, cache hit rate, cached blocks and bytes, open handles, and process RSS
+        """
+        import psutil
+        with self._lock:
+            stats = dict(self.counters)
+            stats['hit_rate'] = self.counters['hits'] / self.counters['requests'] if self.counters['requests'] else None
+            stats['cached_blocks'] = len(self._blocks)
+            stats['cached_megabytes'] = self._cached_bytes / 2 ** 20
+            stats['cache_limit_megabytes'] = self.cache_bytes / 2 ** 20
+            stats['open_handles'] = len(self._handles)
+        stats['process_rss_megabytes'] = psutil.Process().memory_info().rss / 2 ** 20
+        return stats
+
+    def close(self):
+        """
+        Releases all open decoder handles and empties the cache.
+        :return: None
+        """
+        with self._lock:
+            for cap, _ in self._handles.values():
+                cap.release()
+            self._handles.clear()
+            self._blocks.clear()
+            self._cached_bytes = 0
+
+
+def serve_http(frame_server, address='', port=DEFAULT_FRAME_SERVER_PORT, jpeg_quality=90):
+    """
+    Serves frames as JPEG over HTTP (blocking, until interrupted):
+        /frame?camera=<name>&segment=<number>&index=<frame-index>
+        /frame?camera=<name>&time=<epoch-seconds>
+        /stats (JSON)
+    :param frame_server: FrameServer instance
+    :param address: address on which to listen (default all interfaces)
+    :param port: port on which to listen
+    :param jpeg_quality: JPEG encoding quality (0-100)
+    :return: None
+    """
+    import cv2
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    class FrameRequestHandler(BaseHTTPRequestHandler):
+        def _reply(self, code, content_type, body, headers=None):
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == '/stats':
+                self._reply(200, 'application/json', json.dumps(frame_server.stats()).encode())
+                return
+            if url.path != '/frame' or 'camera' not in query:
+                self._reply(404, 'text/plain', b'use /frame?camera=&segment=&index= or /frame?camera=&time=')
+                return
+            try:
+                if 'time' in query:
+                    segment, index, frame = frame_server.get_frame_at(query['camera'], float(query['time']))
+                else:
+                    segment, index = int(query['segment']), int(query['index'])
+                    frame = frame_server.get_frame(query['camera'], segment, index)
+            except (KeyError, ValueError) as e:
+                self._reply(400, 'text/plain', str(e).encode())
+                return
+            if frame is None:
+                self._reply(404, 'text/plain', b'frame not found')
+                return
+            ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            self._reply(200, 'image/jpeg', jpeg.tobytes(), headers={'X-Segment': str(segment), 'X-Frame': str(index)})
+
+        def log_message(self, format, *args):
+            return
+
+    httpd = ThreadingHTTPServer((address, port), FrameRequestHandler)
+    print("Serving frames on {}:{}".format(address or '*', port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def main(argv):
+    usage = """
+    frame_server.py [-h] -s <session-directory> [-p <port>] [-a <address>] [-m <cache-megabytes>] [-n <open-files>]
+    -h/--help: print usage information, then exit
+    -s/--session_directory= : (required) session directory
+    -p/--port= : HTTP port (default {})
+    -a/--address= : HTTP listen address (default all interfaces)
+    -m/--cache_megabytes= : memory bound of the decoded-frame cache (default {})
+    -n/--open_files= : maximum number of video files held open (default {})
+    --store_directory= : frame timestamp store location, for requests by time (default: in the session directory)
+    """.format(DEFAULT_FRAME_SERVER_PORT, DEFAULT_FRAME_SERVER_CACHE_MB, DEFAULT_FRAME_SERVER_OPEN_HANDLES)
+    try:
+        opts, args = getopt.getopt(argv, 'hs:p:a:m:n:', ['help', 'session_directory=', 'port=', 'address=',
+                                                        'cache_megabytes=', 'open_files=', 'store_directory='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    session_directory = None
+    port = DEFAULT_FRAME_SERVER_PORT
+    address = ''
+    cache_megabytes = DEFAULT_FRAME_SERVER_CACHE_MB
+    open_files = DEFAULT_FRAME_SERVER_OPEN_HANDLES
+    store_directory = None
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-s', '--session_directory'):
+            session_directory = arg
+        elif opt in ('-p', '--port'):
+            port = int(arg)
+        elif opt in ('-a', '--address'):
+            address = arg
+        elif opt in ('-m', '--cache_megabytes'):
+            cache_megabytes = float(arg)
+        elif opt in ('-n', '--open_files'):
+            open_files = int(arg)
+        elif opt == '--store_directory':
+            store_directory = arg
+    if session_directory is None:
+        print("Must supply session directory.")
+        print("Usage:", usage)
+        sys.exit(2)
+    server = FrameServer(session_directory=session_directory, cache_megabytes=cache_megabytes,
+                         max_open_handles=open_files, store_directory=store_directory)
+    t0 = time.time()
+    serve_http(server, address=address, port=port)
+    server.close()
+    print("Served for {:.0f} seconds: {}".format(time.time() - t0, server.stats()))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+import os
+import csv
+import json
+
+import numpy as np
+
+from parameters import *
+
+# record layout for each frame of a segment
+FRAME_TIMESTAMP_DTYPE = np.dtype([('timestamp', '<f8'), ('valid', '?'), ('decoded', '?')])
+
+
+class FrameTimestampStore:
+    """
+    Appendable per-session store of frame timestamps, keyed by camera and recording segment. Each segment is one
+        NumPy .npy file of structured records (float64 timestamp, validity flag, decoded flag) that can be memory-
+        mapped for analysis, located at <store_directory>/<camera>/<segment>.npy. An index file records the source
+        video file and frame count of each segment, so that processing can resume where it stopped.
+    """
+    def __init__(self, store_directory):
+        """
+        :param store_directory: directory of the store (created if needed); by default, DEFAULT_FRAME_TIMESTAMP_STORE
+            inside the session directory
+        :return: None
+        """
+        self.store_directory = store_directory
+        os.makedirs(self.store_directory, exist_ok=True)
+        self.index_file = os.path.join(self.store_directory, 'index.json')
+        self.index = {}             # {camera: {segment (str): {'source': filename, 'frames': count}, ...}, ...}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                self.index = json.load(f)
+
+    def _segment_file(self, camera, segment):
+        return os.path.join(self.store_directory, camera, DEFAULT_FRAME_TIMESTAMP_SEGMENT_FORMAT.format(int(segment)))
+
+    def _write_index(self):
+        # write-then-rename, so an interrupted run never leaves a partial index
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.index_file)
+
+    def append(self, camera, segment, timestamps, valid=None, decoded=None, source=None):
+        """
+        Adds (or replaces) the frame timestamps of one segment.
+        :param camera: camera name
+        :param segment: recording segment number
+        :param timestamps: sequence of per-frame timestamps; 0, None, or NaN are stored as NaN and marked invalid
+        :param valid: optional sequence of T/F validity flags (default: finite and non-zero timestamps)
+        :param decoded: optional sequence of T/F flags marking frames actually decoded, as opposed to estimated
+            (default: same as `valid`)
+        :param source: optional source video filename, recorded in the index
+        :return: path of the segment file
+        """
+        ts = np.array([np.nan if t is None else t for t in timestamps], dtype=np.float64)
+        records = np.zeros(len(ts), dtype=FRAME_TIMESTAMP_DTYPE)
+        records['valid'] = np.isfinite(ts) & (ts != 0) if valid is None else np.asarray(valid, dtype=bool)
+        ts[~records['valid']] = np.nan
+        records['timestamp'] = ts
+        records['decoded'] = records['valid'] if decoded is None else np.asarray(decoded, dtype=bool)
+        segment_file = self._segment_file(camera, segment)
+        os.makedirs(os.path.dirname(segment_file), exist_ok=True)
+        tmp_file = segment_file + '.tmp.npy'
+        np.save(tmp_file, records)
+        os.replace(tmp_file, segment_file)
+        self.index.setdefault(camera, {})[str(int(segment))] = {'source': source, 'frames': len(records)}
+        self._write_index()
+        return segment_file
+
+    def has(self, camera, segment):
+        """
+        :return: T/F the segment of this camera is in the store
+        """
+        return str(int(segment)) in self.index.get(camera, {}) and os.path.exists(self._segment_file(camera, segment))
+
+    def cameras(self):
+        """
+        :return: sorted list of camera names in the store
+        """
+        return sorted(self.index.keys())
+
+    def segments(self, camera):
+        """
+        :return: sorted list of segment numbers stored for a camera
+        """
+        return sorted([int(sg) for sg in self.index.get(camera, {}).keys()])
+
+    def load(self, camera, segment, mmap=True):
+        """
+        Loads the structured records of one segment.
+        :param camera: camera name
+        :param segment: recording segment number
+        :param mmap: T/F memory-map the file (read-only) instead of reading it
+        :return: structured numpy array with fields 'timestamp', 'valid', 'decoded'
+        """
+        return np.load(self._segment_file(camera, segment), mmap_mode='r' if mmap is True else None)
+
+    def load_camera(self, camera):
+        """
+        Concatenates every stored segment of a camera, in segment order.
+        :return: structured numpy array of all frames, numpy array of the segment number of each frame
+        """
+        arrays = [self.load(camera, sg, mmap=False) for sg in self.segments(camera)]
+        if len(arrays) == 0:
+            return np.zeros(0, dtype=FRAME_TIMESTAMP_DTYPE), np.zeros(0, dtype=np.int64)
+        segment_numbers = np.concatenate([np.full(len(a), sg) for sg, a in zip(self.segments(camera), arrays)])
+        return np.concatenate(arrays), segment_numbers
+
+    def export_csv(self, filename):
+        """
+        Writes the store in the same layout as query_frames.write_frame_timestamp_results (one row per segment, keyed
+            by source video filename), with invalid frames as 0.
+        :param filename: file path where to save results
+        :return: None
+        """
+        rows = []
+        for camera in self.cameras():
+            for sg in self.segments(camera):
+                source = self.index[camera][str(sg)]['source'] or '{}_{}'.format(camera, sg)
+                ts = np.nan_to_num(self.load(camera, sg)['timestamp'], nan=0.0)
+                rows.append([source] + ts.tolist())
+        with open(filename, 'w') as f:
+            writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+            writer.writerow(["filename", "timestamps (delimited)"])
+            for row in sorted(rows, key=lambda x: x[0]):
+                writer.writerow(row)
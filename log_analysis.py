@@ -5,7 +5,8 @@ import os
 from utilities import get_manager_log_files
 
 
-def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory=True, network=True, disk=True, recording=True):
+def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory=True, network=True, disk=True, recording=True,
+                        gstd=True):
     """
     Plot line graphs of resource usage values over time that were collected in video ingest session log files.
     :param session_directory: top level directory for the video ingest session
@@ -15,6 +16,7 @@ def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory
     :param network: (T/F) plot network usage
     :param disk: (T/F) plot disk usage
     :param recording: (T/F) plot recording directory file usage
+    :param gstd: (T/F) plot CPU usage of each locally-launched GStreamer Daemon (if logged)
     :return: file paths of plots that were written
     """
     # filtered lists for CPU, memory, network, disk, and recording categories
@@ -23,6 +25,7 @@ def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory
     network_vals = []
     disk_vals = []
     recording_vals = []
+    gstd_vals = []
     # determine the available manager filenames
     log_files = get_manager_log_files(session_directory=session_directory)
     # default to plot directory if needed
@@ -47,6 +50,9 @@ def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory
                 elif 'RECORDING:' in line:
                     recording_vals.append((dt.datetime.fromisoformat(line.split(']')[0].strip('[')),
                                            literal_eval(line.split('RECORDING:')[1].strip())))
+                elif 'GSTD:' in line:
+                    gstd_vals.append((dt.datetime.fromisoformat(line.split(']')[0].strip('[')),
+                                      literal_eval(line.split('GSTD:')[1].strip())))
                 else:
                     continue
 
@@ -56,6 +62,7 @@ def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory
     network_vals.sort(key=lambda x: x[0])
     disk_vals.sort(key=lambda x: x[0])
     recording_vals.sort(key=lambda x: x[0])
+    gstd_vals.sort(key=lambda x: x[0])
 
     # do the applicable plots
     plots_written = []
@@ -124,4 +131,16 @@ def plot_resource_usage(session_directory, plot_directory=None, cpu=True, memory
         pfn = os.path.join(plot_directory, "files.pdf")
         plt.savefig(pfn)
         plots_written.append(pfn)
+    if gstd is True and len(gstd_vals) > 0:
+        fig, ax = plt.subplots(1, 1, figsize=(12, 6))
+        gt, gv = zip(*gstd_vals)
+        for worker_name in sorted(set([wn for v in gv for wn in v.keys()])):
+            ax.plot(gt, [v.get(worker_name, (None, None))[0] for v in gv], label=worker_name)
+        ax.set_ylabel("CPU utilization (%, 100% = one core)", fontsize=12)
+        ax.set_xlabel("Date, hour", fontsize=12)
+        ax.set_title("GStreamer Daemon CPU utilization per worker", fontsize=16)
+        fig.legend(fontsize=12)
+        pfn = os.path.join(plot_directory, "gstd.pdf")
+        plt.savefig(pfn)
+        plots_written.append(pfn)
     return plots_written
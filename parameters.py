@@ -7,6 +7,25 @@ DEFAULT_SESSION_DIRECTORY_FORMAT = "ingest_session_{:05d}"
 # ------------------------------------------------
 DEFAULT_SESSION_INFO_FILENAME = "_SESSION_INFO.txt"
 
+# session manifest filename, written at initialization
+# merges the layout of all cameras, workers, and recording locations into one logical session
+# --------------------------------------------------------------------------------------------
+DEFAULT_SESSION_MANIFEST_FILENAME = "_SESSION_MANIFEST.json"
+
+# session catalog (SQLite) filename, kept in the session root directory beside the session directories
+# indexes session numbers, times, cameras, recording layout, and segments across all sessions under the root
+# the session updates its segments in the catalog from the resource monitor, at most every this many seconds
+# ------------------------------------------------------------------------------------------------------------
+DEFAULT_SESSION_CATALOG_FILENAME = "_SESSION_CATALOG.sqlite"
+DEFAULT_SESSION_CATALOG_INTERVAL = 300
+
+# GStreamer Daemon connection defaults for workers
+# a session with no __WORKER__ blocks launches a single local daemon with these values
+# ------------------------------------------------------------------------------------
+DEFAULT_GSTD_ADDRESS = '127.0.0.1'
+DEFAULT_GSTD_PORT = 5000
+DEFAULT_LOCAL_WORKER_NAME = 'local'
+
 # formatter names for pipeline interpipesrc and interpipesink elements
 # names are formatted with pipeline name
 # --------------------------------------------------------------------
@@ -19,6 +38,16 @@ PIPE_SINK_NAME_FORMATTER = '{}_sink'
 PIPE_SINGLE_FILESINK_NAME_FORMATTER = '{}_filesink'         # use when filesink is not camera-specific
 PIPE_CAMERA_FILESINK_NAME_FORMATTER = '{}_filesink_{}'      # use for camera-specific filesinks
 
+# formatter name for camera pipeline RTP depayloader elements, whose statistics are polled by the camera watchdog
+# names are formatted with camera name
+# ---------------------------------------------------------------------------------------------------------------
+PIPE_DEPAY_NAME_FORMATTER = '{}_depay'
+
+# formatter name for camera preview (secondary, low-resolution stream) pipelines
+# names are formatted with camera name
+# ------------------------------------------------------------------------------
+PIPE_PREVIEW_NAME_FORMATTER = '{}_preview'
+
 # default filename template for persistent multi-segment recording
 # '{cam_name}' denotes camera name; %d denotes segment number (%05d is five-zeros-padded)
 # ---------------------------------------------------------------------------------------
@@ -33,6 +62,12 @@ DEFAULT_RECORDING_SEGMENT_DURATION = 15
 # -----------------------------------------------------------
 DEFAULT_NUMBER_STORED_SEGMENTS = 0
 
+# default method for placing cameras' persistent recordings across multiple storage roots
+# 'round-robin' assigns cameras to roots in listed order; 'balanced' assigns each camera to the least-loaded root
+#   (most free space per camera already writing to it)
+# -------------------------------------------------------------------------------------------------------------
+DEFAULT_STORAGE_ASSIGNMENT = 'round-robin'
+
 # assumed video bitrate, in megabytes per second (MB/s)
 # -----------------------------------------------------
 ESTIMATED_CAMERA_BITRATE = 5.5
@@ -42,11 +77,74 @@ ESTIMATED_CAMERA_BITRATE = 5.5
 # -----------------------------------------------------------------
 DEFAULT_BUFFER_TIME = 60
 
+# adaptive video snapshot buffers (`adaptive_buffer==true`): every check, buffered time is shrunk by the shrink factor
+#   (not below `min_buffer_time`) while available memory is below the low mark (GB), and grown back toward `buffer_time`
+#   while it is above the high mark; each queue's byte limit follows its camera's measured bitrate, with headroom
+# -------------------------------------------------------------------------------------------------------------------
+DEFAULT_MIN_BUFFER_TIME = 10
+DEFAULT_BUFFER_MEMORY_LOW = 2.0
+DEFAULT_BUFFER_MEMORY_HIGH = 4.0
+DEFAULT_BUFFER_MANAGER_INTERVAL = 10
+BUFFER_SHRINK_FACTOR = 0.8
+BUFFER_GROW_FACTOR = 1.25
+BUFFER_BYTES_HEADROOM = 1.25
+
+# video snapshot buffer backend: 'memory' holds `buffer_time` of each camera in a queue; 'disk' writes each camera to
+#   a ring of short MPEG-TS chunk files (chunk length in seconds) in this directory inside the session directory, and
+#   deletes chunks older than `buffer_time` unless a video snapshot still needs them
+# -------------------------------------------------------------------------------------------------------------------
+DEFAULT_BUFFER_BACKEND = 'memory'
+DEFAULT_BUFFER_RING_DIRECTORY = 'buffer_ring'
+DEFAULT_BUFFER_CHUNK_TIME = 2
+BUFFER_CHUNK_FILENAME = 'chunk_%08d.ts'
+
 # default filename template for image snapshots
 # '{cam_name}' denotes camera name and '{datetime_unix}' denotes UNIX time
 # ------------------------------------------------------------------------
 DEFAULT_IMAGE_SNAPSHOT_FILENAME = 'imgsnap/snap_{cam_name}_{datetime_unix}.jpg'
 
+# settle times, in seconds, waited after control commands during startup
+# (camera streams connecting, buffers starting, recording starting)
+# -----------------------------------------------------------------------
+CAMERA_START_WAIT = 5
+BUFFER_START_WAIT = 1
+RECORDING_START_WAIT = 5
+
+# EOS-driven shutdown, in seconds: time to wait for a pipeline's EOS bus message (recording pipelines and others), time
+#   to wait after re-sending EOS before forcing the pipeline to stop, and bus read timeout while waiting
+# ---------------------------------------------------------------------------------------------------------------------
+RECORDING_EOS_TIMEOUT = 30
+PIPELINE_EOS_TIMEOUT = 15
+EOS_RETRY_TIMEOUT = 5
+EOS_BUS_POLL_INTERVAL = 0.5
+
+# persistent recording pipeline layout: 'shared' builds one recording pipeline per worker for all of its cameras,
+#   'per-camera' builds one per camera so that cameras can be stopped and restarted independently
+# camera restarts, outages, and their downtime are appended to this file in the session log directory
+# ------------------------------------------------------------------------------------------------------------------
+DEFAULT_RECORDING_PIPELINES = 'shared'
+DEFAULT_CAMERA_EVENTS_FILENAME = 'camera_events.csv'
+
+# aligned segment rollover (`aligned_rollover==true`): all cameras split together on multiples of `segment_time` since
+#   the epoch (e.g., 15 minutes -> :00, :15, :30, :45); file locations of the next segments are set this many seconds
+#   before each boundary, and splitmuxsink splits by itself only after `segment_time` plus this many seconds
+# '{segment_start}' in the recording filename denotes the segment start time (UNIX seconds)
+# -------------------------------------------------------------------------------------------------------------------
+ROLLOVER_PREPARE_TIME = 2
+ROLLOVER_FALLBACK_MARGIN = 60
+
+# camera watchdog (__WATCHDOG__ config block), in seconds: time without new buffers before a camera is restarted,
+#   time between checks, and the initial and maximum wait between repeated restarts of a camera that doesn't recover
+# -----------------------------------------------------------------------------------------------------------------
+DEFAULT_WATCHDOG_SILENCE_TIMEOUT = 10
+DEFAULT_WATCHDOG_POLL_INTERVAL = 2
+DEFAULT_WATCHDOG_BACKOFF_INITIAL = 15
+DEFAULT_WATCHDOG_BACKOFF_MAX = 300
+
+# RTSP transport benchmark (transport_benchmark.py): seconds each camera is received with each transport setting
+# ---------------------------------------------------------------------------------------------------------------
+DEFAULT_TRANSPORT_BENCHMARK_DURATION = 60
+
 # image encoder spin up time
 # --------------------------
 IMAGE_ENCODE_SPIN_UP = 3.0
@@ -68,3 +166,86 @@ DEFAULT_VIDEO_SNAPSHOT_FILENAME = 'vidsnap/snap_{datetime_unix}.jpg'
 # default camera stream reporting interval
 # ----------------------------------------
 DEFAULT_CAMERA_REPORTING_INTERVAL = 15
+
+# frame timestamp decoding across consecutive frames
+# largest frame-to-frame advance (seconds) accepted without flagging an anomaly; larger jumps, repeats, and backward
+#   steps are flagged and always confirmed by a full decode
+# the incremental decoder is cross-checked with a full decode every N frames
+# -----------------------------------------------------------------------------------------------------------------
+DEFAULT_TIMESTAMP_MAX_FRAME_DELTA = 0.5
+DEFAULT_TIMESTAMP_VERIFY_INTERVAL = 300
+
+# sampled frame timestamp extraction: samples up to this many frames ahead are reached by grabbing frames in sequence,
+#   instead of seeking (which decodes forward from the previous keyframe)
+# ---------------------------------------------------------------------------------------------------------------------
+DEFAULT_TIMESTAMP_SEEK_THRESHOLD = 15
+
+# frame timestamp store (written by query_frames.py), inside the session directory
+# one file per camera and segment, formatted with segment number
+# --------------------------------------------------------------------------------
+DEFAULT_FRAME_TIMESTAMP_STORE = 'frame_timestamps'
+DEFAULT_FRAME_TIMESTAMP_SEGMENT_FORMAT = '{:05d}.npy'
+
+# nominal camera frame rate, used for frame timestamp analysis (gaps, dropped frames, clock drift)
+# an inter-frame delta above this many nominal frame periods is counted as a gap event
+# ---------------------------------------------------------------------------------------------
+NOMINAL_CAMERA_FRAME_RATE = 29.97
+DEFAULT_FRAME_GAP_FACTOR = 1.5
+
+# live watch mode of query_frames.py: seconds between scans of the recording directories, and seconds a segment file
+#   must be left unmodified (after its successor appears) before it is considered closed and processed
+# ------------------------------------------------------------------------------------------------------------------
+DEFAULT_WATCH_POLL_INTERVAL = 10
+DEFAULT_WATCH_SETTLE_TIME = 5
+
+# session time index (written by time_query.py), inside the session directory
+# ---------------------------------------------------------------------------
+DEFAULT_TIME_INDEX_FILENAME = 'time_index.npz'
+
+# random-access frame server (frame_server.py): memory bound of the decoded-GOP cache, number of video files held open,
+#   frames per cached block when keyframe positions can't be read from the container, and HTTP port
+# ---------------------------------------------------------------------------------------------------------------------
+DEFAULT_FRAME_SERVER_CACHE_MB = 2048
+DEFAULT_FRAME_SERVER_OPEN_HANDLES = 16
+DEFAULT_FRAME_SERVER_BLOCK_FRAMES = 30
+DEFAULT_FRAME_SERVER_PORT = 8090
+
+# proxy and thumbnail generation (proxy_generation.py), inside the session directory
+# proxies are re-encoded to this height (unless already smaller) with x264 at this CRF
+# one thumbnail every N seconds of each segment, tiled this many per row in one JPEG image
+# new jobs wait while total CPU or disk busy percent is above these limits
+# ----------------------------------------------------------------------------------------
+DEFAULT_PROXY_DIRECTORY = 'proxies'
+DEFAULT_PROXY_HEIGHT = 360
+DEFAULT_PROXY_CRF = 28
+DEFAULT_PROXY_WORKERS = 2
+DEFAULT_PROXY_FFMPEG_THREADS = 2
+DEFAULT_THUMBNAIL_INTERVAL = 60
+DEFAULT_THUMBNAIL_HEIGHT = 180
+DEFAULT_THUMBNAIL_COLUMNS = 10
+DEFAULT_PROXY_MAX_CPU_PERCENT = 70
+DEFAULT_PROXY_MAX_DISK_BUSY_PERCENT = 60
+
+# segment integrity scanner (segment_integrity.py): report file and directory of salvaged segments, inside the session
+#   directory, and number of segments scanned at once
+# ---------------------------------------------------------------------------------------------------------------------
+DEFAULT_SEGMENT_INTEGRITY_FILENAME = 'segment_integrity.csv'
+DEFAULT_SALVAGE_DIRECTORY = 'salvaged'
+DEFAULT_SEGMENT_INTEGRITY_WORKERS = 8
+
+# session export (session_export.py): files copied at once, bandwidth cap across all copies (MB/s), copy block size
+#   (bytes), disk busy percent above which the export backs off, and resume manifest in the archived session directory
+# ---------------------------------------------------------------------------------------------------------------------
+DEFAULT_EXPORT_WORKERS = 4
+DEFAULT_EXPORT_MAX_RATE = 50
+DEFAULT_EXPORT_BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_EXPORT_MAX_DISK_BUSY_PERCENT = 60
+DEFAULT_EXPORT_MANIFEST_FILENAME = '_EXPORT_MANIFEST.jsonl'
+
+# snapshot jobs run on a persistent pool of threads in the session process
+# number of jobs that may run at once, number that may be queued or running (more are rejected), and number of finished
+#   jobs kept for status and metrics
+# ----------------------------------------------------------------------------------------------------------------------
+DEFAULT_SNAPSHOT_WORKERS = 2
+DEFAULT_SNAPSHOT_QUEUE_SIZE = 8
+DEFAULT_SNAPSHOT_JOB_HISTORY = 1000
@@ -8,6 +8,7 @@ __status__ = "Development"
 
 from parameters import *
 import utilities
+import session_catalog
 
 from pygstc.gstc import *
 from pygstc.logger import *
@@ -20,11 +21,19 @@ import datetime
 from traceback import print_exc
 import subprocess
 import multiprocessing
+import threading
+import csv
+import json
+import shutil
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from collections import OrderedDict
 import os
 import sys
 import getopt
 import signal
+import sqlite3
 
 
 class PipelineEntity(object):
@@ -48,6 +57,9 @@ class PipelineEntity(object):
     def get_name(self):
         return self._name
 
+    def get_client(self):
+        return self._client
+
     def play(self):
         self._client.pipeline_play(self._name)
         logbook.debug("Played pipeline: {}".format(self._name))
@@ -60,6 +72,10 @@ class PipelineEntity(object):
         self._client.pipeline_delete(self._name)
         logbook.debug("Deleted pipeline: {}".format(self._name))
     
+    def set_verbose(self, value):
+        self._client.pipeline_verbose(pipe_name=self._name, value=value)
+        logbook.debug("Set verbose={} for pipeline: {}".format(value, self._name))
+
     def eos(self):
         self._client.event_eos(self._name)
         logbook.debug("EOS'd pipeline: {}".format(self._name))
@@ -69,11 +85,31 @@ class PipelineEntity(object):
         logbook.debug("Set {} property to {}; element {} inside pipeline {}".format(
             property_name, property_value, element_name, self._name))
 
+    def get_property(self, element_name, property_name):
+        return self._client.element_get(self._name, element_name, property_name)
+
     def listen_to(self, sink):
         # interpipesrc element is named according to parameters.PIPE_SOURCE_NAME_FORMATTER
         self._client.element_set(self._name, PIPE_SOURCE_NAME_FORMATTER.format(self._name), 'listen-to', sink)
         logbook.debug("Set {} pipeline listening to {}".format(self._name, sink))
 
+    def action_emit(self, element_name, action_name):
+        self._client.action_emit(self._name, element_name, action_name)
+        logbook.debug("Emitted {} action; element {} inside pipeline {}".format(action_name, element_name, self._name))
+
+    def bus_filter(self, message_types):
+        # '+'-separated message types, e.g., 'eos+error'
+        self._client.bus_filter(self._name, message_types)
+        logbook.debug("Set bus filter {} for pipeline: {}".format(message_types, self._name))
+
+    def bus_timeout(self, seconds):
+        # GStreamer Daemon takes nanoseconds; -1 blocks until a message arrives
+        self._client.bus_timeout(self._name, -1 if seconds is None else int(seconds * 1e9))
+
+    def bus_read(self):
+        # returns the next (filtered) bus message as a dictionary, or None at timeout
+        return self._client.bus_read(self._name)
+
 
 class GstdManager:
     """
@@ -81,7 +117,7 @@ class GstdManager:
     """
     def __init__(self, gst_log=None, gstd_log=None, force_mkdir=False, gst_debug_level=5, 
                  tcp_enable=True, tcp_address='127.0.0.1', tcp_port=5000, num_tcp_ports=1,
-                 http_enable=False, http_address='127.0.0.1', http_port=5001):
+                 http_enable=False, http_address='127.0.0.1', http_port=5001, pid_filename=None):
         # check input arguments
         if gst_log is not None:
             print("> GStreamer log file: {}".format(gst_log))
@@ -110,6 +146,12 @@ class GstdManager:
         if gstd_log is not None:
             self.gstd_args += ['--gstd-log-filename', gstd_log]
         self.gstd_args += ['--gst-debug-level', str(gst_debug_level)]
+        # a separate PID file is needed for each daemon when running more than one on this host
+        self.pid_args = []
+        if pid_filename is not None:
+            self.pid_args = ['--pid-filename', pid_filename]
+        self.gstd_args += self.pid_args
+        self.tcp_port = tcp_port if tcp_enable is True else None
         if tcp_enable is True:
             self.gstd_args += ['--enable-tcp-protocol', '--tcp-address', tcp_address, 
                                '--tcp-base-port', str(tcp_port), '--tcp-num-ports', str(num_tcp_ports)]
@@ -132,8 +174,8 @@ class GstdManager:
         print("Attempting to kill GStreamer Daemon.")
         for i in range(3):
             try:
-                gstd_stop = subprocess.run(['gstd', '--kill'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                           universal_newlines=True, timeout=5)
+                gstd_stop = subprocess.run(['gstd', '--kill'] + self.pid_args, stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE, universal_newlines=True, timeout=5)
                 print("GStreamer Daemon stopped.")
                 break
             except subprocess.TimeoutExpired:
@@ -144,6 +186,156 @@ class GstdManager:
         if 'no running gstd found' in gstd_stop.stderr.lower():
             print("No running GStreamer Daemon for STOP command.")
 
+    def find_process(self):
+        """
+        Finds the running daemon process started by this manager, identified by its TCP base port.
+        :return: psutil.Process, or None if not found
+        """
+        if self.tcp_port is None:
+            return None
+        for proc in psutil.process_iter(['name', 'cmdline']):
+            cmdline = proc.info['cmdline'] or []
+            if proc.info['name'] == 'gstd' and '--tcp-base-port' in cmdline and \
+                    cmdline[cmdline.index('--tcp-base-port') + 1:][:1] == [str(self.tcp_port)]:
+                return proc
+        return None
+
+
+class SnapshotExecutor:
+    """
+    Long-lived executor for snapshot jobs. A fixed pool of threads inside the session process replaces forking a new
+        process per trigger, so file descriptors and processes don't accumulate over long sessions. Each job gets an
+        id and a future; a bounded number of jobs may be waiting or running, and snapshot pipelines (which are shared
+        between jobs) are serialized with per-pipeline locks.
+    """
+    def __init__(self, max_workers=DEFAULT_SNAPSHOT_WORKERS, max_pending=DEFAULT_SNAPSHOT_QUEUE_SIZE):
+        """
+        :param max_workers: number of snapshot jobs that may run concurrently
+        :param max_pending: number of snapshot jobs that may be queued or running; further submissions are rejected
+        :return: None
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='snapshot')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pipeline_locks = {}
+        self._next_id = 1
+        self.jobs = OrderedDict()       # {job_id: {'kind', 'submitted', 'started', 'finished', 'future'}, ...}
+        self.rejected = 0
+
+    def pipeline_lock(self, pipeline_name):
+        """
+        :param pipeline_name: name of a pipeline used by snapshot jobs
+        :return: threading.Lock held while a job is using the pipeline
+        """
+        with self._lock:
+            return self._pipeline_locks.setdefault(pipeline_name, threading.Lock())
+
+    def job(self, job_id):
+        """
+        :param job_id: job id returned by `submit`
+        :return: job dictionary {'kind', 'submitted', 'started', 'finished', 'future'}, or None if the id is unknown
+            (or the job has left the history)
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job_id, function, args):
+        job = self.job(job_id)
+        job['started'] = time.time()
+        try:
+            return function(*args)
+        finally:
+            job['finished'] = time.time()
+            self._slots.release()
+            logbook.info("SNAPSHOT: job {} finished in {:.2f} seconds after waiting {:.2f} seconds.".format(
+                job_id, job['finished'] - job['started'], job['started'] - job['submitted']))
+
+    def submit(self, kind, function, *args):
+        """
+        Queues a snapshot job.
+        :param kind: job type, used in the job id and metrics (e.g., 'image', 'video')
+        :param function: function to run
+        :param args: arguments for `function`
+        :return: (job id, concurrent.futures.Future) or (None, None) if the queue is full or the executor is shut down
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logbook.error("Snapshot queue is full; rejecting {} snapshot.".format(kind))
+            return None, None
+        with self._lock:
+            job_id = '{}-{}'.format(kind, self._next_id)
+            self._next_id += 1
+            job = {'kind': kind, 'submitted': time.time(), 'started': None, 'finished': None, 'future': None}
+            self.jobs[job_id] = job
+            try:
+                job['future'] = self._executor.submit(self._run, job_id, function, args)
+            except RuntimeError:
+                self._slots.release()
+                del self.jobs[job_id]
+                logbook.error("Snapshot executor is shut down; rejecting {} snapshot.".format(kind))
+                return None, None
+            # keep a bounded history of finished jobs for metrics and status lookups
+            while len(self.jobs) > DEFAULT_SNAPSHOT_JOB_HISTORY and \
+                    next(iter(self.jobs.values()))['finished'] is not None:
+                self.jobs.popitem(last=False)
+        return job_id, job['future']
+
+    def result(self, job_id, timeout=None):
+        """
+        Waits for a job to finish.
+        :param job_id: job id returned by `submit`
+        :param timeout: seconds to wait (default: no limit)
+        :return: return value of the job function; None if the job id is unknown or the job raised an exception
+        """
+        job = self.job(job_id)
+        if job is None:
+            return None
+        try:
+            return job['future'].result(timeout=timeout)
+        except Exception:
+            logbook.error("Snapshot job {} failed.".format(job_id))
+            print_exc()
+            return None
+
+    def metrics(self):
+        """
+        :return: dictionary of job counts and timing per job kind {kind: {'completed', 'failed', 'pending', 'running',
+            'mean_wait', 'mean_run', 'max_run'}, ...}, plus 'rejected' count
+        """
+        with self._lock:
+            metrics = {'rejected': self.rejected}
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            m = metrics.setdefault(job['kind'], {'completed': 0, 'failed': 0, 'pending': 0, 'running': 0,
+                                                 'wait': [], 'run': []})
+            if job['started'] is None:
+                m['pending'] += 1
+            elif job['finished'] is None:
+                m['running'] += 1
+            else:
+                m['failed' if job['future'].exception() is not None else 'completed'] += 1
+                m['wait'].append(job['started'] - job['submitted'])
+                m['run'].append(job['finished'] - job['started'])
+        for kind, m in metrics.items():
+            if kind == 'rejected':
+                continue
+            wait, run = m.pop('wait'), m.pop('run')
+            m['mean_wait'] = sum(wait) / len(wait) if len(wait) > 0 else None
+            m['mean_run'] = sum(run) / len(run) if len(run) > 0 else None
+            m['max_run'] = max(run) if len(run) > 0 else None
+        return metrics
+
+    def shutdown(self):
+        """
+        Cancels queued jobs and stops accepting new ones; a running job is left to finish in the background.
+        :return: list of ids of jobs that were still running
+        """
+        with self._lock:
+            running = [jid for jid, job in self.jobs.items() if job['started'] is not None and job['finished'] is None]
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        return running
+
 
 class IngestSession:
     """
@@ -191,36 +383,78 @@ class IngestSession:
             self._parse_config_file(session_config_file)
         config_copy_file = self._copy_config_file(session_config_file)
         logbook.notice("Copying configuration file to {}".format(config_copy_file))
+        # place camera recordings on storage roots, if multiple are given; {cam_name: storage_root, ...}
+        self.storage_assignment = self._assign_recording_storage()
+        # partition cameras across GStreamer Daemon workers; {cam_name: worker_name, ...}
+        # without __WORKER__ blocks, there is one local worker that serves every camera
+        self.worker_config = utilities.parse_worker_config(session_config_file)
+        self.camera_workers = self._partition_cameras()
+        # camera stall watchdog settings (__WATCHDOG__ block); started with start_camera_watchdog()
+        self.watchdog_config = utilities.parse_watchdog_config(session_config_file)
+        logbook.notice("Camera watchdog configuration: {}".format(self.watchdog_config))
         # write the session header file, which includes derivative configuration information
         header_file = self._write_session_header_file()
         logbook.notice("Wrote session header/info file to {}".format(header_file))
-        # instantiate GstD manager to run GStreamer Daemon in the background
+        # write the session manifest, which merges the camera layout across workers into one logical session
+        manifest_file = self._write_session_manifest()
+        logbook.notice("Wrote session manifest to {}".format(manifest_file))
+        # record the session in the catalog of all sessions under the session root
+        self.update_session_catalog(status='running')
+        # instantiate GstD managers to run GStreamer Daemon in the background for locally-launched workers
         logbook.notice("Initializing GStreamer Daemon manager.")
-        self.manager = None
+        self.managers = OrderedDict()                   # {worker_name: GstdManager, ...}
         self.initialize_gstd()
-        # instantiate the GstD Python connection client
+        # instantiate the GstD Python connection clients, one per worker
         logbook.notice("Initializing GStreamer Daemon Python client.")
-        self.client = None
+        self.clients = OrderedDict()                    # {worker_name: GstdClient, ...}
         self.initialize_gstd_client()
 
         # locations to store pipelines {pipeline_name: PipelineEntity, ...}
         # pre-define names for certain pipelines that will be references later for control
         # camera pipelines are assumed to be named the same as the specified camera name
         self.pipelines_cameras = OrderedDict()          # use OrderedDict to preserve order during snapshots
+        self.pipelines_previews = OrderedDict()         # preview streams of cameras with `preview_address`
         self.camera_progress_reporters = []             # names of cameras that send progress reporter bus messages
         self.camera_counters_to_start = []              # camera frame counter processes that need to be connected
         self.frame_count = {}                           # frame counts for each camera (if requested); key=cam_name
         self.image_encoder_name = 'image_encode'
         self.pipelines_video_enc = {}
         self.pipelines_video_buffer = {}
+        self.buffer_queues = OrderedDict()              # {cam_name: (buffer pipeline name, queue name), ...}
+        self.buffer_status = OrderedDict()              # latest buffer levels, from the buffer manager
+        self.buffer_manager_thread = None
+        self.buffer_manager_stop = threading.Event()
+        # 'memory': queue buffers and video snapshot pipelines; 'disk': chunk file rings, snapshots copied from them
+        self.buffer_backend = self.video_snap_config.get('buffer_backend', DEFAULT_BUFFER_BACKEND).lower()
+        self.buffer_rings = OrderedDict()               # {cam_name: chunk ring directory, ...} (disk backend)
+        self.buffer_ring_pins = {}                      # {snapshot key: trigger time} of snapshots using the rings
+        self.buffer_ring_lock = threading.Lock()
         self.persistent_record_name = 'record_h264'
         self.pipelines_video_rec = {}
+        # 'shared': one recording pipeline per worker; 'per-camera': one per camera, named '<record name>_<camera>'
+        self.recording_pipelines_mode = self.recording_config.get('recording_pipelines',
+                                                                  DEFAULT_RECORDING_PIPELINES).lower()
+        self.camera_record_pipelines = {}               # {cam_name: name of the recording pipeline with its branch}
+        # all cameras split segments together on wall-clock boundaries (see _rollover_scheduler_worker)
+        self.aligned_rollover = self.recording_config.get('aligned_rollover', 'false').lower() == 'true'
+        self.rollover_thread = None
+        self.rollover_stop = threading.Event()
+        self.recording_active = False
+        self.camera_restart_locks = {}                  # {cam_name: threading.Lock held during a camera restart}
+        self.camera_downtime = {}                       # {cam_name: seconds of downtime from restarts, ...}
+        self.camera_events_lock = threading.Lock()
+        self.watchdog_thread = None
+        self.watchdog_stop = threading.Event()
         self.video_snap_name = 'snap_video'
         self.image_snap_name = 'snap_image'
         self.pipelines_snap = {}
 
         # location to store continually-running processes that need to be stopped on exit
         self.detached_processes = []
+        # image and video snapshots run as jobs on a persistent pool of threads, instead of a process per trigger
+        self.snapshot_executor = SnapshotExecutor()
+        # outcome of EOS/stop for each pipeline shut down so far {pipeline_name: {'status', 'seconds', 'message'}}
+        self.shutdown_report = OrderedDict()
 
     def _setup_logging(self, file_level=logbook.DEBUG, stderr_level=logbook.NOTICE):
         """
@@ -247,17 +481,34 @@ class IngestSession:
 
     def _next_session_number(self, session_root_directory):
         """
-        Checks what directories present in `session_root_directory` match the SESSION_DIRECTORY_FORMAT and calculates
-            the next session number. Does not wrap around to zero.
+        Allocates the next session number from the session catalog in `session_root_directory` (see
+            session_catalog.SessionCatalog.allocate_session_number). If the catalog can't be used, falls back to
+            checking what directories present in `session_root_directory` match the SESSION_DIRECTORY_FORMAT. Does not
+            wrap around to zero.
         :param session_root_directory: Root directory where session-specific directories will be placed.
-        :return: largest session number found in `session_root_directory` plus 1
+        :return: largest session number found in the catalog or `session_root_directory` plus 1
         """
-        root_list_dir = os.listdir(session_root_directory)
-        present_matches = [0]
-        for i in range(0, 99999):
-            if DEFAULT_SESSION_DIRECTORY_FORMAT.format(i) in root_list_dir:
-                present_matches.append(i)
-        return max(present_matches) + 1
+        try:
+            catalog = session_catalog.SessionCatalog(session_root_directory)
+            try:
+                return catalog.allocate_session_number(DEFAULT_SESSION_DIRECTORY_FORMAT)
+            finally:
+                catalog.close()
+        except (sqlite3.Error, OSError) as e:
+            logbook.warning("Session catalog unavailable ({}); scanning session root directory.".format(e))
+        present_matches = session_catalog.scan_session_numbers(session_root_directory, DEFAULT_SESSION_DIRECTORY_FORMAT)
+        return max(present_matches, default=0) + 1
+
+    def update_session_catalog(self, status=None, stop_time=None):
+        """
+        Indexes this session (times, cameras, recording layout, segments so far) in the session catalog under the
+            session root. The catalog is only an index of the session directories, so failures are logged and ignored.
+        :param status: session status to record; None keeps the recorded status
+        :param stop_time: session stop time (UNIX seconds) to record; None keeps the recorded stop time
+        :return: None
+        """
+        session_catalog.try_update_catalog(self.session_absolute_directory, status=status, stop_time=stop_time,
+                                           create=True, warn=logbook.warning)
 
     def _parse_config_file(self, config_file):
         """
@@ -289,6 +540,122 @@ class IngestSession:
                     config_copy.write(line)
         return copy_filename
 
+    def _assign_recording_storage(self):
+        """
+        Assigns each camera's persistent recording to one of the storage roots in the recording configuration
+            (`storage_roots`, comma-separated), so that segment writes are striped across disks. See
+            utilities.assign_storage_roots() for the placement methods.
+        :return: OrderedDict of {camera_name: storage_root}; empty if storage roots are not configured
+        """
+        if 'storage_roots' not in self.recording_config:
+            return OrderedDict()
+        storage_roots = [root.strip() for root in self.recording_config['storage_roots'].split(',') if root.strip()]
+        method = self.recording_config.get('storage_assignment', DEFAULT_STORAGE_ASSIGNMENT)
+        try:
+            assignment = utilities.assign_storage_roots(camera_configs=self.camera_config,
+                                                        storage_roots=storage_roots, method=method)
+        except (AttributeError, OSError) as e:
+            logbook.critical("Problem with recording storage root configuration.")
+            raise e
+        for cam_name, root in assignment.items():
+            logbook.notice("Recording storage root for camera {}: {}".format(cam_name, root))
+        return assignment
+
+    def _partition_cameras(self):
+        """
+        Partitions the cameras across the configured workers (GStreamer Daemon instances). See
+            utilities.partition_cameras() for the partitioning methods.
+        :return: OrderedDict of {camera_name: worker_name}
+        """
+        try:
+            partition = utilities.partition_cameras(camera_configs=self.camera_config,
+                                                    worker_configs=self.worker_config)
+        except AttributeError as e:
+            logbook.critical("Problem with worker configuration.")
+            raise e
+        for wc in self.worker_config:
+            logbook.notice("Worker {} ({}:{}) serves cameras: {}".format(
+                wc['name'], wc['address'], wc['port'], self._worker_cameras(wc['name'], partition)))
+        return partition
+
+    def _worker_cameras(self, worker_name, partition=None):
+        """
+        Lists the cameras served by a worker, in configuration order.
+        :param worker_name: name of the worker
+        :param partition: (optional) camera partition to use instead of self.camera_workers
+        :return: list of camera names
+        """
+        if partition is None:
+            partition = self.camera_workers
+        return [cam_name for cam_name, wn in partition.items() if wn == worker_name]
+
+    def _active_workers(self):
+        """
+        Lists the workers that serve at least one camera, in configuration order.
+        :return: list of worker names
+        """
+        return [wc['name'] for wc in self.worker_config if len(self._worker_cameras(wc['name'])) > 0]
+
+    def _worker_pipeline_name(self, pipeline_name, worker_name):
+        """
+        Names a pipeline that is built once per worker. Interpipe only connects pipelines inside the same daemon, so
+            recording, buffer, and snapshot pipelines run on the same worker as their cameras. The original pipeline
+            name is kept when there is only one worker.
+        :param pipeline_name: base name of the pipeline
+        :param worker_name: name of the worker
+        :return: pipeline name for this worker
+        """
+        if len(self.worker_config) == 1:
+            return pipeline_name
+        return '{}_{}'.format(pipeline_name, worker_name)
+
+    def _find_pipeline(self, pipeline_name):
+        """
+        Looks up a constructed pipeline by name across all pipeline groups.
+        :param pipeline_name: name of the pipeline
+        :return: PipelineEntity, or None if no pipeline has that name
+        """
+        for group in (self.pipelines_snap, self.pipelines_video_rec, self.pipelines_video_enc,
+                      self.pipelines_video_buffer, self.pipelines_cameras, self.pipelines_previews):
+            if pipeline_name in group:
+                return group[pipeline_name]
+        return None
+
+    def _write_session_manifest(self):
+        """
+        Writes the session manifest (JSON), which merges the layout of every camera into one logical session: the
+            worker that serves it, its storage root, and its recording location. Analysis tools read this through
+            utilities.get_recording_params(). Workers on other hosts are assumed to share the session directory (and
+            storage roots) at the same paths.
+        :return: manifest filename
+        """
+        cameras = OrderedDict()
+        for cc in self.camera_config:
+            cameras[cc['name']] = {'worker': self.camera_workers[cc['name']],
+                                   'rtsp_address': cc.get('rtsp_address'),
+                                   'preview_address': cc.get('preview_address'),
+                                   'storage_root': self.storage_assignment.get(cc['name']),
+                                   'rtspsrc': utilities.get_rtspsrc_properties(cc)}
+        if len(self.recording_config) > 0 and self.recording_config.get('enable', 'false').lower() == 'true':
+            for cam_name, rec_dir, rec_file in self.get_recording_file_name_formatters():
+                cameras[cam_name]['recording_directory'] = rec_dir
+                cameras[cam_name]['recording_filename'] = rec_file
+        manifest = OrderedDict([
+            ('session_number', self.this_session_number),
+            ('session_directory', self.session_absolute_directory),
+            ('parent_pid', self.pid),
+            ('workers', OrderedDict([(wc['name'], {'address': wc['address'], 'port': int(wc['port']),
+                                                   'launch': wc['launch'].lower() == 'true',
+                                                   'cameras': self._worker_cameras(wc['name'])})
+                                     for wc in self.worker_config])),
+            ('camera_order', [cc['name'] for cc in self.camera_config]),
+            ('cameras', cameras),
+        ])
+        manifest_filename = os.path.join(self.session_absolute_directory, DEFAULT_SESSION_MANIFEST_FILENAME)
+        with open(manifest_filename, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest_filename
+
     def _write_session_header_file(self):
         """
         Writes high-level information to header file in session directory.
@@ -321,47 +688,76 @@ class IngestSession:
                 float(self.recording_config.get('segment_time', DEFAULT_RECORDING_SEGMENT_DURATION))))
             f.write("\nRecording file name format: {}".format(
                 self.recording_config.get('recording_filename', DEFAULT_RECORDING_FILENAME)))
-            f.write("-" * 50)
+            for cam_name, root in self.storage_assignment.items():
+                f.write("\nRecording storage root for {}: {}".format(cam_name, root))
+            f.write("\n" + "-" * 50)
+        # analysis tools find recordings on storage roots through this file, so it must read back as written
+        if utilities.get_session_storage_assignment(header_filename) != dict(self.storage_assignment):
+            raise ValueError("Storage assignment read back from {} doesn't match the session's assignment.".format(
+                header_filename))
         return header_filename
 
     def initialize_gstd(self):
         """
-        Start GStreamer Daemon process on the machine through its command line interface.
+        Start GStreamer Daemon process on the machine through its command line interface, for each worker that the
+            session is configured to launch (`launch==true`). Other workers are expected to be running already.
+            Several local daemons (e.g., from `instances==K`) spread camera pipelines across processes and cores.
         :return: None
         """
-        # TODO: pass in connection parameters
-        self.manager = GstdManager(gst_log=os.path.join(self.session_log_directory, 'gst.log'),
-                                   gstd_log=os.path.join(self.session_log_directory, 'gstd.log'),
-                                   gst_debug_level=9, tcp_enable=True, http_enable=False)
-        self.manager.start()
+        launch_workers = [wc for wc in self.worker_config if wc['launch'].lower() == 'true']
+        for wc in launch_workers:
+            if len(launch_workers) == 1:
+                log_names, pid_filename = ('gst.log', 'gstd.log'), None
+            else:
+                # each daemon gets its own logs and PID file so that they can be started and stopped independently
+                log_names = ('gst_{}.log'.format(wc['name']), 'gstd_{}.log'.format(wc['name']))
+                pid_filename = os.path.join(self.session_log_directory, 'gstd_{}.pid'.format(wc['name']))
+            manager = GstdManager(gst_log=os.path.join(self.session_log_directory, log_names[0]),
+                                  gstd_log=os.path.join(self.session_log_directory, log_names[1]),
+                                  gst_debug_level=9, tcp_enable=True, tcp_address=wc['address'],
+                                  tcp_port=int(wc['port']), http_enable=False, pid_filename=pid_filename)
+            manager.start()
+            self.managers[wc['name']] = manager
+
+    def _connect_gstd_client(self, worker_name, logger=None):
+        """
+        Creates a new Python client connection to a worker's GStreamer Daemon.
+        :param worker_name: name of the worker
+        :param logger: (optional) pygstc logger for the client
+        :return: GstdClient
+        """
+        wc = [w for w in self.worker_config if w['name'] == worker_name][0]
+        return GstdClient(ip=wc['address'], port=int(wc['port']), logger=logger)
 
     def initialize_gstd_client(self, num_retry=3):
         """
-        Establish connection to GStreamer Daemon running on the system. Set up to retry connection due to some random
+        Establish connection to the GStreamer Daemon of each worker. Set up to retry connection due to some random
             connection issues that seem to resolve on retry.
         :param num_retry: Number of times to retry Gstd client connection before giving up.
         :return: None
         """
-        # TODO: pass in connection parameters or connection mode
         gstd_py_logger = CustomLogger(logname='ingest_log', loglevel='INFO',
                                       logfile=os.path.join(self.session_log_directory, 'pygstc.log'))
-        for i in range(num_retry):
-            try:
-                self.client = GstdClient(ip='localhost', port=5000, logger=gstd_py_logger)
-                self.client.debug_threshold(threshold='DEBUG')
-                self.client.debug_enable(enable=True)
-                # TODO: Gst log still not working correctly
-                break
-            except GstcError:
-                time.sleep(1)
-                if i == num_retry - 1:
-                    print_exc()
-                else:
-                    logbook.warn("Connection failure #{}. Retry connecting to Gstd.".format(i + 1))
-        else:
-            logbook.critical("Problem with Gstreamer Daemon.")
-            raise RuntimeError("Could not contact Gstd after {} attempts.".format(num_retry))
-        self.client.debug_enable(True)
+        for wc in self.worker_config:
+            for i in range(num_retry):
+                try:
+                    client = self._connect_gstd_client(wc['name'], logger=gstd_py_logger)
+                    client.debug_threshold(threshold='DEBUG')
+                    client.debug_enable(enable=True)
+                    # TODO: Gst log still not working correctly
+                    break
+                except GstcError:
+                    time.sleep(1)
+                    if i == num_retry - 1:
+                        print_exc()
+                    else:
+                        logbook.warn("Connection failure #{} to worker {}. Retry connecting to Gstd.".format(
+                            i + 1, wc['name']))
+            else:
+                logbook.critical("Problem with Gstreamer Daemon for worker {}.".format(wc['name']))
+                raise RuntimeError("Could not contact Gstd at {}:{} after {} attempts.".format(
+                    wc['address'], wc['port'], num_retry))
+            self.clients[wc['name']] = client
 
     def _bus_reader_worker(self, pipeline, bus_filters):
         """
@@ -371,9 +767,10 @@ class IngestSession:
         """
         logbook.notice("Bus reader worker process started for pipeline {} with filters {}".format(
             pipeline, bus_filters))
-        self.client.bus_filter(pipe_name=pipeline, filter=bus_filters)
+        client = self._find_pipeline(pipeline).get_client()
+        client.bus_filter(pipe_name=pipeline, filter=bus_filters)
         while True:
-            bus_message = self.client.bus_read(pipe_name=pipeline)
+            bus_message = client.bus_read(pipe_name=pipeline)
             logbook.info("Bus message: {}".format(bus_message))
 
     def start_bus_readers(self, pipes, filters):
@@ -405,8 +802,9 @@ class IngestSession:
         :param camera_name: name of the camera/pipeline to connect
         :param reporting_interval: number of seconds between log reports - translated to frame count assuming 30fps
         """
+        client = self.clients[self.camera_workers[camera_name]]
         while True:
-            self.client.signal_connect(pipe_name=camera_name, element='{}_appsink'.format(camera_name),
+            client.signal_connect(pipe_name=camera_name, element='{}_appsink'.format(camera_name),
                                        signal='new-sample')
             self.frame_count[camera_name] += 1
             # assume 30 frames per second
@@ -418,10 +816,17 @@ class IngestSession:
         file_location = self.recording_config.get('recording_filename', DEFAULT_RECORDING_FILENAME)
         # split path location into directory and filename
         file_dir, file_name = os.path.split(file_location)
-        if file_dir.startswith('./'):
-            file_dir = os.path.join(self.session_absolute_directory, file_dir[2:])
-        else:
+        if not file_dir.startswith('./'):
             logbook.warning("Absolute directory implied for persistent recording location.")
+            if len(self.storage_assignment) > 0:
+                logbook.warning("Storage roots are ignored for an absolute persistent recording location.")
+        # segment start times are only known with aligned rollover, and only file names can carry them
+        if '{segment_start}' in file_dir:
+            logbook.critical("Problem with recording configuration.")
+            raise AttributeError("Segment start placeholder ('{segment_start}') is only allowed in the file name.")
+        if '{segment_start}' in file_name and self.aligned_rollover is False:
+            logbook.critical("Problem with recording configuration.")
+            raise AttributeError("Segment start placeholder ('{segment_start}') requires aligned_rollover==true.")
         # check that the file number formatter is present
         if '%d' not in file_name and not any(['%0{}d'.format(i) in file_name for i in range(10)]):
             logbook.critical("Problem with recording configuration.")
@@ -451,15 +856,18 @@ class IngestSession:
         # get the recording filename formatter from the config
         file_location = self.recording_config.get('recording_filename', DEFAULT_RECORDING_FILENAME)
         unformat_dir, unformat_file = os.path.split(file_location)
-        # check if this is a relative or absolute file path
-        if unformat_dir.startswith('./'):
-            unformat_dir = os.path.join(self.session_absolute_directory, unformat_dir[2:])
         # put the camera names and session number into the directories and files, if called for with formatters
-        for cam_name in self.pipelines_cameras.keys():
-            fd = unformat_dir.format(cam_name=cam_name, session_num=self.this_session_number)
-            ff = unformat_file.format(cam_name=cam_name, session_num=self.this_session_number)
+        for cam_name in [cc['name'] for cc in self.camera_config]:
+            # relative file paths go in the session directory, or its counterpart on the camera's storage root
+            cam_dir = utilities.resolve_recording_directory(
+                file_dir=unformat_dir, session_directory=self.session_absolute_directory,
+                session_number=self.this_session_number, storage_root=self.storage_assignment.get(cam_name))
+            fd = cam_dir.format(cam_name=cam_name, session_num=self.this_session_number)
+            ff = unformat_file.format(cam_name=cam_name, session_num=self.this_session_number,
+                                      segment_start='{segment_start}')
             directory_file_formatters.append((cam_name, fd, ff))
         # return the list of formatted (directory, file) tuples; file formatter still has %d indicator in it
+        #   (and '{segment_start}', if used)
         return directory_file_formatters
 
     def get_recording_file_stats(self):
@@ -477,6 +885,44 @@ class IngestSession:
                     num += 1
         return num, size
 
+    def get_storage_root_stats(self):
+        """
+        Fetches disk usage for each storage root used for persistent recording, if multiple roots are configured.
+        :return: dictionary of {storage_root: (used, free, total bytes)}
+        """
+        stats = {}
+        for root in set(self.storage_assignment.values()):
+            try:
+                dsk_vals = psutil.disk_usage(path=root)
+                stats[root] = (dsk_vals.used, dsk_vals.free, dsk_vals.total)
+            except OSError:
+                logbook.warning("Problem with disk resource fetch for storage root {}.".format(root))
+        return stats
+
+    def get_gstd_process_stats(self):
+        """
+        Fetches CPU and memory usage of each locally-launched GStreamer Daemon. CPU percentage is measured since the
+            previous call (first call reports 0.0), and may exceed 100% for a daemon using more than one core.
+        :return: dictionary of {worker_name: (CPU %, resident memory bytes)}; None values if daemon not found
+        """
+        if not hasattr(self, '_gstd_processes'):
+            self._gstd_processes = {}
+        stats = {}
+        for worker_name, manager in self.managers.items():
+            proc = self._gstd_processes.get(worker_name)
+            try:
+                if proc is None or not proc.is_running():
+                    proc = manager.find_process()
+                    self._gstd_processes[worker_name] = proc
+                if proc is None:
+                    stats[worker_name] = (None, None)
+                else:
+                    stats[worker_name] = (proc.cpu_percent(interval=None), proc.memory_info().rss)
+            except psutil.Error:
+                self._gstd_processes[worker_name] = None
+                stats[worker_name] = (None, None)
+        return stats
+
     def get_current_resource_stats(self, get_cpu, get_memory, get_network, get_disk):
         """
         Fetches current hardware resource statistics.
@@ -515,37 +961,50 @@ class IngestSession:
         # TODO: future -- implement temperature sensor measurements
         return stat_cpu, stat_mem, stat_net, stat_dsk
 
-    def _resource_monitor_worker(self, log_interval, get_cpu, get_memory, get_network, get_disk, get_recording_dir):
+    def _resource_monitor_worker(self, log_interval, get_cpu, get_memory, get_network, get_disk, get_recording_dir,
+                                 catalog_interval):
         """
         Periodically fetches and logs system resource stats.
         :param log_interval: number of seconds between subsequent resource fetches
-        :param get_cpu: T/F fetch CPU stats (1-, 5-, 15- min CPU % avg, (cpu_1, _2, _3, ..., _N current %) )
+        :param get_cpu: T/F fetch CPU stats (1-, 5-, 15- min CPU % avg, (cpu_1, _2, _3, ..., _N current %) ), as well as
+            per-daemon CPU stats for locally-launched GStreamer Daemons
         :param get_memory: T/F fetch memory stats (available memory, total memory)
         :param get_network: T/F fetch network stats (total bytes sent, total bytes received)
         :param get_disk: T/F fetch disk stats (used, free, total bytes) for disk where session directory is located
-        :param get_recording_dir: T/F fetch file stats for recording directory (num total files, total bytes)
+        :param get_recording_dir: T/F fetch file stats for recording directory (num total files, total bytes), and
+            update this session's segments in the session catalog
+        :param catalog_interval: minimum number of seconds between session catalog updates
         :return: None
         """
         logbook.notice("Resource monitor started successfully.")
+        last_catalog_update = time.time()
         while True:
             cpu, mem, net, dsk = self.get_current_resource_stats(get_cpu=get_cpu, get_memory=get_memory,
                                                                  get_network=get_network, get_disk=get_disk)
             # TODO: logging channel args here don't work (propagate into records)
             if get_cpu is True:
                 logbook.info("CPU: {}".format(cpu), channel='Resources')
+                if len(self.managers) > 0:
+                    logbook.info("GSTD: {}".format(self.get_gstd_process_stats()), channel='Resources')
             if get_memory is True:
                 logbook.info("MEMORY: {}".format(mem), channel='Resources')
             if get_network is True:
                 logbook.info("NETWORK: {}".format(net), channel='Resources')
             if get_disk is True:
                 logbook.info("DISK: {}".format(dsk), channel='Resources')
+                if len(self.storage_assignment) > 0:
+                    logbook.info("STORAGE: {}".format(self.get_storage_root_stats()), channel='Resources')
             if get_recording_dir is True:
                 rec = self.get_recording_file_stats()
                 logbook.info("RECORDING: {}".format(rec), channel='Resources')
+                # the catalog rescans every recording directory, so it is updated less often than the resource log
+                if time.time() - last_catalog_update >= catalog_interval:
+                    self.update_session_catalog()
+                    last_catalog_update = time.time()
             time.sleep(log_interval)
 
     def start_resource_monitor(self, log_interval=30, get_cpu=True, get_memory=True, get_network=True, get_disk=True,
-                               get_recording_dir=True):
+                               get_recording_dir=True, catalog_interval=DEFAULT_SESSION_CATALOG_INTERVAL):
         """
         Starts a separate (detached) process to periodically fetch and log system resource stats.
         :param log_interval: number of seconds between subsequent resource fetches
@@ -553,7 +1012,9 @@ class IngestSession:
         :param get_memory: T/F fetch memory stats (available memory, total memory)
         :param get_network: T/F fetch network stats (total bytes sent, total bytes received)
         :param get_disk: T/F fetch disk stats (used, free, total bytes) for disk where session directory is located
-        :param get_recording_dir: T/F fetch file stats for recording directory (num total files, total bytes)
+        :param get_recording_dir: T/F fetch file stats for recording directory (num total files, total bytes), and
+            update this session's segments in the session catalog
+        :param catalog_interval: minimum number of seconds between session catalog updates
         :return: None
         """
         if log_interval < 5:
@@ -564,7 +1025,7 @@ class IngestSession:
                                         get_network=get_network, get_disk=get_disk)
         monitor = multiprocessing.Process(target=self._resource_monitor_worker,
                                           args=(log_interval, get_cpu, get_memory, get_network,
-                                                get_disk, get_recording_dir))
+                                                get_disk, get_recording_dir, catalog_interval))
         monitor.daemon = True
         logbook.notice("Starting resource monitor process.")
         monitor.start()
@@ -578,6 +1039,13 @@ class IngestSession:
         #
         #  rtspsrc --> rtph264depay --> h264parse --> progressreport (optional) --> queue --> interpipesink
         #
+        # The depayloader is named, so the camera watchdog can poll its statistics.
+        # ----------------------------------------------------------------------------------------------------------
+        # A camera with `preview_address` (e.g., a low-resolution stream profile) also gets a preview pipeline,
+        #   named with PIPE_PREVIEW_NAME_FORMATTER, which image snapshots use instead of the full-resolution stream.
+        #
+        #  rtspsrc (preview) --> rtph264depay --> h264parse --> queue --> interpipesink
+        #
         # ----------------------------------------------------------------------------------------------------------
         """
         for single_camera_config in self.camera_config:
@@ -587,9 +1055,7 @@ class IngestSession:
                 raise AttributeError("Camera name collision. Check configuration file.")
             # determine connection method and assemble URI
             if 'rtsp_authentication' in single_camera_config and 'rtsp_address' in single_camera_config:
-                cam_connect = 'rtsp://{}@{}'.format(single_camera_config['rtsp_authentication'],
-                                                    single_camera_config['rtsp_address'])
-                cam_source = 'rtspsrc location={}'.format(cam_connect)
+                cam_source = self._rtsp_source(single_camera_config, single_camera_config['rtsp_address'])
             else:
                 # only RTSP implemented right now
                 logbook.critical("Problem with camera configuration.")
@@ -598,7 +1064,8 @@ class IngestSession:
             cam_sink = 'interpipesink name={} forward-events=true forward-eos=true sync=false'.format(
                 PIPE_SINK_NAME_FORMATTER.format(cam_name))
             # default no reporting; this will get overwritten if reporting is requested
-            pd = '{} ! rtph264depay ! h264parse ! queue ! {}'.format(cam_source, cam_sink)
+            cam_depay = 'rtph264depay name={}'.format(PIPE_DEPAY_NAME_FORMATTER.format(cam_name))
+            pd = '{} ! {} ! h264parse ! queue ! {}'.format(cam_source, cam_depay, cam_sink)
             # check if reporting was requested
             if 'report' in single_camera_config and single_camera_config['report'] in ('progressreport', 'appsink'):
                 interval = int(single_camera_config.get('report_interval', DEFAULT_CAMERA_REPORTING_INTERVAL))
@@ -615,14 +1082,39 @@ class IngestSession:
                         '{}_appsink'.format(cam_name))
                     report_element = 'tee name=t t. ! queue ! {} t.'.format(appsink_element)
                     self.camera_counters_to_start.append((cam_name, interval))
-                pd = '{} ! rtph264depay ! h264parse ! {} ! queue ! {}'.format(cam_source, report_element, cam_sink)
+                pd = '{} ! {} ! h264parse ! {} ! queue ! {}'.format(cam_source, cam_depay, report_element, cam_sink)
                 logbook.info("Progress logging for camera={} every {} seconds".format(cam_name, interval))
             else:
                 logbook.info("No progress logging for camera={}.".format(cam_name))
-            cam = PipelineEntity(self.client, cam_name, pd)
+            cam = PipelineEntity(self.clients[self.camera_workers[cam_name]], cam_name, pd)
             self.pipelines_cameras[cam_name] = cam
             # initialize frame counter for this camera, even if there's no reporting
             self.frame_count[cam_name] = 0
+            self.camera_restart_locks[cam_name] = threading.Lock()
+            self.camera_downtime[cam_name] = 0.0
+            if 'preview_address' in single_camera_config:
+                preview_name = PIPE_PREVIEW_NAME_FORMATTER.format(cam_name)
+                preview_source = self._rtsp_source(single_camera_config, single_camera_config['preview_address'])
+                logbook.info("Preview source for camera={}: {}".format(cam_name, preview_source))
+                preview_def = '{} ! rtph264depay name={} ! h264parse ! queue ! interpipesink name={} ' \
+                              'forward-events=true forward-eos=true sync=false'.format(
+                                preview_source, PIPE_DEPAY_NAME_FORMATTER.format(preview_name),
+                                PIPE_SINK_NAME_FORMATTER.format(preview_name))
+                self.pipelines_previews[preview_name] = PipelineEntity(self.clients[self.camera_workers[cam_name]],
+                                                                       preview_name, preview_def)
+                self.camera_restart_locks[preview_name] = threading.Lock()
+
+    def _rtsp_source(self, single_camera_config, address):
+        """
+        :param single_camera_config: dictionary of one camera's configuration block
+        :param address: camera stream address (IP:port/...), e.g., `rtsp_address` or `preview_address`
+        :return: rtspsrc element description, with the camera's transport and jitter buffer settings
+        """
+        cam_connect = 'rtsp://{}@{}'.format(single_camera_config['rtsp_authentication'], address)
+        # optional transport and jitter buffer tuning from the camera block (checked by the config parser)
+        return 'rtspsrc location={}'.format(cam_connect) + ''.join(
+            [' {}={}'.format(prop, val)
+             for prop, val in utilities.get_rtspsrc_properties(single_camera_config).items()])
 
     def _construct_persistent_recording_pipeline(self):
         """
@@ -640,17 +1132,36 @@ class IngestSession:
         #
         #
         # ----------------------------------------------------------------------------------------------------------
+        # With multiple workers, there is one recording pipeline per worker, containing that worker's cameras.
+        # With `recording_pipelines==per-camera`, each camera's sub-pipeline is its own pipeline instead, so that a
+        #   stalled camera only holds up its own recording and a camera can be restarted alone (restart_camera).
+        # ----------------------------------------------------------------------------------------------------------
         """
-        # construct the recording pipeline for all the cameras by adding them all to the same description
-        pd = ''
-        for cam_name in self.pipelines_cameras.keys():
-            # listen to camera sink; no need to name this interpipesrc because it won't be changed
-            pd += ' interpipesrc format=time allow-renegotiation=false listen-to={} ! '.format(
-                PIPE_SINK_NAME_FORMATTER.format(cam_name))
-            # name camera-specific filesink with pipeline name and camera name
-            pd += 'splitmuxsink name={} async-finalize=true muxer-pad-map=x-pad-map,video=video_0'.format(
-                PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name))
-        record_h264 = PipelineEntity(self.client, self.persistent_record_name, pd)
+        if self.recording_pipelines_mode not in ('shared', 'per-camera'):
+            logbook.critical("Problem with recording configuration.")
+            raise AttributeError("recording_pipelines must be 'shared' or 'per-camera'.")
+        # construct the recording pipeline(s) by adding each camera's sub-pipeline to the description of its pipeline
+        record_pipelines = {}       # {cam_name: PipelineEntity, ...}
+        for worker_name in self._active_workers():
+            if self.recording_pipelines_mode == 'per-camera':
+                groups = [('{}_{}'.format(self.persistent_record_name, cam_name), [cam_name])
+                          for cam_name in self._worker_cameras(worker_name)]
+            else:
+                groups = [(self._worker_pipeline_name(self.persistent_record_name, worker_name),
+                           self._worker_cameras(worker_name))]
+            for record_name, cam_names in groups:
+                pd = ''
+                for cam_name in cam_names:
+                    # listen to camera sink; no need to name this interpipesrc because it won't be changed
+                    pd += ' interpipesrc format=time allow-renegotiation=false listen-to={} ! '.format(
+                        PIPE_SINK_NAME_FORMATTER.format(cam_name))
+                    # name camera-specific filesink with pipeline name and camera name
+                    pd += 'splitmuxsink name={} async-finalize=true muxer-pad-map=x-pad-map,video=video_0'.format(
+                        PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name))
+                record_pipeline = PipelineEntity(self.clients[worker_name], record_name, pd)
+                for cam_name in cam_names:
+                    record_pipelines[cam_name] = record_pipeline
+                    self.camera_record_pipelines[cam_name] = record_name
         # check that the recording file name formatter is valid
         self.check_validity_recording_file_name_formatter()
         # get the directories and filename formatters for recording
@@ -662,7 +1173,8 @@ class IngestSession:
             for create_dir in create_directories:
                 if not os.path.exists(create_dir):
                     logbook.notice("Making directory for persistent recording: {}".format(create_dir))
-                    os.mkdir(create_dir)
+                    # storage roots need the session directory made too
+                    os.makedirs(create_dir)
         except OSError as e:
             # FATAL EXCEPTION
             logbook.critical("Problem creating persistent recording directories. This is a fatal exception.")
@@ -671,6 +1183,10 @@ class IngestSession:
         # maximum segment time for multi-segment recording; number of minutes * 60 s/min * 1e9 ns/s
         max_file_time_mins = float(self.recording_config.get('segment_time', DEFAULT_RECORDING_SEGMENT_DURATION))
         max_file_time_ns = int(max_file_time_mins * 60 * 1e9)
+        # with aligned rollover, segments are split by the rollover scheduler; splitmuxsink only splits by itself if
+        #   the scheduler misses a boundary
+        if self.aligned_rollover is True:
+            max_file_time_ns = int((max_file_time_mins * 60 + ROLLOVER_FALLBACK_MARGIN) * 1e9)
         # maximum number of files, per camera, that are kept in storage
         max_num_files = int(self.recording_config.get('maximum_segment_files', DEFAULT_NUMBER_STORED_SEGMENTS))
         # if maximum storage space specified, convert and replace max_num_files (automatic override)
@@ -683,17 +1199,24 @@ class IngestSession:
             print("Maximum number of files set from maximum storage config value: {}".format(max_num_files))
         else:
             print("Maximum number of files set directly from config value: {}".format(max_num_files))
+        self.maximum_segment_files = max_num_files
+        if self.aligned_rollover is True:
+            # file names change with every segment, so splitmuxsink can't reuse them; old segments are deleted by the
+            #   rollover scheduler instead (see _prune_recording_segments)
+            max_num_files = 0
         # set filesink (splitmuxsink element) properties for location and file management
         for cam_name, file_dir, file_name in directory_file_formatters:
             cam_full_location = os.path.join(file_dir, file_name)
             print("Setting file path for camera {} to {}".format(cam_name, cam_full_location))
+            record_h264 = record_pipelines[cam_name]
             record_h264.set_property(PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name),
                                      'location', cam_full_location)
             record_h264.set_property(PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name),
                                      'max-size-time', str(max_file_time_ns))
             record_h264.set_property(PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name),
                                      'max-files', str(max_num_files))
-        self.pipelines_video_rec[self.persistent_record_name] = record_h264
+        for record_h264 in record_pipelines.values():
+            self.pipelines_video_rec.setdefault(record_h264.get_name(), record_h264)
 
     def _construct_buffered_video_snapshot_pipeline(self):
         """
@@ -717,13 +1240,25 @@ class IngestSession:
         #                                  \          /
         #                                   ----------
         # ----------------------------------------------------------------------------------------------------------
+        # With `buffer_backend==disk`, buffers are chunk file rings instead (see _construct_disk_buffer_pipelines)
+        #   and there is no video snapshot pipeline.
+        # ----------------------------------------------------------------------------------------------------------
         """
+        if self.buffer_backend == 'disk':
+            self._construct_disk_buffer_pipelines()
+            return
+        elif self.buffer_backend != 'memory':
+            logbook.critical("Problem with video snapshot configuration.")
+            raise AttributeError("buffer_backend must be 'memory' or 'disk'.")
         # Length of historical video buffer; number of seconds * 1e9 ns/s
         min_buffer_time = float(self.video_snap_config.get('buffer_time', DEFAULT_BUFFER_TIME)) * 1e9
         # Set max time at 105% min time
         overflow_time = min_buffer_time * 1.05
         # Set buffer memory overflow for safety; assume 2x camera bitrate (in parameters.py) * 1024^2 B/MB
         overflow_size = overflow_time * 2 * ESTIMATED_CAMERA_BITRATE * 1024 * 1024
+        if self.video_snap_config.get('adaptive_buffer', 'false').lower() == 'true':
+            # the buffer manager sets byte limits from measured bitrates, so start from the estimate with headroom
+            overflow_size = overflow_time * BUFFER_BYTES_HEADROOM * ESTIMATED_CAMERA_BITRATE * 1024 * 1024
 
         buffer_name_format = 'buffer_h264_{}'       # not going to need to access these later
         for cam_name, _ in self.pipelines_cameras.items():
@@ -737,27 +1272,72 @@ class IngestSession:
             buffer_sink = 'interpipesink name={} forward-events=true forward-eos=true sync=false'.format(
                 PIPE_SINK_NAME_FORMATTER.format(buffer_name))
             buffer_def = '{} ! {} ! {}'.format(buffer_source, queue_def, buffer_sink)
-            new_buffer = PipelineEntity(self.client, buffer_name, buffer_def)
+            new_buffer = PipelineEntity(self.clients[self.camera_workers[cam_name]], buffer_name, buffer_def)
             # set buffer properties; first convert values to integers then strings
             new_buffer.set_property(qname, 'min-threshold-time', str(int(min_buffer_time)))
             new_buffer.set_property(qname, 'max-size-time', str(int(overflow_time)))
             new_buffer.set_property(qname, 'max-size-bytes', str(int(overflow_size)))
             self.pipelines_video_buffer[buffer_name] = new_buffer
+            self.buffer_queues[cam_name] = (buffer_name, qname)
 
         # Video snapshot - connects to queue-buffers from each camera, muxes, and file-sinks
+        #   - with multiple workers, there is one video snapshot pipeline (and file) per worker
         # ----------------------------------------------------------------------------------------------------------
         logbook.notice("CREATING VIDEO SNAPSHOT PIPELINE")
-        pd = ''
-        for ci, cam_name in enumerate(self.pipelines_cameras.keys()):
-            this_buffer_name = buffer_name_format.format(cam_name)
-            pd += ' interpipesrc format=time allow-renegotiation=false listen-to={} ! '.format(
-                PIPE_SINK_NAME_FORMATTER.format(this_buffer_name))
-            pd += 'snapmux.video_{}'.format(ci)
-        # file location will be set later when the snapshot is triggered
-        pd += ' mp4mux name=snapmux ! filesink name={}'.format(
-            PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(self.video_snap_name))
-        snap_video = PipelineEntity(self.client, self.video_snap_name, pd)
-        self.pipelines_snap[self.video_snap_name] = snap_video
+        for worker_name in self._active_workers():
+            snap_name = self._worker_pipeline_name(self.video_snap_name, worker_name)
+            pd = ''
+            for ci, cam_name in enumerate(self._worker_cameras(worker_name)):
+                this_buffer_name = buffer_name_format.format(cam_name)
+                pd += ' interpipesrc format=time allow-renegotiation=false listen-to={} ! '.format(
+                    PIPE_SINK_NAME_FORMATTER.format(this_buffer_name))
+                pd += 'snapmux.video_{}'.format(ci)
+            # file location will be set later when the snapshot is triggered
+            pd += ' mp4mux name=snapmux ! filesink name={}'.format(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(snap_name))
+            snap_video = PipelineEntity(self.clients[worker_name], snap_name, pd)
+            self.pipelines_snap[snap_name] = snap_video
+
+    def _construct_disk_buffer_pipelines(self):
+        """
+        # ----------------------------------------------------------------------------------------------------------
+        # Disk buffers are independent pipelines, each constructed as follows.
+        #
+        #  interpipesrc (camera) --> h264parse --> splitmuxsink (MPEG-TS chunks in the camera's ring directory)
+        #
+        # ----------------------------------------------------------------------------------------------------------
+        # Chunks are numbered without rolling over; old chunks are deleted by the buffer manager (_buffer_ring_worker)
+        #   rather than splitmuxsink's max-files, so that chunks still needed by a video snapshot are kept. Each chunk
+        #   starts on a keyframe with SPS/PPS (config-interval=-1), so snapshots are stream-copied from chunks.
+        # ----------------------------------------------------------------------------------------------------------
+        """
+        ring_directory = self.video_snap_config.get('buffer_directory', DEFAULT_BUFFER_RING_DIRECTORY)
+        if not os.path.isabs(ring_directory):
+            ring_directory = os.path.join(self.session_absolute_directory,
+                                          ring_directory[2:] if ring_directory.startswith('./') else ring_directory)
+        chunk_time_ns = int(float(self.video_snap_config.get('buffer_chunk_time', DEFAULT_BUFFER_CHUNK_TIME)) * 1e9)
+        if self.video_snap_config.get('adaptive_buffer', 'false').lower() == 'true':
+            logbook.warning("adaptive_buffer only applies to the memory buffer backend; ignoring it.")
+        for cam_name, _ in self.pipelines_cameras.items():
+            buffer_name = 'buffer_h264_{}'.format(cam_name)
+            cam_ring = os.path.join(ring_directory, cam_name)
+            try:
+                os.makedirs(cam_ring, exist_ok=True)
+            except OSError as e:
+                # FATAL EXCEPTION
+                logbook.critical("Problem creating buffer ring {}. This is a fatal exception.".format(cam_ring))
+                print_exc()
+                raise e
+            buffer_source = 'interpipesrc name={} format=time listen-to={}'.format(
+                PIPE_SOURCE_NAME_FORMATTER.format(buffer_name), PIPE_SINK_NAME_FORMATTER.format(cam_name))
+            chunk_sink = PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(buffer_name)
+            buffer_def = '{} ! h264parse config-interval=-1 ! splitmuxsink name={} muxer-factory=mpegtsmux'.format(
+                buffer_source, chunk_sink)
+            new_buffer = PipelineEntity(self.clients[self.camera_workers[cam_name]], buffer_name, buffer_def)
+            new_buffer.set_property(chunk_sink, 'location', os.path.join(cam_ring, BUFFER_CHUNK_FILENAME))
+            new_buffer.set_property(chunk_sink, 'max-size-time', str(chunk_time_ns))
+            self.pipelines_video_buffer[buffer_name] = new_buffer
+            self.buffer_rings[cam_name] = cam_ring
+        logbook.notice("Video snapshot buffers are chunk rings in {}.".format(ring_directory))
 
     def _construct_image_snapshot_pipeline(self):
         """
@@ -772,28 +1352,34 @@ class IngestSession:
         #  interpipesrc --> filesink
         #
         # ----------------------------------------------------------------------------------------------------------
-        """
-        # source 'listen-to' parameter set at an arbitrary camera for now; changed during snapshot
-        encoder_source = 'interpipesrc name={} format=time listen-to={}_sink'.format(
-            PIPE_SOURCE_NAME_FORMATTER.format(self.image_encoder_name), list(self.pipelines_cameras.keys())[0])
-        # not using jpegenc snapshot parameter (sends EOS after encoding a frame) because of H.264 key frames
-        encoder_type = 'jpegenc quality=95'
-        encoder_sink = 'interpipesink name={} '.format(PIPE_SINK_NAME_FORMATTER.format(self.image_encoder_name))
-        encoder_sink += 'forward-events=true forward-eos=true sync=false async=false enable-last-sample=false drop=true'
-        encoder_def = '{} ! avdec_h264 ! {} ! {}'.format(encoder_source, encoder_type, encoder_sink)
-        image_encoder = PipelineEntity(self.client, self.image_encoder_name, encoder_def)
-        self.pipelines_video_enc[self.image_encoder_name] = image_encoder
-
-        # image snapshot - connects to only one camera at a time via image_encode pipeline and dumps a frame to file
+        # With multiple workers, the encoder and image snapshot pipelines are built once per worker.
         # ----------------------------------------------------------------------------------------------------------
-        logbook.notice("CREATING IMAGE SNAPSHOT PIPELINE")
-        snap_source = 'interpipesrc name={} format=time listen-to={} num-buffers=1'.format(
-            PIPE_SOURCE_NAME_FORMATTER.format(self.image_snap_name),
-            PIPE_SINK_NAME_FORMATTER.format(self.image_encoder_name))
-        # file location will be set later when the snapshot is triggered
-        snap_sink = 'filesink name={}'.format(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(self.image_snap_name))
-        snap_image = PipelineEntity(self.client, self.image_snap_name, '{} ! {}'.format(snap_source, snap_sink))
-        self.pipelines_snap[self.image_snap_name] = snap_image
+        """
+        for worker_name in self._active_workers():
+            encoder_name = self._worker_pipeline_name(self.image_encoder_name, worker_name)
+            snap_name = self._worker_pipeline_name(self.image_snap_name, worker_name)
+            # source 'listen-to' parameter set at an arbitrary camera for now; changed during snapshot
+            encoder_source = 'interpipesrc name={} format=time listen-to={}'.format(
+                PIPE_SOURCE_NAME_FORMATTER.format(encoder_name),
+                PIPE_SINK_NAME_FORMATTER.format(self._worker_cameras(worker_name)[0]))
+            # not using jpegenc snapshot parameter (sends EOS after encoding a frame) because of H.264 key frames
+            encoder_type = 'jpegenc quality=95'
+            encoder_sink = 'interpipesink name={} '.format(PIPE_SINK_NAME_FORMATTER.format(encoder_name))
+            encoder_sink += 'forward-events=true forward-eos=true sync=false async=false enable-last-sample=false ' \
+                            'drop=true'
+            encoder_def = '{} ! avdec_h264 ! {} ! {}'.format(encoder_source, encoder_type, encoder_sink)
+            image_encoder = PipelineEntity(self.clients[worker_name], encoder_name, encoder_def)
+            self.pipelines_video_enc[encoder_name] = image_encoder
+
+            # image snapshot - connects to one camera at a time via image_encode pipeline and dumps a frame to file
+            # ------------------------------------------------------------------------------------------------------
+            logbook.notice("CREATING IMAGE SNAPSHOT PIPELINE")
+            snap_source = 'interpipesrc name={} format=time listen-to={} num-buffers=1'.format(
+                PIPE_SOURCE_NAME_FORMATTER.format(snap_name), PIPE_SINK_NAME_FORMATTER.format(encoder_name))
+            # file location will be set later when the snapshot is triggered
+            snap_sink = 'filesink name={}'.format(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(snap_name))
+            snap_image = PipelineEntity(self.clients[worker_name], snap_name, '{} ! {}'.format(snap_source, snap_sink))
+            self.pipelines_snap[snap_name] = snap_image
 
     def construct_pipelines(self):
         """
@@ -842,14 +1428,17 @@ class IngestSession:
             logbook.notice("Starting camera streams.")
             for pipeline_name, pipeline in self.pipelines_cameras.items():
                 logbook.notice("Starting {}.".format(pipeline_name))
-                self.client.pipeline_verbose(pipe_name=pipeline_name, value=True)
+                pipeline.set_verbose(True)
                 pipeline.play()
-            time.sleep(5)
+            for pipeline_name, pipeline in self.pipelines_previews.items():
+                logbook.notice("Starting {}.".format(pipeline_name))
+                pipeline.play()
+            time.sleep(CAMERA_START_WAIT)
             logbook.notice("Camera streams initialized.")
             # start bus readers for rtspsrc elements
             if False:
-                for pipeline_name in self.pipelines_cameras.keys():
-                    self.client.pipeline_verbose(pipe_name=pipeline_name, value=True)
+                for pipeline in self.pipelines_cameras.values():
+                    pipeline.set_verbose(True)
                 self.start_bus_readers(pipes=list(self.pipelines_cameras.keys()),
                                        filters=['element' for _ in self.pipelines_cameras])
             # check if there are any progress reporter bus readers to connect
@@ -889,14 +1478,183 @@ class IngestSession:
             for pipeline_name, pipeline in self.pipelines_video_buffer.items():
                 logbook.notice("Starting {}.".format(pipeline_name))
                 pipeline.play()
-            time.sleep(1)
+            time.sleep(BUFFER_START_WAIT)
             logbook.notice("Camera stream buffers initialized.")
             logbook.notice("Buffers will reach capacity in {} seconds.".format(
                 self.video_snap_config.get('buffer_time', DEFAULT_BUFFER_TIME)))
+            adaptive = self.video_snap_config.get('adaptive_buffer', 'false').lower() == 'true'
+            if self.buffer_backend == 'disk' or adaptive:
+                self.start_buffer_manager()
         except (GstcError, GstdError) as e:
             logbook.error("Could not initialize camera stream buffers.")
             print_exc()
 
+    def _buffer_manager_worker(self, min_time, max_time, memory_low, memory_high, interval):
+        """
+        Buffer manager loop, run in a thread until self.buffer_manager_stop is set. Each buffer queue holds back its
+            output until `min-threshold-time` of video is queued, so that time is the history available to video
+            snapshots. Every `interval` seconds, the buffered time of all cameras is shrunk while system available
+            memory is low and grown back toward `max_time` while it is high; each queue's byte limit is set from its
+            camera's bitrate, measured from the queue's own fill level. Queues aren't changed while a video snapshot is
+            being recorded, since changing the threshold releases or holds back video. Buffer levels are logged
+            ('BUFFER:') and kept in self.buffer_status.
+        :param min_time: minimum buffered seconds
+        :param max_time: maximum (and initial) buffered seconds
+        :param memory_low: available memory in bytes below which buffers are shrunk
+        :param memory_high: available memory in bytes above which buffers are grown
+        :param interval: seconds between checks
+        :return: None
+        """
+        target_time = max_time
+        applied = {}        # {cam_name: (max-size-time, max-size-bytes)} last set on each queue
+        while not self.buffer_manager_stop.wait(interval):
+            available = psutil.virtual_memory().available
+            if available < memory_low and target_time > min_time:
+                target_time = max(min_time, target_time * BUFFER_SHRINK_FACTOR)
+                logbook.warning("BUFFER: {:.2f} GB of memory available; shrinking video buffers to {:.1f} "
+                                "seconds.".format(available / 1024 ** 3, target_time))
+            elif available > memory_high and target_time < max_time:
+                target_time = min(max_time, target_time * BUFFER_GROW_FACTOR)
+                logbook.notice("BUFFER: {:.2f} GB of memory available; growing video buffers to {:.1f} "
+                               "seconds.".format(available / 1024 ** 3, target_time))
+            snapshot_running = any([self.snapshot_executor.pipeline_lock(
+                self._worker_pipeline_name(self.video_snap_name, wn)).locked() for wn in self._active_workers()])
+            status = OrderedDict()
+            for cam_name, (buffer_name, qname) in self.buffer_queues.items():
+                buffer_pipeline = self.pipelines_video_buffer[buffer_name]
+                try:
+                    level_time = int(buffer_pipeline.get_property(qname, 'current-level-time')) / 1e9
+                    level_bytes = int(buffer_pipeline.get_property(qname, 'current-level-bytes'))
+                except (GstcError, GstdError, TypeError, ValueError):
+                    status[cam_name] = None
+                    continue
+                # measured bitrate once there is enough video queued; the configured estimate until then
+                if level_time >= 1:
+                    rate = level_bytes / level_time
+                else:
+                    rate = ESTIMATED_CAMERA_BITRATE * 1024 * 1024
+                max_size_time = int(target_time * 1.05 * 1e9)
+                max_size_bytes = int(rate * target_time * 1.05 * BUFFER_BYTES_HEADROOM)
+                last = applied.get(cam_name)
+                # only change limits that moved noticeably, to keep control traffic down
+                if snapshot_running is False and (last is None or last[0] != max_size_time or
+                                                  abs(max_size_bytes - last[1]) > 0.1 * last[1]):
+                    try:
+                        buffer_pipeline.set_property(qname, 'min-threshold-time', str(int(target_time * 1e9)))
+                        buffer_pipeline.set_property(qname, 'max-size-time', str(max_size_time))
+                        buffer_pipeline.set_property(qname, 'max-size-bytes', str(max_size_bytes))
+                        applied[cam_name] = (max_size_time, max_size_bytes)
+                    except (GstcError, GstdError):
+                        logbook.warning("Couldn't resize video buffer of {}.".format(cam_name))
+                status[cam_name] = {'seconds': round(level_time, 1), 'megabytes': round(level_bytes / 1024 ** 2, 1),
+                                    'limit_megabytes': round(applied[cam_name][1] / 1024 ** 2, 1)
+                                    if cam_name in applied else None}
+            self.buffer_status = status
+            logbook.info("BUFFER: target {:.1f} seconds, {:.2f} GB of memory available; {}".format(
+                target_time, available / 1024 ** 3, dict(status)))
+
+    def _ring_chunks(self, cam_name):
+        """
+        Lists the chunk files in a camera's buffer ring. A chunk covers the time from the previous chunk's modification
+            time to its own.
+        :param cam_name: camera name
+        :return: list of (modification time, file path, size in bytes), oldest first
+        """
+        chunks = []
+        try:
+            with os.scandir(self.buffer_rings[cam_name]) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith('.ts'):
+                        st = entry.stat()
+                        chunks.append((st.st_mtime, entry.path, st.st_size))
+        except OSError:
+            logbook.warning("Couldn't list buffer ring of {}.".format(cam_name))
+        return sorted(chunks)
+
+    def _buffer_ring_worker(self, history, interval):
+        """
+        Buffer manager loop for the disk backend, run in a thread until self.buffer_manager_stop is set. Every
+            `interval` seconds, deletes each camera's chunks that ended more than `history` seconds ago, except those
+            still needed by a pending video snapshot (self.buffer_ring_pins). Buffered seconds and megabytes per camera
+            are logged ('BUFFER:') and kept in self.buffer_status.
+        :param history: seconds of video kept in each ring (`buffer_time`)
+        :param interval: seconds between checks
+        :return: None
+        """
+        while not self.buffer_manager_stop.wait(interval):
+            now = time.time()
+            with self.buffer_ring_lock:
+                keep_after = min([now] + list(self.buffer_ring_pins.values())) - history
+            status = OrderedDict()
+            for cam_name in self.buffer_rings.keys():
+                chunks = self._ring_chunks(cam_name)
+                kept = []
+                for chunk in chunks:
+                    if chunk[0] < keep_after:
+                        try:
+                            os.remove(chunk[1])
+                        except OSError:
+                            logbook.warning("Couldn't delete buffer chunk {}.".format(chunk[1]))
+                    else:
+                        kept.append(chunk)
+                if len(kept) < 2:
+                    status[cam_name] = {'seconds': 0., 'megabytes': round(sum([c[2] for c in kept]) / 1024 ** 2, 1),
+                                        'chunks': len(kept)}
+                    continue
+                # the oldest chunk's start is unknown once its predecessor is deleted; count it as one chunk length
+                seconds = kept[-1][0] - kept[0][0] + (kept[1][0] - kept[0][0])
+                status[cam_name] = {'seconds': round(seconds, 1),
+                                    'megabytes': round(sum([c[2] for c in kept]) / 1024 ** 2, 1), 'chunks': len(kept)}
+            self.buffer_status = status
+            logbook.info("BUFFER: {:.0f} seconds kept on disk; {}".format(now - keep_after, dict(status)))
+
+    def start_buffer_manager(self):
+        """
+        Starts the video buffer manager thread: with the disk backend, the chunk ring manager (see _buffer_ring_worker);
+            otherwise, the adaptive buffer manager (see _buffer_manager_worker), with bounds and memory marks from the
+            video snapshot configuration. Called by start_buffers for the disk backend or with `adaptive_buffer==true`.
+        :return: None
+        """
+        if self.buffer_manager_thread is not None:
+            logbook.warning("Buffer manager already running.")
+            return
+        if self.buffer_backend == 'disk':
+            history = float(self.video_snap_config.get('buffer_time', DEFAULT_BUFFER_TIME))
+            interval = float(self.video_snap_config.get('buffer_chunk_time', DEFAULT_BUFFER_CHUNK_TIME))
+            self.buffer_manager_stop.clear()
+            self.buffer_manager_thread = threading.Thread(target=self._buffer_ring_worker, name='buffer_manager',
+                                                          args=(history, interval), daemon=True)
+            self.buffer_manager_thread.start()
+            logbook.notice("Started video buffer ring manager: keeping {} seconds.".format(history))
+            return
+        max_time = float(self.video_snap_config.get('buffer_time', DEFAULT_BUFFER_TIME))
+        min_time = min(max_time, float(self.video_snap_config.get('min_buffer_time', DEFAULT_MIN_BUFFER_TIME)))
+        memory_low = float(self.video_snap_config.get('buffer_memory_low', DEFAULT_BUFFER_MEMORY_LOW)) * 1024 ** 3
+        memory_high = float(self.video_snap_config.get('buffer_memory_high', DEFAULT_BUFFER_MEMORY_HIGH)) * 1024 ** 3
+        interval = float(self.video_snap_config.get('buffer_manager_interval', DEFAULT_BUFFER_MANAGER_INTERVAL))
+        if memory_high < memory_low:
+            logbook.error("buffer_memory_high is below buffer_memory_low; not starting buffer manager.")
+            return
+        self.buffer_manager_stop.clear()
+        self.buffer_manager_thread = threading.Thread(target=self._buffer_manager_worker, name='buffer_manager',
+                                                      args=(min_time, max_time, memory_low, memory_high, interval),
+                                                      daemon=True)
+        self.buffer_manager_thread.start()
+        logbook.notice("Started video buffer manager: {} to {} seconds, checking every {} seconds.".format(
+            min_time, max_time, interval))
+
+    def stop_buffer_manager(self):
+        """
+        Stops the buffer manager thread. Does nothing if not running.
+        :return: None
+        """
+        if self.buffer_manager_thread is None:
+            return
+        self.buffer_manager_stop.set()
+        self.buffer_manager_thread.join()
+        self.buffer_manager_thread = None
+        logbook.notice("Stopped video buffer manager.")
+
     def start_persistent_recording_all_cameras(self):
         """
         Sets the persistent recording filename from the configuration file and starts the recording.
@@ -908,97 +1666,538 @@ class IngestSession:
         # not allowed to change this persistent recording location for consistency across start/stops
         recording_directories_files = self.get_recording_file_name_formatters()
         fns = [os.path.join(fdr, ffn) for cam_name, fdr, ffn in recording_directories_files]
-        # start the whole recording pipeline
+        # start the whole recording pipeline (one per worker)
         logbook.notice("Starting recording.")
         try:
-            self.pipelines_video_rec[self.persistent_record_name].play()
-            time.sleep(5)
+            if self.aligned_rollover is True:
+                # first segments start now and end at the first boundary
+                self._set_recording_locations(time.time())
+            for record_pipeline in self.pipelines_video_rec.values():
+                record_pipeline.play()
+            time.sleep(RECORDING_START_WAIT)
+            self.recording_active = True
             logbook.notice("Persistent recording pipeline playing.")
         except (GstcError, GstdError):
             logbook.error("Couldn't play persistent recording pipeline.")
             print_exc()
             return None
+        if self.aligned_rollover is True:
+            self.start_rollover_scheduler()
         return fns
 
+    def _set_recording_locations(self, segment_start, cam_names=None):
+        """
+        Sets cameras' splitmuxsink locations with the start time of the segment they will open next, for aligned
+            rollover. splitmuxsink reads its location when it opens a file, so this doesn't affect open segments.
+        :param segment_start: segment start time (UNIX seconds), formatted into '{segment_start}'
+        :param cam_names: (optional) list of camera names (default: all recording cameras)
+        :return: None
+        """
+        for cam_name, file_dir, file_name in self.get_recording_file_name_formatters():
+            if cam_names is not None and cam_name not in cam_names:
+                continue
+            record_pipeline = self.pipelines_video_rec[self.camera_record_pipelines[cam_name]]
+            filesink_name = PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name)
+            record_pipeline.set_property(filesink_name, 'location',
+                                         os.path.join(file_dir, file_name.format(segment_start=int(segment_start))))
+
+    def _prune_recording_segments(self, max_num_files):
+        """
+        Deletes each camera's oldest recording segments beyond `max_num_files`, for aligned rollover (where
+            splitmuxsink's own max-files can't be used).
+        :param max_num_files: number of segment files kept per camera
+        :return: number of files deleted
+        """
+        deleted = 0
+        for cam_name, rec_dir, rec_file in self.get_recording_file_name_formatters():
+            if not os.path.exists(rec_dir):
+                continue
+            segments = utilities.find_files(recording_directories=[rec_dir], file_name_formats=[rec_file],
+                                            camera_names=[cam_name], verbose=False)
+            for seg_dir, seg_file, _, _ in segments[:-max_num_files]:
+                try:
+                    os.remove(os.path.join(seg_dir, seg_file))
+                    deleted += 1
+                except OSError:
+                    logbook.warning("Couldn't delete recording segment {}.".format(os.path.join(seg_dir, seg_file)))
+        return deleted
+
+    def _rollover_scheduler_worker(self, period):
+        """
+        Rollover scheduler loop, run in a thread until self.rollover_stop is set. Shortly before each boundary (a
+            multiple of `period` since the epoch), sets every recording camera's next file location with the boundary
+            time; at the boundary, emits splitmuxsink's split-now action on all cameras at once. Each split lands on
+            the camera's next keyframe, so all cameras' segments start within one keyframe interval of the boundary.
+            Per-camera recordings being restarted are skipped; their next segment starts when they resume. Old
+            segments beyond `maximum_segment_files` are deleted after each split.
+        :param period: seconds between boundaries (`segment_time`)
+        :return: None
+        """
+        while True:
+            boundary = (time.time() // period + 1) * period
+            if self.rollover_stop.wait(max(0., boundary - ROLLOVER_PREPARE_TIME - time.time())):
+                return
+            # a per-camera recording being restarted is stopped; a shared one keeps recording through the restart
+            cam_names = [cam_name for cam_name in self.camera_record_pipelines.keys()
+                         if self.recording_pipelines_mode != 'per-camera' or
+                         not self.camera_restart_locks[cam_name].locked()]
+            try:
+                self._set_recording_locations(boundary, cam_names)
+            except (GstcError, GstdError):
+                logbook.error("ROLLOVER: couldn't set recording locations for {}.".format(
+                    datetime.datetime.fromtimestamp(boundary)))
+                print_exc()
+            if self.rollover_stop.wait(max(0., boundary - time.time())):
+                return
+
+            def split_now(cam_name):
+                try:
+                    self.pipelines_video_rec[self.camera_record_pipelines[cam_name]].action_emit(
+                        PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name), 'split-now')
+                    return time.time() - boundary
+                except (GstcError, GstdError):
+                    logbook.error("ROLLOVER: couldn't split recording of {}.".format(cam_name))
+                    return None
+
+            # all cameras are split concurrently so that the requests reach the pipelines together
+            with ThreadPoolExecutor(max_workers=max(1, len(cam_names)), thread_name_prefix='rollover') as executor:
+                delays = list(executor.map(split_now, cam_names))
+            done = [delay for delay in delays if delay is not None]
+            logbook.info("ROLLOVER: split {} of {} cameras at {}{}.".format(
+                len(done), len(self.camera_record_pipelines), datetime.datetime.fromtimestamp(boundary),
+                '' if len(done) == 0 else ' (requests {:.3f} to {:.3f} seconds late)'.format(min(done), max(done))))
+            if self.maximum_segment_files > 0:
+                self._prune_recording_segments(self.maximum_segment_files)
+
+    def start_rollover_scheduler(self):
+        """
+        Starts the aligned rollover scheduler thread (see _rollover_scheduler_worker), with `segment_time` as the
+            boundary period. Called by start_persistent_recording_all_cameras when `aligned_rollover==true`.
+        :return: None
+        """
+        if self.rollover_thread is not None:
+            logbook.warning("Rollover scheduler already running.")
+            return
+        period = float(self.recording_config.get('segment_time', DEFAULT_RECORDING_SEGMENT_DURATION)) * 60
+        self.rollover_stop.clear()
+        self.rollover_thread = threading.Thread(target=self._rollover_scheduler_worker, name='rollover_scheduler',
+                                                args=(period,), daemon=True)
+        self.rollover_thread.start()
+        logbook.notice("Started rollover scheduler: all cameras split every {} seconds on the clock.".format(period))
+
+    def stop_rollover_scheduler(self):
+        """
+        Stops the rollover scheduler thread. Does nothing if not running.
+        :return: None
+        """
+        if self.rollover_thread is None:
+            return
+        self.rollover_stop.set()
+        self.rollover_thread.join()
+        self.rollover_thread = None
+        logbook.notice("Stopped rollover scheduler.")
+
+    def _eos_and_wait(self, pipeline, timeout=PIPELINE_EOS_TIMEOUT):
+        """
+        Sends EOS to a pipeline and waits for its EOS bus message, which is posted once every sink has finished (e.g.,
+            splitmuxsink/mp4mux have written the 'moov' index of the final file), then stops it. Escalates if there is
+            no EOS: EOS is sent once more and, if there is still no EOS, the pipeline is stopped anyway.
+            Replaces the pipeline's bus filter, so any bus reader on the pipeline only sees EOS and errors afterward.
+        :param pipeline: PipelineEntity
+        :param timeout: seconds to wait for EOS after the first EOS event
+        :return: dictionary {'status': 'clean'/'error'/'timeout'/'failed', 'seconds': float, 'message': str or None}
+        """
+        t0 = time.time()
+        status, message = None, None
+        try:
+            pipeline.bus_filter('eos+error')
+            pipeline.bus_timeout(EOS_BUS_POLL_INTERVAL)
+            for attempt_timeout in (timeout, EOS_RETRY_TIMEOUT):
+                pipeline.eos()
+                deadline = time.time() + attempt_timeout
+                while status is None and time.time() < deadline:
+                    bus_message = pipeline.bus_read()
+                    if bus_message is None:
+                        continue
+                    if bus_message.get('type') == 'eos':
+                        status = 'clean'
+                    elif bus_message.get('type') == 'error':
+                        status, message = 'error', str(bus_message)
+                if status is not None:
+                    break
+                logbook.warning("No EOS from {} after {} seconds.".format(pipeline.get_name(), attempt_timeout))
+            else:
+                status = 'timeout'
+        except (GstcError, GstdError) as e:
+            status, message = 'failed', str(e)
+        try:
+            pipeline.stop()
+        except (GstcError, GstdError) as e:
+            logbook.warning("Couldn't stop {}.".format(pipeline.get_name()))
+            status, message = 'failed', str(e)
+        return {'status': status, 'seconds': time.time() - t0, 'message': message}
+
+    def _stop_and_report(self, pipeline):
+        # stops a pipeline that does not need EOS, in the same report format as _eos_and_wait
+        t0 = time.time()
+        try:
+            pipeline.stop()
+            return {'status': 'stopped', 'seconds': time.time() - t0, 'message': None}
+        except (GstcError, GstdError) as e:
+            logbook.warning("Couldn't stop {}.".format(pipeline.get_name()))
+            return {'status': 'failed', 'seconds': time.time() - t0, 'message': str(e)}
+
+    def _shutdown_pipelines(self, pipelines, eos=True, timeout=PIPELINE_EOS_TIMEOUT):
+        """
+        Shuts down pipelines concurrently (one thread each), with EOS and completion detection if `eos` is True, and
+            adds the outcome of each to self.shutdown_report.
+        :param pipelines: dictionary of pipelines {pipeline_name: PipelineEntity, ...}
+        :param eos: T/F send EOS and wait for it before stopping (see _eos_and_wait); otherwise just stop
+        :param timeout: seconds to wait for EOS after the first EOS event
+        :return: dictionary {pipeline_name: {'status', 'seconds', 'message'}, ...}
+        """
+        if len(pipelines) == 0:
+            return OrderedDict()
+        with ThreadPoolExecutor(max_workers=len(pipelines), thread_name_prefix='shutdown') as executor:
+            if eos is True:
+                futures = [(name, executor.submit(self._eos_and_wait, pipeline, timeout))
+                           for name, pipeline in pipelines.items()]
+            else:
+                futures = [(name, executor.submit(self._stop_and_report, pipeline))
+                           for name, pipeline in pipelines.items()]
+            report = OrderedDict([(name, future.result()) for name, future in futures])
+        for name, result in report.items():
+            log = logbook.info if result['status'] in ('clean', 'stopped') else logbook.error
+            log("SHUTDOWN: {} {} after {:.2f} seconds{}".format(
+                name, result['status'], result['seconds'],
+                '' if result['message'] is None else ' ({})'.format(result['message'])))
+        self.shutdown_report.update(report)
+        return report
+
     def stop_persistent_recording_all_cameras(self):
         """
-        Send EOS to recording pipeline, then stop it.
+        Send EOS to recording pipeline(s) concurrently, wait for each to finish its final file, then stop them.
+        :return: dictionary of shutdown outcome per recording pipeline (see _shutdown_pipelines)
+        """
+        logbook.notice("Sending EOS to persistent recording pipelines and waiting for them to finish.")
+        self.stop_rollover_scheduler()
+        self.recording_active = False
+        report = self._shutdown_pipelines(self.pipelines_video_rec, eos=True, timeout=RECORDING_EOS_TIMEOUT)
+        unclean = [name for name, result in report.items() if result['status'] != 'clean']
+        if len(unclean) > 0:
+            logbook.error("Recording pipelines without clean EOS (final segment may be truncated): {}".format(unclean))
+        return report
+
+    def _log_camera_event(self, cam_name, event, start=None, end=None, segment_index=None, detail=None):
+        """
+        Appends an event (e.g., a restart or an outage) for a camera to the camera event log in the session log
+            directory. Start and end are written as UNIX times, so intervals can be joined against recorded segments
+            and frame timestamps.
+        :param cam_name: name of the camera
+        :param event: event type ('restart', 'restart_failed', 'outage')
+        :param start: (optional) UNIX time at which the camera or its recording went down
+        :param end: (optional) UNIX time at which it came back
+        :param segment_index: (optional) recording segment number the camera's recording continued at
+        :param detail: (optional) free-form description
         :return: None
         """
+        filename = os.path.join(self.session_log_directory, DEFAULT_CAMERA_EVENTS_FILENAME)
+        with self.camera_events_lock:
+            new_file = not os.path.exists(filename)
+            with open(filename, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(['datetime', 'camera', 'event', 'start_unix', 'end_unix', 'downtime_seconds',
+                                     'segment_index', 'detail'])
+                writer.writerow([datetime.datetime.now().isoformat(), cam_name, event,
+                                 '' if start is None else '{:.3f}'.format(start),
+                                 '' if end is None else '{:.3f}'.format(end),
+                                 '' if start is None or end is None else '{:.3f}'.format(end - start),
+                                 '' if segment_index is None else segment_index, '' if detail is None else detail])
+
+    def _next_recording_segment_index(self, cam_name):
+        """
+        :param cam_name: name of the camera
+        :return: one more than the largest segment number recorded so far for the camera (0 if there are none)
+        """
+        for cn, rec_dir, rec_file in self.get_recording_file_name_formatters():
+            if cn == cam_name and os.path.exists(rec_dir):
+                segments = utilities.find_files(recording_directories=[rec_dir], file_name_formats=[rec_file],
+                                                camera_names=[cam_name], verbose=False)
+                if len(segments) > 0:
+                    return max([segment_number for _, _, segment_number, _ in segments]) + 1
+        return 0
+
+    def restart_camera(self, cam_name, reason=None):
+        """
+        Restarts a single camera's stream pipeline and, with per-camera recording pipelines and recording active, its
+            recording pipeline, without interrupting the other cameras. Recording is finished with EOS first, so its
+            last segment is complete, and resumes at the next segment number (splitmuxsink start-index), so segment
+            numbering continues across the restart. Downtime is logged and appended to the camera event log.
+            With a shared recording pipeline, only the camera stream is restarted.
+        :param cam_name: name of the camera
+        :param reason: (optional) why the camera is restarted; written to the camera event log
+        :return: seconds of downtime (recording downtime if recording was restarted), or None if unsuccessful
+        """
+        if cam_name not in self.pipelines_cameras:
+            raise ValueError("No camera pipeline named {}.".format(cam_name))
+        record_pipeline = None
+        if self.recording_active is True and cam_name in self.camera_record_pipelines:
+            if self.recording_pipelines_mode == 'per-camera':
+                record_pipeline = self.pipelines_video_rec[self.camera_record_pipelines[cam_name]]
+            else:
+                logbook.warning("Recording pipeline of {} is shared with other cameras; restarting camera stream "
+                                "only.".format(cam_name))
+        lock = self.camera_restart_locks[cam_name]
+        if not lock.acquire(blocking=False):
+            logbook.warning("Restart of {} is already in progress.".format(cam_name))
+            return None
+        logbook.notice("RESTART: restarting {}{}.".format(cam_name, '' if reason is None else ' ({})'.format(reason)))
+        t0 = time.time()
+        try:
+            eos_result = None
+            if record_pipeline is not None:
+                eos_result = self._eos_and_wait(record_pipeline, timeout=RECORDING_EOS_TIMEOUT)
+                if eos_result['status'] != 'clean':
+                    logbook.error("Recording of {} did not finish cleanly before restart: {}".format(
+                        cam_name, eos_result))
+            camera = self.pipelines_cameras[cam_name]
+            camera.stop()
+            camera.play()
+            time.sleep(CAMERA_START_WAIT)
+            segment_index = None
+            if record_pipeline is not None:
+                segment_index = self._next_recording_segment_index(cam_name)
+                record_pipeline.set_property(
+                    PIPE_CAMERA_FILESINK_NAME_FORMATTER.format(self.persistent_record_name, cam_name),
+                    'start-index', str(segment_index))
+                if self.aligned_rollover is True:
+                    # the resumed segment runs until the next boundary, when it is split with the other cameras
+                    self._set_recording_locations(time.time(), [cam_name])
+                record_pipeline.play()
+            downtime = time.time() - t0
+        except (GstcError, GstdError) as e:
+            logbook.error("Couldn't restart {}.".format(cam_name))
+            print_exc()
+            self._log_camera_event(cam_name, 'restart_failed', start=t0, end=time.time(),
+                                   detail=str(e) if reason is None else '{}; {}'.format(reason, e))
+            return None
+        finally:
+            lock.release()
+        self.camera_downtime[cam_name] += downtime
+        logbook.notice("RESTART: {} back after {:.2f} seconds{}.".format(
+            cam_name, downtime, '' if segment_index is None else ', recording at segment {}'.format(segment_index)))
+        detail = [] if reason is None else [reason]
+        if eos_result is not None:
+            detail.append('recording EOS {}'.format(eos_result['status']))
+        self._log_camera_event(cam_name, 'restart', start=t0, end=t0 + downtime, segment_index=segment_index,
+                               detail='; '.join(detail) if len(detail) > 0 else None)
+        return downtime
+
+    def restart_preview(self, cam_name, reason=None):
+        """
+        Restarts a camera's preview stream pipeline on its own; the camera's main stream and recording are untouched.
+            The restart is appended to the camera event log as 'preview_restart'.
+        :param cam_name: name of the camera
+        :param reason: (optional) why the preview is restarted; written to the camera event log
+        :return: seconds of preview downtime, or None if unsuccessful
+        """
+        preview_name = PIPE_PREVIEW_NAME_FORMATTER.format(cam_name)
+        if preview_name not in self.pipelines_previews:
+            raise ValueError("No preview pipeline for camera {}.".format(cam_name))
+        lock = self.camera_restart_locks[preview_name]
+        if not lock.acquire(blocking=False):
+            logbook.warning("Restart of {} is already in progress.".format(preview_name))
+            return None
+        logbook.notice("RESTART: restarting {}{}.".format(preview_name,
+                                                          '' if reason is None else ' ({})'.format(reason)))
+        t0 = time.time()
         try:
-            logbook.notice("Sending EOS to persistent recording pipeline.")
-            self.pipelines_video_rec[self.persistent_record_name].eos()
-            logbook.notice("Waiting for recording to wrap up after EOS.")
-            time.sleep(5)
-            logbook.notice("Stopping persistent recording pipeline.")
-            self.pipelines_video_rec[self.persistent_record_name].stop()
+            self.pipelines_previews[preview_name].stop()
+            self.pipelines_previews[preview_name].play()
         except (GstcError, GstdError) as e:
-            logbook.error("Problem with stopping persistent recording.")
+            logbook.error("Couldn't restart {}.".format(preview_name))
             print_exc()
+            self._log_camera_event(cam_name, 'preview_restart_failed', start=t0, end=time.time(),
+                                   detail=str(e) if reason is None else '{}; {}'.format(reason, e))
+            return None
+        finally:
+            lock.release()
+        downtime = time.time() - t0
+        self._log_camera_event(cam_name, 'preview_restart', start=t0, end=t0 + downtime, detail=reason)
+        return downtime
+
+    def _camera_watchdog_worker(self, silence_timeout, poll_interval, backoff_initial, backoff_max):
+        """
+        Watchdog loop, run in a thread until self.watchdog_stop is set. Each camera's depayloader statistics (RTP
+            sequence number and timestamp of the last buffer) are read every `poll_interval` seconds; if they haven't
+            changed for `silence_timeout` seconds, the camera is restarted on its own (restart_camera). A camera that
+            doesn't come back is restarted again after a wait that doubles each time, up to `backoff_max`. Each outage
+            (from the last observed buffer to the first observed buffer after it) is written to the camera event log.
+            Preview streams are watched the same way, and restarted on their own (restart_preview).
+        :param silence_timeout: seconds without new buffers before a camera is restarted
+        :param poll_interval: seconds between checks
+        :param backoff_initial: seconds to wait before restarting a camera again if it hasn't recovered
+        :param backoff_max: maximum seconds between restarts of a camera that hasn't recovered
+        :return: None
+        """
+        # watched streams {pipeline name: state}; camera streams are restarted with recording, previews on their own
+        state = OrderedDict()
+        for cam_name in self.pipelines_cameras:
+            streams = [(cam_name, 'outage', self.restart_camera)]
+            if PIPE_PREVIEW_NAME_FORMATTER.format(cam_name) in self.pipelines_previews:
+                streams.append((PIPE_PREVIEW_NAME_FORMATTER.format(cam_name), 'preview_outage', self.restart_preview))
+            for pipeline_name, outage_event, restart in streams:
+                state[pipeline_name] = {'camera': cam_name, 'outage_event': outage_event, 'restart_function': restart,
+                                        'stats': None, 'progress': time.time(), 'outage_start': None,
+                                        'baseline': True, 'backoff': backoff_initial, 'next_restart': 0.0,
+                                        'restart': None}
+        with ThreadPoolExecutor(max_workers=max(1, len(state)), thread_name_prefix='watchdog') as executor:
+            while not self.watchdog_stop.wait(poll_interval):
+                for pipeline_name, cs in state.items():
+                    if cs['restart'] is not None:
+                        if not cs['restart'].done():
+                            continue
+                        # a restarted depayloader starts its statistics over, so they are read again as a baseline
+                        cs['restart'], cs['baseline'] = None, True
+                    try:
+                        stats = self._find_pipeline(pipeline_name).get_property(
+                            PIPE_DEPAY_NAME_FORMATTER.format(pipeline_name), 'stats')
+                    except (GstcError, GstdError):
+                        stats = None
+                    now = time.time()
+                    if cs['baseline'] is True:
+                        cs['stats'], cs['baseline'] = stats, False
+                        continue
+                    if stats is not None and stats != cs['stats']:
+                        cs['stats'], cs['progress'] = stats, now
+                        if cs['outage_start'] is not None:
+                            logbook.notice("WATCHDOG: {} recovered after {:.1f} seconds without buffers.".format(
+                                pipeline_name, now - cs['outage_start']))
+                            self._log_camera_event(cs['camera'], cs['outage_event'], start=cs['outage_start'], end=now)
+                            cs['outage_start'], cs['backoff'], cs['next_restart'] = None, backoff_initial, 0.0
+                        continue
+                    if now - cs['progress'] < silence_timeout:
+                        continue
+                    if cs['outage_start'] is None:
+                        cs['outage_start'] = cs['progress']
+                        logbook.warning("WATCHDOG: no buffers from {} for {:.1f} seconds.".format(
+                            pipeline_name, now - cs['progress']))
+                    if now >= cs['next_restart']:
+                        cs['restart'] = executor.submit(cs['restart_function'], cs['camera'],
+                                                        'no buffers for {:.0f} seconds'.format(now - cs['progress']))
+                        cs['next_restart'] = now + cs['backoff']
+                        cs['backoff'] = min(cs['backoff'] * 2, backoff_max)
+        # outages that haven't ended are still written, so the event log accounts for every gap
+        for cs in state.values():
+            if cs['outage_start'] is not None:
+                self._log_camera_event(cs['camera'], cs['outage_event'], start=cs['outage_start'], end=time.time(),
+                                       detail='ongoing when watchdog stopped')
+
+    def start_camera_watchdog(self):
+        """
+        Starts the camera stall watchdog thread (see _camera_watchdog_worker) with settings from the __WATCHDOG__
+            configuration block. Call after the camera pipelines have been started.
+        :return: None
+        """
+        if self.watchdog_thread is not None:
+            logbook.warning("Camera watchdog already running.")
+            return
+        silence_timeout = float(self.watchdog_config.get('silence_timeout', DEFAULT_WATCHDOG_SILENCE_TIMEOUT))
+        poll_interval = float(self.watchdog_config.get('poll_interval', DEFAULT_WATCHDOG_POLL_INTERVAL))
+        backoff_initial = float(self.watchdog_config.get('backoff_initial', DEFAULT_WATCHDOG_BACKOFF_INITIAL))
+        backoff_max = float(self.watchdog_config.get('backoff_max', DEFAULT_WATCHDOG_BACKOFF_MAX))
+        self.watchdog_stop.clear()
+        self.watchdog_thread = threading.Thread(target=self._camera_watchdog_worker, name='watchdog', daemon=True,
+                                                args=(silence_timeout, poll_interval, backoff_initial, backoff_max))
+        self.watchdog_thread.start()
+        logbook.notice("Started camera watchdog: restart after {} seconds without buffers, checking every {} "
+                       "seconds.".format(silence_timeout, poll_interval))
+
+    def stop_camera_watchdog(self):
+        """
+        Stops the camera watchdog thread, waiting for any restart it has in progress. Does nothing if not running.
+        :return: None
+        """
+        if self.watchdog_thread is None:
+            return
+        self.watchdog_stop.set()
+        self.watchdog_thread.join()
+        self.watchdog_thread = None
+        logbook.notice("Stopped camera watchdog.")
 
     def _image_snapshot_worker(self, camera_list, snap_abs_dir, snap_fn):
         """
         Executes the image snapshot given the final camera list and file location information.
-            Meant to run in non-blocking mp.Process.
+            Meant to run as a job on the snapshot executor; holds the image encoder and snapshot pipeline locks of a
+            camera's worker while that camera is snapped.
         :param camera_list: list of camera names to snapshot (list of strings assembled in calling function)
         :param snap_abs_dir: absolute directory for snapshot storage (optional '{xyz}' formatters)
         :param snap_fn: snapshot file name (optional '{xyz}' formatters)
         :return: list of successful image snapshot filenames, if any (list can be empty)
         """
-        # get the image snap and image encode pipelines
-        snapimg_pipeline = self.pipelines_snap[self.image_snap_name]
-        encode_img_pipeline = self.pipelines_video_enc[self.image_encoder_name]
         fns = []
         # run each camera independently
         # first check the directory existence and create if necessary
         for camera_name in camera_list:
-            try:
-                # add in camera name to directory if needed
-                snap_abs_fmt_dir = snap_abs_dir.format(
-                    cam_name=camera_name, datetime_local=datetime.datetime.isoformat(datetime.datetime.now()),
-                    datetime_utc=datetime.datetime.isoformat(datetime.datetime.utcnow()),
-                    datetime_unix=str(time.time())[:-3])
-                # make the directory if it doesn't exist
-                if not os.path.exists(snap_abs_fmt_dir):
-                    logbook.notice("Making directory: {}".format(snap_abs_fmt_dir))
-                    os.mkdir(snap_abs_fmt_dir)
-                # join the formatted absolute directory and the formatted (if applicable) filename
-                snap_abs_fmt_fn = os.path.join(snap_abs_fmt_dir, snap_fn.format(
-                    cam_name=camera_name, datetime_local=datetime.datetime.isoformat(datetime.datetime.now()),
-                    datetime_utc=datetime.datetime.isoformat(datetime.datetime.utcnow()),
-                    datetime_unix=str(time.time())[:-3]))
-                # set the location of the filesink in the image snap pipeline
-                logbook.info("Setting location of {} pipeline filesink to {}.".format(self.image_snap_name,
-                                                                                      snap_abs_fmt_fn))
-                snapimg_pipeline.set_property(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(self.image_snap_name),
-                                              'location', snap_abs_fmt_fn)
-            except (OSError, GstcError, GstdError):
-                logbook.error("Problem setting up directory and setting filesink location.")
-                print_exc()
-                continue
-            try:
-                # set the encoding pipeline to listen to the appropriate camera
-                logbook.info("Setting encoding interpipe to listen to {}.".format(camera_name))
-                encode_img_pipeline.listen_to(PIPE_SINK_NAME_FORMATTER.format(camera_name))
-                # play the image encoder pipeline and let it spin up (needs a key frame for proper H.264 decoding)
-                logbook.info("Playing image encoder.")
-                encode_img_pipeline.play()
-                time.sleep(IMAGE_ENCODE_SPIN_UP)
-                # run the snap image pipeline for a bit, not sure if this time matters much
-                snapimg_pipeline.play()
-                time.sleep(IMAGE_SNAP_EXECUTE_TIME)
-                # TODO: need EOS for encode or snap pipeline? Memory impact?
-                # TODO: something is going on with bad encoding in images
-                snapimg_pipeline.eos()
-                snapimg_pipeline.stop()
-                encode_img_pipeline.eos()
-                encode_img_pipeline.stop()
-                fns.append(snap_abs_fmt_fn)
-            except (GstcError, GstdError):
-                logbook.error("Problem with encoding/snapshot pipeline for camera {}.".format(camera_name))
-                print_exc()
-                continue
-        logbook.notice("Image snapshot worker process complete.")
+            # get the image snap and image encode pipelines on this camera's worker
+            worker_name = self.camera_workers[camera_name]
+            snap_name = self._worker_pipeline_name(self.image_snap_name, worker_name)
+            snapimg_pipeline = self.pipelines_snap[snap_name]
+            encode_name = self._worker_pipeline_name(self.image_encoder_name, worker_name)
+            encode_img_pipeline = self.pipelines_video_enc[encode_name]
+            # the encoder and snapshot pipelines are shared by all image snapshot jobs on this worker
+            with self.snapshot_executor.pipeline_lock(encode_name), self.snapshot_executor.pipeline_lock(snap_name):
+                try:
+                    # add in camera name to directory if needed
+                    snap_abs_fmt_dir = snap_abs_dir.format(
+                        cam_name=camera_name, datetime_local=datetime.datetime.isoformat(datetime.datetime.now()),
+                        datetime_utc=datetime.datetime.isoformat(datetime.datetime.utcnow()),
+                        datetime_unix=str(time.time())[:-3])
+                    # make the directory if it doesn't exist
+                    if not os.path.exists(snap_abs_fmt_dir):
+                        logbook.notice("Making directory: {}".format(snap_abs_fmt_dir))
+                        os.mkdir(snap_abs_fmt_dir)
+                    # join the formatted absolute directory and the formatted (if applicable) filename
+                    snap_abs_fmt_fn = os.path.join(snap_abs_fmt_dir, snap_fn.format(
+                        cam_name=camera_name, datetime_local=datetime.datetime.isoformat(datetime.datetime.now()),
+                        datetime_utc=datetime.datetime.isoformat(datetime.datetime.utcnow()),
+                        datetime_unix=str(time.time())[:-3]))
+                    # set the location of the filesink in the image snap pipeline
+                    logbook.info("Setting location of {} pipeline filesink to {}.".format(snap_name,
+                                                                                           snap_abs_fmt_fn))
+                    snapimg_pipeline.set_property(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(snap_name),
+                                                  'location', snap_abs_fmt_fn)
+                except (OSError, GstcError, GstdError):
+                    logbook.error("Problem setting up directory and setting filesink location.")
+                    print_exc()
+                    continue
+                try:
+                    # set the encoding pipeline to listen to the appropriate camera, through its preview if it has one
+                    source_name = PIPE_PREVIEW_NAME_FORMATTER.format(camera_name)
+                    if source_name not in self.pipelines_previews:
+                        source_name = camera_name
+                    logbook.info("Setting encoding interpipe to listen to {}.".format(source_name))
+                    encode_img_pipeline.listen_to(PIPE_SINK_NAME_FORMATTER.format(source_name))
+                    # play the image encoder pipeline and let it spin up (needs a key frame for proper H.264 decoding)
+                    logbook.info("Playing image encoder.")
+                    encode_img_pipeline.play()
+                    time.sleep(IMAGE_ENCODE_SPIN_UP)
+                    # run the snap image pipeline for a bit, not sure if this time matters much
+                    snapimg_pipeline.play()
+                    time.sleep(IMAGE_SNAP_EXECUTE_TIME)
+                    # TODO: need EOS for encode or snap pipeline? Memory impact?
+                    # TODO: something is going on with bad encoding in images
+                    snapimg_pipeline.eos()
+                    snapimg_pipeline.stop()
+                    encode_img_pipeline.eos()
+                    encode_img_pipeline.stop()
+                    fns.append(snap_abs_fmt_fn)
+                except (GstcError, GstdError):
+                    logbook.error("Problem with encoding/snapshot pipeline for camera {}.".format(camera_name))
+                    print_exc()
+                    continue
+        logbook.notice("Image snapshot job complete.")
         logbook.notice("Snapshots: {}".format(fns))
         return fns
 
@@ -1013,11 +2212,13 @@ class IngestSession:
         :param file_absolute_location: same as relative location, but setting this != None automatically overrides it;
             see `file_relative_location` for valid placeholder descriptions
         :param cameras: cameras to snapshot; 'all'=all cameras; list/tuple of camera names; ','-sep. str of camera names
-        :param join: T/F wait for snapshot to complete (i.e., call multiprocessing.Process.join())
-        :return: None
+        :param join: T/F wait for snapshot to complete
+        :return: snapshot job id (see `snapshot_status`), or None if the command was rejected
         """
-        # check if video snapshot pipeline was constructed
-        if self.image_snap_name not in self.pipelines_snap or self.image_encoder_name not in self.pipelines_video_enc:
+        # check if image snapshot pipeline was constructed (on every worker)
+        if not all([self._worker_pipeline_name(self.image_snap_name, wn) in self.pipelines_snap and
+                    self._worker_pipeline_name(self.image_encoder_name, wn) in self.pipelines_video_enc
+                    for wn in self._active_workers()]):
             logbook.error("Image snapshot pipeline or encoder pipeline wasn't constructed. Ignoring command.")
             return None
         # extract the camera list from the given parameter
@@ -1060,52 +2261,135 @@ class IngestSession:
             logbook.error(">1 camera requested for image snap, but '{cam_name}' not in filename. Ignoring command.")
             return None
 
-        imgsnap = multiprocessing.Process(target=self._image_snapshot_worker,
-                                          args=(camlist, snap_abs_dir, snap_fn))
-        imgsnap.daemon = True
-        logbook.notice("Starting image snapshot worker process.")
-        try:
-            imgsnap.start()
-            if join is True:
-                logbook.notice("Process started, waiting for completion (join=True).")
-                imgsnap.join()
-            else:
-                logbook.notice("Process started, exiting blocking function.")
-        except multiprocessing.ProcessError:
-            logbook.error("Problem starting image snap worker process.")
-            print_exc()
-        return None
+        job_id, future = self.snapshot_executor.submit('image', self._image_snapshot_worker,
+                                                       camlist, snap_abs_dir, snap_fn)
+        if job_id is None:
+            return None
+        logbook.notice("Queued image snapshot job {}.".format(job_id))
+        if join is True:
+            logbook.notice("Waiting for completion (join=True).")
+            self.snapshot_executor.result(job_id)
+        return job_id
 
     def _video_snapshot_worker(self, duration, snapshot_file_absolute_location):
         """
-        Executes the video snapshot given the final duration and file location. Meant to run in non-blocking mp.Process.
+        Executes the video snapshot given the final duration and file location. Meant to run as a job on the snapshot
+            executor; holds the lock of each worker's video snapshot pipeline for the duration. With multiple workers,
+            each worker's cameras are muxed to their own file, named by adding '_<worker>' to the given file name.
         :param duration: duration of video snapshot in seconds
         :param snapshot_file_absolute_location: absolute file path for video snapshot (only one arg bc muxed video file)
-        :return: snapshot_file_absolute_location if successful
+        :return: list of video snapshot file locations if successful
         """
         try:
-            snapvid_pipeline = self.pipelines_snap[self.video_snap_name]
-            logbook.info("Setting filesink location of video snapshot pipeline.")
-            snapvid_pipeline.set_property(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(self.video_snap_name),
-                                          'location', snapshot_file_absolute_location)
-            logbook.info("Playing {} pipeline.".format(self.video_snap_name))
-            snapvid_pipeline.play()
+            snap_locations = OrderedDict()
+            pipeline_locks = contextlib.ExitStack()
+            for worker_name in self._active_workers():
+                snap_name = self._worker_pipeline_name(self.video_snap_name, worker_name)
+                pipeline_locks.enter_context(self.snapshot_executor.pipeline_lock(snap_name))
+                if len(self.worker_config) == 1:
+                    snap_location = snapshot_file_absolute_location
+                else:
+                    fp, fe = os.path.splitext(snapshot_file_absolute_location)
+                    snap_location = '{}_{}{}'.format(fp, worker_name, fe)
+                logbook.info("Setting filesink location of video snapshot pipeline {}.".format(snap_name))
+                self.pipelines_snap[snap_name].set_property(PIPE_SINGLE_FILESINK_NAME_FORMATTER.format(snap_name),
+                                                            'location', snap_location)
+                snap_locations[snap_name] = snap_location
+            for snap_name in snap_locations.keys():
+                logbook.info("Playing {} pipeline.".format(snap_name))
+                self.pipelines_snap[snap_name].play()
             logbook.info("Waiting for {} seconds of recording time...".format(duration))
             time.sleep(duration)
-            logbook.info("Sending EOS and stop to {} pipeline.".format(self.video_snap_name))
-            snapvid_pipeline.eos()
-            snapvid_pipeline.stop()
-            logbook.info("Video snapshot complete to {}.".format(snapshot_file_absolute_location))
-            return snapshot_file_absolute_location
+            # wait for EOS from each worker's muxer, so the snapshot files are complete before the pipelines stop
+            logbook.info("Sending EOS and stop to {} pipelines.".format(list(snap_locations.keys())))
+            results = {snap_name: self._eos_and_wait(self.pipelines_snap[snap_name])
+                       for snap_name in snap_locations.keys()}
+            for snap_name, result in results.items():
+                if result['status'] != 'clean':
+                    logbook.error("Video snapshot pipeline {} did not finish cleanly: {}".format(snap_name, result))
+            logbook.info("Video snapshot complete to {}.".format(list(snap_locations.values())))
+            return list(snap_locations.values())
         except (GstdError, GstcError):
             logbook.error("Problem with video snapshot.")
             print_exc()
             return None
+        finally:
+            pipeline_locks.close()
+
+    def _ring_snapshot_worker(self, duration, snapshot_file_absolute_location, trigger_time, pin_key):
+        """
+        Executes a video snapshot from the disk buffer rings. Meant to run as a job on the snapshot executor. Waits
+            until the end of the snapshot has been written to the rings, then stream-copies each camera's chunks, from
+            `buffer_time` before the trigger to `duration` after it, into one file per worker (named as in
+            _video_snapshot_worker) with one video track per camera. Releases the snapshot's pin on the rings.
+        :param duration: duration of video snapshot after the trigger, in seconds
+        :param snapshot_file_absolute_location: absolute file path for video snapshot
+        :param trigger_time: UNIX time of the snapshot trigger
+        :param pin_key: key of this snapshot in self.buffer_ring_pins
+        :return: list of video snapshot file locations if successful
+        """
+        start_time = trigger_time - float(self.video_snap_config.get('buffer_time', DEFAULT_BUFFER_TIME))
+        end_time = trigger_time + duration
+        chunk_time = float(self.video_snap_config.get('buffer_chunk_time', DEFAULT_BUFFER_CHUNK_TIME))
+        list_directory = None
+        try:
+            # chunks are split on keyframes, so the chunk holding the end can run past one chunk length
+            wait_time = end_time + 2 * chunk_time - time.time()
+            if wait_time > 0:
+                logbook.info("Waiting for {:.1f} seconds of recording time...".format(wait_time))
+                time.sleep(wait_time)
+            list_directory = tempfile.mkdtemp(prefix='.vidsnap_', dir=os.path.dirname(snapshot_file_absolute_location))
+            snap_locations = []
+            for worker_name in self._active_workers():
+                if len(self.worker_config) == 1:
+                    snap_location = snapshot_file_absolute_location
+                else:
+                    fp, fe = os.path.splitext(snapshot_file_absolute_location)
+                    snap_location = '{}_{}{}'.format(fp, worker_name, fe)
+                cmd = ['ffmpeg', '-v', 'error', '-y']
+                num_inputs = 0
+                for cam_name in self._worker_cameras(worker_name):
+                    chunks = self._ring_chunks(cam_name)
+                    # each chunk covers the time from the previous chunk's end to its own
+                    previous_ends = [0.] + [chunk[0] for chunk in chunks[:-1]]
+                    paths = [chunk[1] for chunk, previous_end in zip(chunks, previous_ends)
+                             if chunk[0] >= start_time and previous_end <= end_time]
+                    if len(paths) == 0:
+                        logbook.warning("No buffered video of {} for video snapshot.".format(cam_name))
+                        continue
+                    list_file = os.path.join(list_directory, '{}.txt'.format(cam_name))
+                    with open(list_file, 'w') as f:
+                        f.writelines(["file '{}'\n".format(path.replace("'", "'\\''")) for path in paths])
+                    cmd += ['-f', 'concat', '-safe', '0', '-i', list_file]
+                    num_inputs += 1
+                if num_inputs == 0:
+                    logbook.error("No buffered video for video snapshot {}.".format(snap_location))
+                    continue
+                for input_index in range(num_inputs):
+                    cmd += ['-map', '{}:v'.format(input_index)]
+                cmd += ['-c', 'copy', snap_location]
+                fcp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+                if fcp.returncode != 0:
+                    logbook.error("Video snapshot {} failed: {}".format(snap_location, fcp.stderr.strip()))
+                    continue
+                snap_locations.append(snap_location)
+            logbook.info("Video snapshot complete to {}.".format(snap_locations))
+            return snap_locations
+        except OSError:
+            logbook.error("Problem with video snapshot.")
+            print_exc()
+            return None
+        finally:
+            with self.buffer_ring_lock:
+                self.buffer_ring_pins.pop(pin_key, None)
+            if list_directory is not None:
+                shutil.rmtree(list_directory, ignore_errors=True)
 
     def take_video_snapshot(self, duration=None, file_relative_location=None, file_absolute_location=None, join=False):
         """
         Takes a snapshot of video from each camera, beginning with the buffered backlog of video. This allows the
-            video snapshot trigger to grab video from a little while ago. Buffer length specified in config file.
+            video snapshot trigger to grab video from a little while ago. Buffer length specified in config file. With
+            `buffer_backend==disk`, the snapshot is copied from the buffer rings (see _ring_snapshot_worker).
         :param duration: duration of video snapshot in seconds (min=5; max=3600); order of precendence:
             1) function args, 2) config file, 3) parameters.py
         :param file_relative_location: relative location (directory + filename) inside session storage directory; valid
@@ -1113,11 +2397,17 @@ class IngestSession:
             datetime, and '{datetime_unix}' = UNIX timestamp
         :param file_absolute_location: (overrides relative location) absolute directory + filename; see
             `file_relative_location` parameter description for filename placeholders
-        :param join: T/F wait for snapshot to complete (i.e., call multiprocessing.Process.join())
-        :return: None
-        """
-        # check if video snapshot pipeline was constructed
-        if self.video_snap_name not in self.pipelines_snap:
+        :param join: T/F wait for snapshot to complete
+        :return: snapshot job id (see `snapshot_status`), or None if the command was rejected
+        """
+        trigger_time = time.time()
+        # check if video snapshot pipeline (or buffer rings) was constructed (on every worker)
+        if self.buffer_backend == 'disk':
+            if len(self.buffer_rings) == 0:
+                logbook.error("Video buffer rings weren't constructed. Ignoring command.")
+                return None
+        elif not all([self._worker_pipeline_name(self.video_snap_name, wn) in self.pipelines_snap
+                    for wn in self._active_workers()]):
             logbook.error("Video snapshot pipeline wasn't constructed. Ignoring command.")
             return None
         # get the recording duration from the appropriate source
@@ -1165,48 +2455,69 @@ class IngestSession:
             datetime_unix=str(time.time())[:-3])
         logbook.notice("Final video snap location: {}".format(snap_abs_fn))
 
-        vidsnap = multiprocessing.Process(target=self._video_snapshot_worker,
-                                          args=(snap_duration, snap_abs_fn))
-        vidsnap.daemon = True
-        logbook.notice("Starting video snapshot worker process.")
-        try:
-            vidsnap.start()
-            if join is True:
-                logbook.notice("Process started, waiting for completion (join=True).")
-                vidsnap.join()
-            else:
-                logbook.notice("Process started, exiting blocking function.")
-        except multiprocessing.ProcessError:
-            logbook.error("Problem starting video snap worker process.")
-            print_exc()
-        return None
+        if self.buffer_backend == 'disk':
+            # keep the rings' chunks from being deleted until the snapshot has copied them
+            pin_key = (snap_abs_fn, trigger_time)
+            with self.buffer_ring_lock:
+                self.buffer_ring_pins[pin_key] = trigger_time
+            job_id, future = self.snapshot_executor.submit('video', self._ring_snapshot_worker, snap_duration,
+                                                           snap_abs_fn, trigger_time, pin_key)
+            if job_id is None:
+                with self.buffer_ring_lock:
+                    self.buffer_ring_pins.pop(pin_key, None)
+        else:
+            job_id, future = self.snapshot_executor.submit('video', self._video_snapshot_worker,
+                                                           snap_duration, snap_abs_fn)
+        if job_id is None:
+            return None
+        logbook.notice("Queued video snapshot job {}.".format(job_id))
+        if join is True:
+            logbook.notice("Waiting for completion (join=True).")
+            self.snapshot_executor.result(job_id)
+        return job_id
+
+    def snapshot_status(self, job_id=None):
+        """
+        Reports on snapshot jobs.
+        :param job_id: (optional) snapshot job id returned by `take_image_snapshot` or `take_video_snapshot`
+        :return: if `job_id` is given, dictionary {'state': 'pending'/'running'/'done'/'failed'/'unknown', 'result':
+            snapshot file names (when done)}; otherwise, snapshot executor metrics (counts and timing per job type)
+        """
+        if job_id is None:
+            return self.snapshot_executor.metrics()
+        job = self.snapshot_executor.job(job_id)
+        if job is None:
+            return {'state': 'unknown', 'result': None}
+        if job['started'] is None:
+            return {'state': 'pending', 'result': None}
+        if job['finished'] is None:
+            return {'state': 'running', 'result': None}
+        if job['future'].exception() is not None:
+            return {'state': 'failed', 'result': None}
+        return {'state': 'done', 'result': job['future'].result()}
 
     def stop_all_pipelines(self):
         """
-        Sends EOS signal to recording and encoder pipelines, then calls stop command on all instantiated pipelines.
-        :return: None
-        """
-        logbook.notice("Sending EOS for relevant pipelines and stopping all pipelines. This will take a few seconds.")
-        # send the end of stream (EOS) signals first
-        for group in (self.pipelines_video_rec, self.pipelines_video_enc):
-            for pipeline_name, pipeline in group.items():
-                try:
-                    logbook.info("Sending EOS to {}.".format(pipeline_name))
-                    pipeline.eos()
-                except:
-                    logbook.warning("Couldn't EOS {}.".format(pipeline_name))
-                    print_exc()
-        logbook.info("Waiting a bit for EOS to take effect.")
-        time.sleep(10)
-        # now stop each pipeline
-        for group in (self.pipelines_snap, self.pipelines_video_rec, self.pipelines_video_enc,
-                      self.pipelines_video_buffer, self.pipelines_cameras):
-            for pipeline_name, pipeline in group.items():
-                try:
-                    logbook.info("Stopping {}.".format(pipeline_name))
-                    pipeline.stop()
-                except:
-                    logbook.warning("Couldn't stop {}.".format(pipeline_name))
+        Sends EOS to recording pipelines concurrently and waits for each to finish (see _eos_and_wait), then stops all
+            other instantiated pipelines concurrently. Image encoder pipelines are only stopped: they are idle (stopped)
+            between snapshots, and a stopped pipeline never posts EOS. Pipelines already shut down (e.g., by
+            stop_persistent_recording_all_cameras) are skipped.
+        :return: dictionary of shutdown outcome per pipeline, including those shut down earlier
+        """
+        logbook.notice("Sending EOS for relevant pipelines and stopping all pipelines.")
+        eos_pipelines = OrderedDict([(name, pipeline) for name, pipeline in self.pipelines_video_rec.items()
+                                     if name not in self.shutdown_report])
+        self._shutdown_pipelines(eos_pipelines, eos=True, timeout=PIPELINE_EOS_TIMEOUT)
+        # sources are stopped only after everything downstream has finished
+        stop_pipelines = OrderedDict([(name, pipeline) for group in (self.pipelines_snap, self.pipelines_video_enc,
+                                                                     self.pipelines_video_buffer,
+                                                                     self.pipelines_cameras, self.pipelines_previews)
+                                      for name, pipeline in group.items() if name not in self.shutdown_report])
+        self._shutdown_pipelines(stop_pipelines, eos=False)
+        clean = [name for name, result in self.shutdown_report.items() if result['status'] in ('clean', 'stopped')]
+        logbook.notice("SHUTDOWN: {} of {} pipelines finished cleanly; not clean: {}".format(
+            len(clean), len(self.shutdown_report), [name for name in self.shutdown_report if name not in clean]))
+        return self.shutdown_report
 
     def deconstruct_all_pipelines(self):
         """
@@ -1214,34 +2525,53 @@ class IngestSession:
         :return: None
         """
         logbook.notice("Deconstructing all pipelines.")
-        for group in (self.pipelines_snap, self.pipelines_video_rec, self.pipelines_video_enc,
-                      self.pipelines_video_buffer, self.pipelines_cameras):
-            for pipeline_name, pipeline in group.items():
-                try:
-                    logbook.info("Deleting {} pipeline.".format(pipeline_name))
-                    pipeline.delete()
-                    logbook.info("Deleted {}.".format(pipeline_name))
-                except (GstcError, GstdError):
-                    logbook.warning("Exception while deleting {}.".format(pipeline_name))
-                    print_exc()
+
+        def delete_pipeline(pipeline_name, pipeline):
+            try:
+                logbook.info("Deleting {} pipeline.".format(pipeline_name))
+                pipeline.delete()
+                logbook.info("Deleted {}.".format(pipeline_name))
+            except (GstcError, GstdError):
+                logbook.warning("Exception while deleting {}.".format(pipeline_name))
+                print_exc()
+
+        pipelines = [(name, pipeline) for group in (self.pipelines_snap, self.pipelines_video_rec,
+                                                    self.pipelines_video_enc, self.pipelines_video_buffer,
+                                                    self.pipelines_cameras, self.pipelines_previews)
+                     for name, pipeline in group.items()]
+        if len(pipelines) == 0:
+            return
+        # pipelines are independent once stopped, so they are deleted concurrently
+        with ThreadPoolExecutor(max_workers=len(pipelines), thread_name_prefix='delete') as executor:
+            list(executor.map(lambda item: delete_pipeline(*item), pipelines))
 
     def stop_all_processes(self):
         """
         Stops all persistent/detached processes from session. These should have been added to self.detached_processes.
-            Also stops the logbook queue via its controller at self.logctl.
+            Also cancels queued snapshot jobs, records the session as stopped in the session catalog, and stops the
+            logbook queue via its controller at self.logctl.
         :return: None
         """
+        self.stop_camera_watchdog()
+        self.stop_buffer_manager()
+        self.stop_rollover_scheduler()
+        running = self.snapshot_executor.shutdown()
+        if len(running) > 0:
+            logbook.warning("Snapshot jobs still running at shutdown: {}".format(running))
+        logbook.notice("Snapshot jobs: {}".format(self.snapshot_executor.metrics()))
+        self.update_session_catalog(status='stopped', stop_time=time.time())
         self.logctl.stop()
         for proc in self.detached_processes:
             proc.terminate()
 
     def kill_gstd(self):
         """
-        Stops the GstdManager that was instantiated for this IngestSession.
+        Stops the GstdManagers that were instantiated for this IngestSession (locally-launched workers only).
         return: None
         """
-        logbook.notice("Stopping Gstreamer Daemon.")
-        self.manager.stop()
+        for worker_name, manager in self.managers.items():
+            logbook.notice("Stopping Gstreamer Daemon for worker {}.".format(worker_name))
+            manager.stop()
 
 
 def sigterm_handler(signum, frame):
@@ -1312,6 +2642,8 @@ def main(argv):
         session.construct_pipelines()
         session.start_cameras()
         session.start_buffers()
+        if session.watchdog_config.get('enable', 'false').lower() == 'true':
+            session.start_camera_watchdog()
 
         # run startup test of image and video snapshots if requested
         if startup_test is True:
@@ -1347,6 +2679,8 @@ def main(argv):
         print_exc()
     finally:
         logbook.notice("Shutdown initiated.")
+        # the watchdog must not restart cameras while they are being shut down
+        session.stop_camera_watchdog()
         session.stop_persistent_recording_all_cameras()
         session.stop_all_processes()
         session.stop_all_pipelines()
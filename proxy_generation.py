@@ -0,0 +1,367 @@
+import os
+import sys
+import math
+import time
+import shutil
+import getopt
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from traceback import print_exc
+
+import utilities
+import query_frames
+from parameters import *
+
+
+def proxy_file_paths(proxy_directory, camera_name, video_file_name):
+    """
+    :param proxy_directory: root directory of proxies for the session
+    :param camera_name: camera name (proxies are grouped in one directory per camera)
+    :param video_file_name: recorded segment file name
+    :return: proxy video path, thumbnail strip path
+    """
+    base = os.path.splitext(video_file_name)[0]
+    return (os.path.join(proxy_directory, camera_name, base + '_proxy.mp4'),
+            os.path.join(proxy_directory, camera_name, base + '_thumbs.jpg'))
+
+
+def probe_video(video_file_path):
+    """
+    Run FFprobe query for the video dimensions and duration of a recorded segment (container only, no decoding).
+    :param video_file_path: path to video file
+    :return: dictionary {'width': int, 'height': int, 'duration': float}; None if query failed
+    """
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height:format=duration",
+           "-of", "default=noprint_wrappers=1", video_file_path]
+    pcp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    info = {}
+    for line in pcp.stdout.strip().split('\n'):
+        if '=' in line:
+            k, v = line.split('=', 1)
+            info[k] = v
+    try:
+        return {'width': int(info['width']), 'height': int(info['height']), 'duration': float(info['duration'])}
+    except (KeyError, ValueError):
+        print("INVALID OUTPUT FROM FFPROBE COMMAND")
+        print("STDOUT:", pcp.stdout)
+        print("STDERR:", pcp.stderr)
+        return None
+
+
+class ResourceThrottle:
+    """
+    Holds back background work while the machine is busy with live recording: waits before each job until total CPU
+        utilization and disk busy time (over a short sample) are under their limits.
+    """
+    def __init__(self, max_cpu_percent=DEFAULT_PROXY_MAX_CPU_PERCENT,
+                 max_disk_busy_percent=DEFAULT_PROXY_MAX_DISK_BUSY_PERCENT, sample_seconds=1.0, max_wait=None):
+        """
+        :param max_cpu_percent: total CPU utilization (0-100) above which jobs wait
+        :param max_disk_busy_percent: disk busy time (0-100, across all disks) above which jobs wait; not checked on
+            platforms that do not report disk busy time
+        :param sample_seconds: length of each utilization sample
+        :param max_wait: maximum seconds to hold a job (default: no limit)
+        :return: None
+        """
+        self.max_cpu_percent = max_cpu_percent
+        self.max_disk_busy_percent = max_disk_busy_percent
+        self.sample_seconds = sample_seconds
+        self.max_wait = max_wait
+        self.waited_seconds = 0.
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """
+        :return: CPU utilization percent, disk busy percent (None if not available) over one sample period
+        """
+        import psutil
+        io0 = psutil.disk_io_counters()
+        t0 = time.time()
+        cpu = psutil.cpu_percent(interval=self.sample_seconds)
+        io1 = psutil.disk_io_counters()
+        busy = None
+        if io0 is not None and io1 is not None and hasattr(io0, 'busy_time'):
+            # busy_time is in milliseconds, summed over disks
+            busy = 100. * (io1.busy_time - io0.busy_time) / ((time.time() - t0) * 1000.)
+        return cpu, busy
+
+    def wait(self):
+        """
+        Blocks until the machine is under the utilization limits (one job is released per sample).
+        :return: None
+        """
+        with self._lock:
+            t0 = time.time()
+            while True:
+                cpu, busy = self.sample()
+                if cpu <= self.max_cpu_percent and (busy is None or busy <= self.max_disk_busy_percent):
+                    break
+                if self.max_wait is not None and time.time() - t0 > self.max_wait:
+                    break
+            self.waited_seconds += time.time() - t0
+
+
+def _low_priority(cmd):
+    # run as the lowest CPU priority and idle I/O class, where the tools exist
+    if shutil.which('ionice') is not None:
+        cmd = ['ionice', '-c', '3'] + cmd
+    if shutil.which('nice') is not None:
+        cmd = ['nice', '-n', '19'] + cmd
+    return cmd
+
+
+def _run_ffmpeg(cmd, output_path):
+    # write to a temporary file beside the output, then rename, so a partial output is never taken as finished
+    base, ext = os.path.splitext(output_path)
+    tmp_path = base + '.tmp' + ext
+    fcp = subprocess.run(args=_low_priority(cmd + [tmp_path]), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True)
+    if fcp.returncode != 0 or not os.path.exists(tmp_path):
+        print("FFMPEG FAILED FOR {}".format(output_path))
+        print("STDERR:", fcp.stderr[-2000:])
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, output_path)
+    return True
+
+
+def generate_proxy(video_file_path, proxy_path, height=DEFAULT_PROXY_HEIGHT, crf=DEFAULT_PROXY_CRF,
+                   threads=DEFAULT_PROXY_FFMPEG_THREADS, video_info=None):
+    """
+    Writes a low-resolution proxy of a recorded segment. Streams that are already at or below the proxy height are
+        stream-copied (remuxed) instead of re-encoded.
+    :param video_file_path: path to recorded segment
+    :param proxy_path: path of proxy video to write
+    :param height: proxy height in pixels (width keeps the aspect ratio)
+    :param crf: x264 constant rate factor of the proxy
+    :param threads: FFmpeg threads (keep low, to leave CPU for recording)
+    :param video_info: optional result of probe_video(video_file_path)
+    :return: T/F proxy was written
+    """
+    if video_info is not None and video_info['height'] <= height:
+        codec = ["-c", "copy"]
+    else:
+        codec = ["-vf", "scale=-2:{}".format(height), "-c:v", "libx264", "-preset", "veryfast", "-crf", str(crf),
+                 "-pix_fmt", "yuv420p"]
+    cmd = (["ffmpeg", "-v", "error", "-y", "-threads", str(threads), "-i", video_file_path, "-an"] + codec +
+           ["-threads", str(threads), "-movflags", "+faststart"])
+    return _run_ffmpeg(cmd, proxy_path)
+
+
+def generate_thumbnail_strip(video_file_path, thumbnail_path, interval=DEFAULT_THUMBNAIL_INTERVAL,
+                             height=DEFAULT_THUMBNAIL_HEIGHT, columns=DEFAULT_THUMBNAIL_COLUMNS,
+                             threads=DEFAULT_PROXY_FFMPEG_THREADS, video_info=None):
+    """
+    Writes one JPEG image tiling a thumbnail every `interval` seconds of a recorded segment. Only keyframes are decoded
+        (-skip_frame nokey), so each thumbnail is the first keyframe at or after each interval.
+    :param video_file_path: path to recorded segment
+    :param thumbnail_path: path of the JPEG image to write
+    :param interval: seconds between thumbnails
+    :param height: thumbnail height in pixels
+    :param columns: thumbnails per row of the image
+    :param threads: FFmpeg threads
+    :param video_info: optional result of probe_video(video_file_path), to size the image to the segment duration
+    :return: T/F thumbnail image was written
+    """
+    count = max(1, int(math.ceil(video_info['duration'] / interval))) if video_info is not None else columns
+    tile = "{}x{}".format(min(count, columns), int(math.ceil(count / columns)))
+    select = "select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{})'".format(interval)
+    cmd = ["ffmpeg", "-v", "error", "-y", "-threads", str(threads), "-skip_frame", "nokey", "-i", video_file_path,
+           "-vf", "{},scale=-2:{},tile={}".format(select, height, tile), "-vsync", "vfr", "-frames:v", "1",
+           "-q:v", "4"]
+    return _run_ffmpeg(cmd, thumbnail_path)
+
+
+def process_segment(video_file, proxy_directory, throttle=None, make_proxy=True, make_thumbnails=True):
+    """
+    Generates the proxy and/or thumbnail strip of one recorded segment, skipping outputs that already exist.
+    :param video_file: tuple (file directory, filename, segment_number, camera_name), as from utilities.find_files
+    :param proxy_directory: root directory of proxies for the session
+    :param throttle: optional ResourceThrottle to wait on before starting
+    :param make_proxy: T/F generate proxy video
+    :param make_thumbnails: T/F generate thumbnail strip
+    :return: dictionary {'proxy': T/F/None, 'thumbnails': T/F/None, 'seconds': float} (None = skipped)
+    """
+    vfdr, vfn, vfi, vfc = video_file
+    proxy_path, thumbnail_path = proxy_file_paths(proxy_directory, vfc, vfn)
+    result = {'proxy': None, 'thumbnails': None, 'seconds': 0.}
+    todo_proxy = make_proxy is True and not os.path.exists(proxy_path)
+    todo_thumbnails = make_thumbnails is True and not os.path.exists(thumbnail_path)
+    if not todo_proxy and not todo_thumbnails:
+        return result
+    if throttle is not None:
+        throttle.wait()
+    t0 = time.time()
+    os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+    video_file_path = os.path.join(vfdr, vfn)
+    video_info = probe_video(video_file_path)
+    if todo_proxy:
+        result['proxy'] = generate_proxy(video_file_path, proxy_path, video_info=video_info)
+    if todo_thumbnails:
+        result['thumbnails'] = generate_thumbnail_strip(video_file_path, thumbnail_path, video_info=video_info)
+    result['seconds'] = time.time() - t0
+    return result
+
+
+def is_processed(video_file, proxy_directory, make_proxy=True, make_thumbnails=True):
+    """
+    :return: T/F every requested output of the segment already exists
+    """
+    proxy_path, thumbnail_path = proxy_file_paths(proxy_directory, video_file[3], video_file[1])
+    return ((make_proxy is False or os.path.exists(proxy_path)) and
+            (make_thumbnails is False or os.path.exists(thumbnail_path)))
+
+
+def generate_session_proxies(video_files, proxy_directory, workers=DEFAULT_PROXY_WORKERS, throttle=None,
+                             make_proxy=True, make_thumbnails=True):
+    """
+    Processes recorded segments with a bounded pool of workers (each running one FFmpeg process at a time). Segments are
+        submitted lazily, so `video_files` may be a generator (e.g., query_frames.watch_recording_segments).
+    :param video_files: iterable of tuples (file directory, filename, segment_number, camera_name)
+    :param proxy_directory: root directory of proxies for the session
+    :param workers: maximum number of segments processed concurrently
+    :param throttle: optional ResourceThrottle
+    :param make_proxy: T/F generate proxy videos
+    :param make_thumbnails: T/F generate thumbnail strips
+    :return: dictionary of counts {'processed', 'skipped', 'failed'}
+    """
+    counts = {'processed': 0, 'skipped': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(workers)
+
+    def count(outcome):
+        # callbacks run in the worker threads
+        with counts_lock:
+            counts[outcome] += 1
+
+    def done(future, video_file):
+        in_flight.release()
+        try:
+            result = future.result()
+        except Exception:
+            print_exc()
+            count('failed')
+            return
+        if result['proxy'] is None and result['thumbnails'] is None:
+            count('skipped')
+        elif False in (result['proxy'], result['thumbnails']):
+            count('failed')
+        else:
+            count('processed')
+            print("Processed {} in {:.1f} seconds.".format(video_file[1], result['seconds']))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for video_file in video_files:
+            # hold back submission while all workers are busy, so a long backlog isn't queued all at once
+            in_flight.acquire()
+            future = executor.submit(process_segment, video_file, proxy_directory, throttle, make_proxy,
+                                     make_thumbnails)
+            future.add_done_callback(lambda f, vf=video_file: done(f, vf))
+    return counts
+
+
+def main(argv):
+    usage = """
+    proxy_generation.py [-h] -s <session-directory> [-o <proxy-directory>] [-w <workers>] [-d] [--watch]
+    -h/--help: print usage information, then exit
+    -s/--session_directory= : (required) session directory
+    -o/--output_directory= : root directory for proxies and thumbnails (default: {} in the session directory)
+    -w/--workers= : number of segments processed concurrently (default {})
+    -d/--drop_last_file: do not process the last segment of each camera (recording in progress)
+    -i/--input_filename= : comma-delineated list of file name fragments to narrow down video segment files
+    --no_proxy: do not generate proxy videos
+    --no_thumbnails: do not generate thumbnail strips
+    --max_cpu= : total CPU percent above which new jobs wait (default {})
+    --max_disk_busy= : disk busy percent above which new jobs wait (default {})
+    --watch: follow the recording directories and process each segment once it is closed (see query_frames.py)
+    --poll_interval= : with --watch, seconds between scans of the recording directories (default {})
+    --idle_exit= : with --watch, stop after no new segment has appeared for this many seconds
+    """.format(DEFAULT_PROXY_DIRECTORY, DEFAULT_PROXY_WORKERS, DEFAULT_PROXY_MAX_CPU_PERCENT,
+               DEFAULT_PROXY_MAX_DISK_BUSY_PERCENT, DEFAULT_WATCH_POLL_INTERVAL)
+    try:
+        opts, args = getopt.getopt(argv, 'hs:o:w:di:', ['help', 'session_directory=', 'output_directory=', 'workers=',
+                                                       'drop_last_file', 'input_filename=', 'no_proxy',
+                                                       'no_thumbnails', 'max_cpu=', 'max_disk_busy=', 'watch',
+                                                       'poll_interval=', 'idle_exit='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    session_directory = None
+    proxy_directory = None
+    workers = DEFAULT_PROXY_WORKERS
+    drop_last_file = False
+    input_filename_filters = None
+    make_proxy = True
+    make_thumbnails = True
+    max_cpu = DEFAULT_PROXY_MAX_CPU_PERCENT
+    max_disk_busy = DEFAULT_PROXY_MAX_DISK_BUSY_PERCENT
+    watch = False
+    poll_interval = DEFAULT_WATCH_POLL_INTERVAL
+    idle_exit = None
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-s', '--session_directory'):
+            session_directory = arg
+        elif opt in ('-o', '--output_directory'):
+            proxy_directory = arg
+        elif opt in ('-w', '--workers'):
+            workers = int(arg)
+        elif opt in ('-d', '--drop_last_file'):
+            drop_last_file = True
+        elif opt in ('-i', '--input_filename'):
+            input_filename_filters = arg.split(',')
+        elif opt == '--no_proxy':
+            make_proxy = False
+        elif opt == '--no_thumbnails':
+            make_thumbnails = False
+        elif opt == '--max_cpu':
+            max_cpu = float(arg)
+        elif opt == '--max_disk_busy':
+            max_disk_busy = float(arg)
+        elif opt == '--watch':
+            watch = True
+        elif opt == '--poll_interval':
+            poll_interval = float(arg)
+        elif opt == '--idle_exit':
+            idle_exit = float(arg)
+    if session_directory is None:
+        print("Must supply session directory.")
+        print("Usage:", usage)
+        sys.exit(2)
+    if proxy_directory is None:
+        proxy_directory = os.path.join(session_directory, DEFAULT_PROXY_DIRECTORY)
+
+    recording_directories, recording_filenames, camera_names = utilities.get_recording_params(
+        session_root_directory=session_directory)
+    throttle = ResourceThrottle(max_cpu_percent=max_cpu, max_disk_busy_percent=max_disk_busy)
+    if watch is True:
+        video_files = query_frames.watch_recording_segments(
+            recording_directories=recording_directories, file_name_formats=recording_filenames,
+            camera_names=camera_names, filter_filenames=input_filename_filters, poll_interval=poll_interval,
+            idle_exit=idle_exit, skip=lambda vf: is_processed(vf, proxy_directory, make_proxy, make_thumbnails))
+    else:
+        video_files = [vf for vf in utilities.find_files(recording_directories=recording_directories,
+                                                         file_name_formats=recording_filenames,
+                                                         camera_names=camera_names, drop_last_file=drop_last_file,
+                                                         filter_filenames=input_filename_filters)
+                       if not is_processed(vf, proxy_directory, make_proxy, make_thumbnails)]
+        print("{} segments to process.".format(len(video_files)))
+    t0 = time.time()
+    try:
+        counts = generate_session_proxies(video_files, proxy_directory, workers=workers, throttle=throttle,
+                                          make_proxy=make_proxy, make_thumbnails=make_thumbnails)
+    except KeyboardInterrupt:
+        print("Stopped; finished outputs are kept and the rest will be processed on the next run.")
+        sys.exit()
+    print("Processed {processed}, skipped {skipped}, failed {failed} segments".format(**counts) +
+          " in {:.0f} seconds ({:.0f} seconds held back by throttling).".format(time.time() - t0,
+                                                                               throttle.waited_seconds))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
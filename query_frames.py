@@ -10,6 +10,8 @@ import time
 import pickle
 
 import utilities
+import segment_integrity
+import session_catalog
 from parameters import *
 
 
@@ -27,7 +29,7 @@ def get_video_frame_counts(video_file_names):
         if i % 500 == 0:
             print("Query number {}".format(i))
         cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=nb_frames",
-               "-of", "default=nokey=1:noprint_wrappers=1", vfn]
+               "-of", "default=nokey=1:noprint_wrappers=1", os.path.join(vfdr, vfn)]
         fcp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
         try:
             frame_counts[vfn] = int(fcp.stdout)
@@ -35,31 +37,63 @@ def get_video_frame_counts(video_file_names):
             print("INVALID OUTPUT FROM FFPROBE COMMAND")
             print("STDOUT:", fcp.stdout)
             print("STDERR:", fcp.stderr)
+            # e.g., a segment left without its index by a crash; see segment_integrity.py for salvage
+            integrity = segment_integrity.scan_segment(os.path.join(vfdr, vfn))
+            print("SEGMENT STRUCTURE: {} {}".format(integrity['status'], integrity['detail']))
             print_exc()
     return frame_counts
 
 
-def get_video_frame_timestamps(video_file_names):
+def get_video_frame_timestamps(video_file_names, incremental=True, store=None, decoders=None):
     """
-    Run frame timestamp parsing for recorded video segments.
-    :param video_file_names: list of video file names to query for frame counts
-    :return: dictionary of list of frame timestamps {video-file-name: list-frame-timestamps, ...}
+    Run frame timestamp parsing for recorded video segments. Uses one incremental decoder per camera, which carries the
+        decoded value across consecutive frames (and segments, which are in order per camera) and flags anomalies.
+    :param video_file_names: list of tuples (video-file-dir., video-file-name, segment-number, cam-name)
+    :param incremental: T/F use the incremental decoder (utilities.TimestampDecoder); otherwise parse every frame fully
+    :param store: optional FrameTimestampStore; each segment is appended as soon as it is finished, and segments
+        already in the store are skipped (resume)
+    :param decoders: optional dictionary of decoders by camera {cam-name: TimestampDecoder, ...}, which is updated in
+        place; pass the same dictionary to successive calls to keep decoding continuous across them (watch mode)
+    :return: dictionary of list of frame timestamps {video-file-name: list-frame-timestamps, ...},
+        dictionary of list of anomalies {video-file-name: [(frame-index, previous-ts, ts, kind), ...], ...}
     """
     if not isinstance(video_file_names, (list, tuple)):
-        raise TypeError("Must provide list of tuples (video-file-name, segment-number).")
+        raise TypeError("Must provide list of tuples (video-file-dir., video-file-name, segment-number, cam-name).")
     import cv2
     timestamp_geom = utilities.get_timestamp_geometry()
     timestamp_checksums = utilities.get_precomputed_checksums()
     timestamps = {}
+    anomalies = {}
     pixel_errors = []
-    for i, (vfn, vfi) in enumerate(video_file_names):
+    if decoders is None:
+        decoders = {}
+    last_segment = {}   # {cam-name: last segment number decoded in this call}
+    for vfdr, vfn, vfi, vfc in video_file_names:
+        if store is not None and store.has(vfc, vfi):
+            print("Skipping {}; already in timestamp store.".format(vfn))
+            continue
         t0 = time.time()
-        cap = cv2.VideoCapture(vfn)
+        cap = cv2.VideoCapture(os.path.join(vfdr, vfn))
         assert cap.isOpened(), "Cannot open file \"{}\"".format(vfn)
 
-        # TODO: pull out camera name and segment number extraction into a utility function
-        cam = vfn.split('record_')[1].split('_')[0]
-        print("Processing camera {}".format(cam))
+        print("Processing camera {}".format(vfc))
+        if vfc not in decoders:
+            decoders[vfc] = utilities.TimestampDecoder(timestamp_geometry=timestamp_geom,
+                                                       precomputed_checksums=timestamp_checksums)
+        decoder = decoders[vfc]
+        # the decoder carries over from the camera's previous segment only if it directly precedes this one (segments
+        #   skipped by resume or filters, or missing, would otherwise flag this segment's first frame as a jump)
+        if vfc in last_segment and last_segment[vfc] != vfi - 1:
+            decoder.reset()
+        last_segment[vfc] = vfi
+        # frame indices in anomalies are relative to the start of this file
+        decoder.frame_index = -1
+        file_anomalies = []
+
+        def report_anomaly(anomaly, file_name=vfn, file_anomalies=file_anomalies):
+            file_anomalies.append(anomaly)
+            print("Timestamp anomaly in {} at frame {}: {} -> {} ({})".format(file_name, *anomaly))
+        decoder.anomaly_callback = report_anomaly
         cam_ts = []
         i = 0
         while True:
@@ -67,9 +101,12 @@ def get_video_frame_timestamps(video_file_names):
             if frame is None:
                 print("End of video after {} frames.".format(i))
                 break
-            frame_ts, px_err = utilities.parse_frame_timestamp(timestamp_geometry=timestamp_geom,
-                                                               precomputed_checksums=timestamp_checksums,
-                                                               frame_pixels=frame)
+            if incremental is True:
+                frame_ts, px_err = decoder.decode(frame_pixels=frame)
+            else:
+                frame_ts, px_err = utilities.parse_frame_timestamp(timestamp_geometry=timestamp_geom,
+                                                                   precomputed_checksums=timestamp_checksums,
+                                                                   frame_pixels=frame)
             if frame_ts is not None:
                 cam_ts.append(frame_ts)
             else:
@@ -78,7 +115,10 @@ def get_video_frame_timestamps(video_file_names):
             i += 1
             continue
         timestamps[vfn] = cam_ts
+        anomalies[vfn] = file_anomalies
         cap.release()
+        if store is not None:
+            store.append(vfc, vfi, cam_ts, source=vfn)
         print("{:.1f} fps processing rate".format(i / (time.time() - t0)))
     # if we had any errors in checksum recognition, append them to the running file
     if len(pixel_errors) > 0:
@@ -87,7 +127,248 @@ def get_video_frame_timestamps(video_file_names):
                 pixel_errors = pickle.load(f) + pixel_errors
         with open('./resources/pixel_errors.pkl', 'wb') as f:
             pickle.dump(pixel_errors, f)
-    return timestamps
+    return timestamps, anomalies
+
+
+def get_video_packet_times(video_file_path):
+    """
+    Run FFprobe packet query (container demux only, no decoding) for the presentation times and keyframe flags of
+        every video frame in a recorded segment.
+    :param video_file_path: path to video file
+    :return: list of tuples (presentation-time-seconds, is-keyframe) in presentation order; None if query failed
+    """
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+           "-of", "csv=print_section=0", video_file_path]
+    pcp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    packets = []
+    try:
+        for line in pcp.stdout.strip().split('\n'):
+            pts_time, flags = line.split(',')[:2]
+            packets.append((float(pts_time), 'K' in flags))
+    except ValueError:
+        print("INVALID OUTPUT FROM FFPROBE COMMAND")
+        print("STDOUT:", pcp.stdout[:500])
+        print("STDERR:", pcp.stderr)
+        return None
+    # packets are listed in decode order; frame indices (as seen by OpenCV) are in presentation order
+    return sorted(packets, key=lambda x: x[0])
+
+
+def select_sample_frames(frame_times, keyframes, stride=None, every_seconds=None):
+    """
+    Chooses the frames to decode for sampled timestamp extraction. A sample is moved to the nearest keyframe if one is
+        within half the sampling interval, since a keyframe decodes without its predecessors after a seek.
+    :param frame_times: list of frame presentation times (seconds), in presentation order
+    :param keyframes: list of T/F keyframe flags corresponding to `frame_times`
+    :param stride: sample every N frames (overridden by `every_seconds`)
+    :param every_seconds: sample every S seconds of presentation time
+    :return: sorted list of frame indices to decode (always includes the first and last frames)
+    """
+    import numpy as np
+    num_frames = len(frame_times)
+    if num_frames == 0:
+        return []
+    if every_seconds is not None:
+        # first frame at or after each multiple of the sampling interval
+        times = np.asarray(frame_times, dtype=np.float64)
+        duration = times[-1] - times[0]
+        targets = np.unique(np.searchsorted(times, times[0] + np.arange(0, duration + every_seconds, every_seconds)))
+        targets = [int(t) for t in targets if t < num_frames]
+        frame_rate = (num_frames - 1) / duration if duration > 0 else 1
+        half_window = max(1, int(every_seconds * frame_rate / 2))
+    else:
+        targets = list(range(0, num_frames, stride))
+        half_window = max(1, stride // 2)
+    key_indices = [i for i, k in enumerate(keyframes) if k is True]
+    samples = set()
+    ki = 0
+    for target in targets:
+        # advance to the keyframe nearest the target
+        while ki + 1 < len(key_indices) and abs(key_indices[ki + 1] - target) <= abs(key_indices[ki] - target):
+            ki += 1
+        if len(key_indices) > 0 and abs(key_indices[ki] - target) <= half_window:
+            samples.add(key_indices[ki])
+        else:
+            samples.add(target)
+    samples.add(num_frames - 1)
+    return sorted(samples)
+
+
+def interpolate_frame_timestamps(frame_times, sample_indices, sample_timestamps):
+    """
+    Estimates the timestamp of every frame from the decoded samples, using the container presentation times. Between
+        two samples, timestamps are interpolated linearly in presentation time (absorbing clock drift between the
+        two); before the first and after the last sample, the presentation time offset is added to that sample.
+    :param frame_times: list of frame presentation times (seconds), in presentation order
+    :param sample_indices: frame indices of decoded samples
+    :param sample_timestamps: decoded timestamps for `sample_indices` (None where decoding failed)
+    :return: numpy array of per-frame timestamp estimates, numpy boolean array marking actually-decoded frames
+    """
+    import numpy as np
+    frame_times = np.asarray(frame_times, dtype=np.float64)
+    decoded = np.zeros(len(frame_times), dtype=bool)
+    valid = [(i, ts) for i, ts in zip(sample_indices, sample_timestamps) if ts is not None]
+    if len(valid) == 0:
+        return np.zeros(len(frame_times)), decoded
+    idx = np.array([i for i, ts in valid])
+    ts = np.array([ts for i, ts in valid], dtype=np.float64)
+    decoded[idx] = True
+    estimates = np.interp(frame_times, frame_times[idx], ts)
+    before = frame_times < frame_times[idx[0]]
+    after = frame_times > frame_times[idx[-1]]
+    estimates[before] = ts[0] + (frame_times[before] - frame_times[idx[0]])
+    estimates[after] = ts[-1] + (frame_times[after] - frame_times[idx[-1]])
+    # keep the camera's 0.01 second precision for estimated values
+    estimates[~decoded] = np.round(estimates[~decoded], 2)
+    return estimates, decoded
+
+
+def get_video_frame_timestamps_sampled(video_file_names, stride=None, every_seconds=None, store=None):
+    """
+    Run sampled frame timestamp parsing for recorded video segments: only sampled frames are decoded (seeking to
+        keyframes when possible), and per-frame estimates are interpolated from the container presentation times.
+    :param video_file_names: list of tuples (video-file-dir., video-file-name, segment-number, cam-name)
+    :param stride: sample every N frames
+    :param every_seconds: sample every S seconds (takes precedence over `stride`)
+    :param store: optional FrameTimestampStore; each segment is appended (with decoded-frame flags) as soon as it is
+        finished, and segments already in the store are skipped (resume)
+    :return: dictionary of per-frame timestamp estimates {video-file-name: list-frame-timestamps, ...},
+        dictionary of decoded samples {video-file-name: [(frame-index, presentation-time, timestamp), ...], ...}
+    """
+    if not isinstance(video_file_names, (list, tuple)):
+        raise TypeError("Must provide list of tuples (video-file-dir., video-file-name, segment-number, cam-name).")
+    if stride is None and every_seconds is None:
+        raise ValueError("Must provide one of `stride` or `every_seconds`.")
+    import cv2
+    timestamp_geom = utilities.get_timestamp_geometry()
+    timestamp_checksums = utilities.get_precomputed_checksums()
+    timestamps = {}
+    samples = {}
+    for vfdr, vfn, vfi, vfc in video_file_names:
+        if store is not None and store.has(vfc, vfi):
+            print("Skipping {}; already in timestamp store.".format(vfn))
+            continue
+        t0 = time.time()
+        video_file_path = os.path.join(vfdr, vfn)
+        packets = get_video_packet_times(video_file_path)
+        if packets is None or len(packets) == 0:
+            print("Could not get packet times for {}; skipping.".format(vfn))
+            continue
+        frame_times, keyframes = zip(*packets)
+        sample_indices = select_sample_frames(frame_times, keyframes, stride=stride, every_seconds=every_seconds)
+        cap = cv2.VideoCapture(video_file_path)
+        assert cap.isOpened(), "Cannot open file \"{}\"".format(vfn)
+        print("Processing camera {}: {} samples of {} frames".format(vfc, len(sample_indices), len(frame_times)))
+        sample_timestamps = []
+        position = 0
+        for idx in sample_indices:
+            # short hops are cheaper by grabbing (no conversion) than by seeking back to a keyframe and decoding forward
+            if 0 <= idx - position <= DEFAULT_TIMESTAMP_SEEK_THRESHOLD:
+                for _ in range(idx - position):
+                    cap.grab()
+            else:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = cap.read()
+            position = idx + 1
+            if frame is None:
+                sample_timestamps.append(None)
+                continue
+            frame_ts, px_err = utilities.parse_frame_timestamp(timestamp_geometry=timestamp_geom,
+                                                               precomputed_checksums=timestamp_checksums,
+                                                               frame_pixels=frame)
+            sample_timestamps.append(frame_ts)
+        cap.release()
+        estimates, decoded = interpolate_frame_timestamps(frame_times, sample_indices, sample_timestamps)
+        timestamps[vfn] = estimates.tolist()
+        samples[vfn] = [(i, frame_times[i], ts) for i, ts in zip(sample_indices, sample_timestamps)]
+        if store is not None:
+            store.append(vfc, vfi, estimates, decoded=decoded, source=vfn)
+        print("{:.1f} fps effective processing rate".format(len(frame_times) / (time.time() - t0)))
+    return timestamps, samples
+
+
+def scan_recording_segments(recording_directories, file_name_formats, camera_names, first_file_index=0,
+                            filter_filenames=None):
+    """
+    Lightweight version of utilities.find_files(...) for repeated polling: each distinct directory is scanned once with
+        os.scandir, and the modification time of each matching file is returned with it.
+    :param recording_directories: list of directories in which to search for files; each corresponding to camera_names
+    :param file_name_formats: list of file name formats used for recording; each corresponding to camera_names
+    :param camera_names: list of camera names
+    :param first_file_index: minimum recording segment number to keep files
+    :param filter_filenames: list of filters to narrow down filenames (tested by `if any filter in filename`)
+    :return: list of tuples (file directory, filename, segment_number, camera_name, modification-time), sorted by
+        camera and segment number
+    """
+    directory_entries = {}
+    for rdir in set(recording_directories):
+        try:
+            with os.scandir(rdir) as it:
+                directory_entries[rdir] = [(entry.name, entry.stat().st_mtime) for entry in it if entry.is_file()]
+        except FileNotFoundError:
+            # directory not created yet (recording not started) or file removed between listing and stat
+            directory_entries[rdir] = []
+    file_name_regexs = [utilities.recording_file_regex(fnf) for fnf in file_name_formats]
+    match_files = []
+    for cn, rdir, fnr in zip(camera_names, recording_directories, file_name_regexs):
+        for fl, mtime in directory_entries[rdir]:
+            rem = re.search(fnr, fl)
+            if rem is not None and int(rem.group('segment')) >= first_file_index:
+                match_files.append((rdir, fl, int(rem.group('segment')), cn, mtime))
+    if filter_filenames is not None:
+        match_files = [fn for fn in match_files if
+                       any([fn_filt in os.path.join(fn[0], fn[1]) for fn_filt in filter_filenames])]
+    return sorted(match_files, key=lambda x: (x[3], x[2]))
+
+
+def watch_recording_segments(recording_directories, file_name_formats, camera_names, first_file_index=0,
+                             filter_filenames=None, poll_interval=DEFAULT_WATCH_POLL_INTERVAL,
+                             settle_time=DEFAULT_WATCH_SETTLE_TIME, idle_exit=None, skip=None):
+    """
+    Follows the recording directories and yields each segment once splitmuxsink has closed it. A segment is closed
+        when a later segment of the same camera exists and the segment file has not been modified for `settle_time`
+        seconds; the newest segment of each camera is still being written and is held back.
+    :param recording_directories: list of directories in which to search for files; each corresponding to camera_names
+    :param file_name_formats: list of file name formats used for recording; each corresponding to camera_names
+    :param camera_names: list of camera names
+    :param first_file_index: minimum recording segment number to process
+    :param filter_filenames: list of filters to narrow down filenames (tested by `if any filter in filename`)
+    :param poll_interval: seconds between directory scans
+    :param settle_time: seconds a segment file must be unmodified before it is processed
+    :param idle_exit: if given, stop after no new segment has appeared for this many seconds (recording stopped);
+        the last segment of each camera is then processed once it has settled
+    :param skip: optional function f(file-tuple) -> T/F to pass over segments already processed (resume)
+    :return: generator of tuples (file directory, filename, segment_number, camera_name), per camera in segment order
+    """
+    processed = set()
+    last_new_segment = time.time()
+    newest = {}
+    while True:
+        segments = scan_recording_segments(recording_directories=recording_directories,
+                                           file_name_formats=file_name_formats, camera_names=camera_names,
+                                           first_file_index=first_file_index, filter_filenames=filter_filenames)
+        now = time.time()
+        for vfdr, vfn, vfi, vfc, mtime in segments:
+            if vfi > newest.get(vfc, -1):
+                newest[vfc] = vfi
+                last_new_segment = now
+        idle = idle_exit is not None and now - last_new_segment > idle_exit
+        pending = 0
+        for vfdr, vfn, vfi, vfc, mtime in segments:
+            if (vfc, vfi) in processed:
+                continue
+            if skip is not None and skip((vfdr, vfn, vfi, vfc)) is True:
+                processed.add((vfc, vfi))
+                continue
+            if (vfi == newest[vfc] and idle is False) or now - mtime < settle_time:
+                pending += 1
+                continue
+            processed.add((vfc, vfi))
+            yield vfdr, vfn, vfi, vfc
+        if idle is True and pending == 0:
+            print("No new segments for {} seconds; stopping watch.".format(idle_exit))
+            return
+        time.sleep(poll_interval)
 
 
 def write_frame_count_results(results_dict, filename, print_results=False):
@@ -129,6 +410,57 @@ def write_frame_timestamp_results(results_dict, filename):
     return
 
 
+def write_frame_timestamp_samples(samples_dict, filename):
+    """
+    Write the decoded samples from sampled frame timestamp extraction to CSV file, one row per decoded frame.
+    :param samples_dict: dictionary of {filename: [(frame-index, presentation-time, timestamp), ...]}
+    :param filename: file path where to save results
+    :return: None
+    """
+    with open(filename, 'w') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["filename", "frame-index", "presentation-time", "timestamp"])
+        for fn, fsm in sorted(list(samples_dict.items()), key=lambda x: x[0]):
+            for idx, pts, ts in fsm:
+                writer.writerow([fn, idx, pts, ts if ts is not None else 0])
+    return
+
+
+def write_frame_timestamp_anomalies(anomalies_dict, filename):
+    """
+    Write the timestamp anomalies flagged during frame timestamp extraction to CSV file, one row per anomaly.
+    :param anomalies_dict: dictionary of {filename: [(frame-index, previous-timestamp, timestamp, kind), ...]}
+    :param filename: file path where to save results
+    :return: None
+    """
+    with open(filename, 'w') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["filename", "frame-index", "previous-timestamp", "timestamp", "kind"])
+        for fn, fan in sorted(list(anomalies_dict.items()), key=lambda x: x[0]):
+            for anomaly in fan:
+                writer.writerow([fn] + list(anomaly))
+    return
+
+
+def append_csv_rows(filename, header, rows):
+    """
+    Appends rows to a semicolon-delimited results file (same format as the write_* functions), writing the header row
+        first if the file does not exist yet. Used by watch mode to add each segment's results as it is processed.
+    :param filename: file path of results
+    :param header: list of column names
+    :param rows: list of rows (lists) to append
+    :return: None
+    """
+    write_header = not os.path.exists(filename)
+    with open(filename, 'a') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+        if write_header is True:
+            writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+    return
+
+
 def read_frame_count_results(file_path):
     """
     Reads a file containing frame counts written from `write_frame_count_results()`.
@@ -188,6 +520,81 @@ def plot_frame_count_results(results_dict, filename, session_info_filename):
     plt.savefig(filename)
 
 
+def watch_session_recordings(recording_directories, file_name_formats, camera_names, count_filename=None,
+                             store=None, timestamp_filename=None, incremental=True, stride=None, every_seconds=None,
+                             first_file_index=0, filter_filenames=None, poll_interval=DEFAULT_WATCH_POLL_INTERVAL,
+                             settle_time=DEFAULT_WATCH_SETTLE_TIME, idle_exit=None, print_output=False):
+    """
+    Live watch mode: runs frame counting and/or timestamp parsing on each recording segment as soon as it is closed,
+        appending the results, so that frame-loss health lags recording by one segment. Segments already in the frame
+        count results file or timestamp store are passed over, so the watch can be restarted at any time.
+    :param recording_directories: list of directories in which to search for files; each corresponding to camera_names
+    :param file_name_formats: list of file name formats used for recording; each corresponding to camera_names
+    :param camera_names: list of camera names
+    :param count_filename: frame count results file to append to; no frame counting if None
+    :param store: FrameTimestampStore to append frame timestamps to; no timestamp parsing if None
+    :param timestamp_filename: frame timestamp results filename, beside which anomalies/samples CSVs are appended
+    :param incremental: T/F use the incremental timestamp decoder (see get_video_frame_timestamps)
+    :param stride: sampled timestamp parsing every N frames (see get_video_frame_timestamps_sampled)
+    :param every_seconds: sampled timestamp parsing every S seconds (see get_video_frame_timestamps_sampled)
+    :param first_file_index: minimum recording segment number to process
+    :param filter_filenames: list of filters to narrow down filenames (tested by `if any filter in filename`)
+    :param poll_interval: seconds between directory scans
+    :param settle_time: seconds a segment file must be unmodified before it is processed
+    :param idle_exit: if given, stop after no new segment has appeared for this many seconds (recording stopped)
+    :param print_output: T/F print frame counts as they are appended
+    :return: None
+    """
+    counted = {}
+    if count_filename is not None and os.path.exists(count_filename):
+        counted = read_frame_count_results(file_path=count_filename)
+    sampled = stride is not None or every_seconds is not None
+    decoders = {}
+    last_segment = {}
+
+    def is_processed(video_file):
+        vfdr, vfn, vfi, vfc = video_file
+        return ((count_filename is None or vfn in counted) and
+                (store is None or store.has(vfc, vfi)))
+
+    print("Watching {} recording directories every {} seconds.".format(len(set(recording_directories)),
+                                                                       poll_interval))
+    for video_file in watch_recording_segments(recording_directories=recording_directories,
+                                               file_name_formats=file_name_formats, camera_names=camera_names,
+                                               first_file_index=first_file_index, filter_filenames=filter_filenames,
+                                               poll_interval=poll_interval, settle_time=settle_time,
+                                               idle_exit=idle_exit, skip=is_processed):
+        vfdr, vfn, vfi, vfc = video_file
+        print("Segment closed: {}".format(os.path.join(vfdr, vfn)))
+        if count_filename is not None and vfn not in counted:
+            file_frame_counts = get_video_frame_counts(video_file_names=[video_file])
+            append_csv_rows(filename=count_filename, header=["filename", "frame-count"],
+                            rows=[[cn, fc] for cn, fc in file_frame_counts.items()])
+            counted.update(file_frame_counts)
+            if print_output is True:
+                for cn, fc in file_frame_counts.items():
+                    print(cn, '-->', fc)
+        if store is not None and not store.has(vfc, vfi):
+            if sampled is True:
+                _, file_samples = get_video_frame_timestamps_sampled(video_file_names=[video_file], stride=stride,
+                                                                     every_seconds=every_seconds, store=store)
+                append_csv_rows(filename=os.path.splitext(timestamp_filename)[0] + '-samples.csv',
+                                header=["filename", "frame-index", "presentation-time", "timestamp"],
+                                rows=[[fn, idx, pts, ts if ts is not None else 0]
+                                      for fn, fsm in file_samples.items() for idx, pts, ts in fsm])
+            else:
+                # the decoder carries over from the previous segment only if it directly precedes this one
+                if last_segment.get(vfc) != vfi - 1:
+                    decoders.pop(vfc, None)
+                _, file_anomalies = get_video_frame_timestamps(video_file_names=[video_file], incremental=incremental,
+                                                               store=store, decoders=decoders)
+                append_csv_rows(filename=os.path.splitext(timestamp_filename)[0] + '-anomalies.csv',
+                                header=["filename", "frame-index", "previous-timestamp", "timestamp", "kind"],
+                                rows=[[fn] + list(anomaly) for fn, fan in file_anomalies.items() for anomaly in fan])
+        last_segment[vfc] = vfi
+    return
+
+
 def main(argv):
     usage = """
     query_frames.py [-h] [-l] -s <session-directory>
@@ -216,14 +623,27 @@ def main(argv):
     -d/--drop_last_file: flag to not query the last file in recording sequence, in case recording is actively occurring
     -p/--plot_output: flag to plot output of frame counting, grouped by pole (same filename as output, but .pdf)
     --print_output: flag to print output of frame counting as it is being written to file
+    --full_decode: flag to parse every digit of every frame timestamp, instead of carrying the previous frame's value
+    --stride= ### : with -t, decode only every Nth frame (moved to a nearby keyframe when possible); other frames are
+        estimated from container presentation times, and decoded samples are written to *-samples.csv
+    --every_seconds= ### : with -t, same as --stride, but sample every N seconds of video (overrides --stride)
+    --store_directory= /path/to/store : with -t, location of the frame timestamp store (default: frame_timestamps in the
+        session directory); segments already in the store are skipped, so an interrupted run resumes
+    --csv: with -t, also export the whole frame timestamp store to CSV (-o/--output_filename= or default filename)
+    --watch: follow the recording directories and process each segment (-c and/or -t) once it is closed, appending to
+        the results; runs until interrupted (Ctrl-C) or --idle_exit; segments already processed are passed over
+    --poll_interval= ### : with --watch, seconds between scans of the recording directories (default {})
+    --idle_exit= ### : with --watch, stop after no new segment has appeared for this many seconds
     
-    """
+    """.format(DEFAULT_WATCH_POLL_INTERVAL)
     try:
         opts, args = getopt.getopt(argv, 'cthldps:o:f:i:a:',
                                    ['count', 'timestamp', 'help', 'load_plot_output',
-                                    'drop_last_file', 'plot_output', 'print_output',
+                                    'drop_last_file', 'plot_output', 'print_output', 'full_decode',
                                     'session_directory=', 'output_filename=',
-                                    'first_file=', 'input_filename=', 'append_outputs='])
+                                    'first_file=', 'input_filename=', 'append_outputs=', 'stride=',
+                                    'every_seconds=', 'store_directory=', 'csv', 'watch', 'poll_interval=',
+                                    'idle_exit='])
     except getopt.GetoptError:
         print("Usage:", usage)
         print_exc()
@@ -240,6 +660,14 @@ def main(argv):
     append_results = None
     first_file = 0
     print_output = False
+    incremental_timestamps = True
+    sample_stride = None
+    sample_seconds = None
+    store_directory = None
+    export_csv = False
+    watch = False
+    poll_interval = DEFAULT_WATCH_POLL_INTERVAL
+    idle_exit = None
     plot_output = False
     # flag to plot output and exit (needs to capture session_directory value)
     plot_and_exit = False
@@ -278,6 +706,22 @@ def main(argv):
             first_file = int(arg)
         elif opt in ('--print_output',):
             print_output = True
+        elif opt in ('--full_decode',):
+            incremental_timestamps = False
+        elif opt in ('--stride',):
+            sample_stride = int(arg)
+        elif opt in ('--every_seconds',):
+            sample_seconds = float(arg)
+        elif opt in ('--store_directory',):
+            store_directory = arg
+        elif opt in ('--csv',):
+            export_csv = True
+        elif opt in ('--watch',):
+            watch = True
+        elif opt in ('--poll_interval',):
+            poll_interval = float(arg)
+        elif opt in ('--idle_exit',):
+            idle_exit = float(arg)
         elif opt in ('-p', '--plot_output',):
             plot_output = True
         else:
@@ -349,6 +793,31 @@ def main(argv):
     recording_directories, recording_filenames, camera_names = utilities.get_recording_params(
         session_root_directory=session_directory, session_number=session_number,
         camera_configs=camera_config, recording_config=recording_config)
+    # bring the session catalog (if the session root has one) up to date with the segments recorded so far
+    session_catalog.try_update_catalog(session_directory)
+
+    if watch is True:
+        store = None
+        if parse_timestamps is True:
+            from frame_store import FrameTimestampStore
+            if store_directory is None:
+                store_directory = os.path.join(session_directory, DEFAULT_FRAME_TIMESTAMP_STORE)
+            store = FrameTimestampStore(store_directory=store_directory)
+            print("Writing frame timestamps to store at {}".format(store_directory))
+        try:
+            watch_session_recordings(recording_directories=recording_directories,
+                                     file_name_formats=recording_filenames, camera_names=camera_names,
+                                     count_filename=count_filename if count_frames is True else None, store=store,
+                                     timestamp_filename=timestamp_filename, incremental=incremental_timestamps,
+                                     stride=sample_stride, every_seconds=sample_seconds, first_file_index=first_file,
+                                     filter_filenames=input_filename_filters, poll_interval=poll_interval,
+                                     idle_exit=idle_exit, print_output=print_output)
+        except KeyboardInterrupt:
+            print("Watch stopped.")
+        if store is not None and export_csv is True:
+            store.export_csv(filename=timestamp_filename)
+        sys.exit()
+
     # determine the files in the recording directory matching the filename format
     matching_files = utilities.find_files(recording_directories=recording_directories,
                                           file_name_formats=recording_filenames, camera_names=camera_names,
@@ -367,10 +836,30 @@ def main(argv):
                                      session_info_filename=session_info_file_path)
 
     if parse_timestamps is True:
-        # run the parse timestamp queries
-        file_frame_timestamps = get_video_frame_timestamps(video_file_names=matching_files)
-        # write the frame timestamp results to a CSV file
-        write_frame_timestamp_results(results_dict=file_frame_timestamps, filename=timestamp_filename)
+        # results are appended to the store segment by segment as they finish
+        from frame_store import FrameTimestampStore
+        if store_directory is None:
+            store_directory = os.path.join(session_directory, DEFAULT_FRAME_TIMESTAMP_STORE)
+        store = FrameTimestampStore(store_directory=store_directory)
+        print("Writing frame timestamps to store at {}".format(store_directory))
+        if sample_stride is not None or sample_seconds is not None:
+            # run the sampled parse timestamp queries, with per-frame estimates from presentation times
+            file_frame_timestamps, file_samples = get_video_frame_timestamps_sampled(
+                video_file_names=matching_files, stride=sample_stride, every_seconds=sample_seconds, store=store)
+            # write the decoded samples beside the results
+            write_frame_timestamp_samples(samples_dict=file_samples,
+                                          filename=os.path.splitext(timestamp_filename)[0] + '-samples.csv')
+        else:
+            # run the parse timestamp queries
+            file_frame_timestamps, file_anomalies = get_video_frame_timestamps(video_file_names=matching_files,
+                                                                               incremental=incremental_timestamps,
+                                                                               store=store)
+            # write the anomalies beside the results
+            write_frame_timestamp_anomalies(anomalies_dict=file_anomalies,
+                                            filename=os.path.splitext(timestamp_filename)[0] + '-anomalies.csv')
+        if export_csv is True:
+            # export everything in the store (including segments from earlier runs) to the CSV results file
+            store.export_csv(filename=timestamp_filename)
 
 
 if __name__ == '__main__':
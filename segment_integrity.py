@@ -0,0 +1,365 @@
+import os
+import sys
+import csv
+import mmap
+import time
+import struct
+import getopt
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, Counter
+from traceback import print_exc
+
+import utilities
+import session_catalog
+from parameters import *
+
+# H.264 Annex-B start code, written before each NAL unit when salvaging
+START_CODE = b'\x00\x00\x00\x01'
+
+
+def iter_boxes(buf, start, end):
+    """
+    Walks the boxes (atoms) between two offsets of an MP4 file, reading only their headers.
+    :param buf: file contents (mmap or bytes)
+    :param start: offset of the first box
+    :param end: offset at which to stop (end of file, or end of the parent box's payload)
+    :return: generator of (box type, box offset, header size, box size); a box may run past `end` (truncated file),
+        and the walk stops at a header that is cut off or declares a size smaller than itself
+    """
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', buf[offset:offset + 8])
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack('>Q', buf[offset + 8:offset + 16])[0]
+            header_size = 16
+        elif size == 0:
+            # box runs to the end of the file, e.g., an mdat whose size was never written
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type.decode('latin-1'), offset, header_size, size
+        offset += size
+
+
+def _find_box(buf, start, end, box_type):
+    # first box of a type between two offsets, as (box offset, header size, box size), or None
+    for bt, offset, header_size, size in iter_boxes(buf, start, end):
+        if bt == box_type:
+            return offset, header_size, size
+    return None
+
+
+def scan_segment(video_file_path):
+    """
+    Checks the box structure of a recorded segment without decoding it. A segment is 'complete' if its boxes exactly
+        cover the file and it has media data (mdat) and an index (moov) with at least one track, 'truncated' if it has
+        media data but the index is missing or boxes run past the end of the file (e.g., recording was interrupted
+        before splitmuxsink finalized the file), and 'empty' if it has no media data. Files that can't be read are
+        'unreadable'.
+    :param video_file_path: path to video file
+    :return: dictionary of path, status, file size, top-level box types, media data offset and size, and detail
+    """
+    result = OrderedDict([('path', video_file_path), ('status', None), ('size', None), ('boxes', ''),
+                          ('mdat_offset', None), ('mdat_size', None), ('detail', '')])
+    try:
+        file_size = os.path.getsize(video_file_path)
+        result['size'] = file_size
+        if file_size == 0:
+            result['status'], result['detail'] = 'empty', 'zero-length file'
+            return result
+        with open(video_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            boxes = list(iter_boxes(mm, 0, file_size))
+            result['boxes'] = ' '.join([box[0] for box in boxes])
+            walked_end = boxes[-1][1] + boxes[-1][3] if len(boxes) > 0 else 0
+            mdat = next((box for box in boxes if box[0] == 'mdat'), None)
+            moov = next((box for box in boxes if box[0] == 'moov'), None)
+            if mdat is not None:
+                result['mdat_offset'] = mdat[1] + mdat[2]
+                result['mdat_size'] = min(mdat[1] + mdat[3], file_size) - result['mdat_offset']
+            if mdat is None or result['mdat_size'] <= 0:
+                result['status'], result['detail'] = 'empty', 'no media data'
+            elif moov is None:
+                result['status'], result['detail'] = 'truncated', 'no moov box'
+            elif walked_end > file_size:
+                result['status'] = 'truncated'
+                result['detail'] = '{} box runs {} bytes past end of file'.format(boxes[-1][0], walked_end - file_size)
+            elif walked_end < file_size:
+                result['status'] = 'truncated'
+                result['detail'] = '{} unparseable bytes after last box'.format(file_size - walked_end)
+            elif _find_box(mm, moov[1] + moov[2], moov[1] + moov[3], 'trak') is None:
+                result['status'], result['detail'] = 'truncated', 'moov box has no tracks'
+            else:
+                result['status'] = 'complete'
+    except (OSError, ValueError) as e:
+        result['status'], result['detail'] = 'unreadable', str(e)
+    return result
+
+
+def read_avc_config(video_file_path):
+    """
+    Reads the H.264 decoder configuration (avcC box) of the first video track of a complete segment. Truncated
+        segments have no moov box, so their SPS/PPS are taken from a complete segment of the same camera.
+    :param video_file_path: path to video file
+    :return: dictionary {'length_size': NAL length field bytes, 'sps': [bytes], 'pps': [bytes]}, or None if not found
+    """
+    try:
+        with open(video_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            box = _find_box(mm, 0, len(mm), 'moov')
+            # moov/trak/mdia/minf/stbl/stsd, descending into each box's payload
+            for box_type in ('trak', 'mdia', 'minf', 'stbl', 'stsd'):
+                if box is None:
+                    return None
+                box = _find_box(mm, box[0] + box[1], box[0] + box[2], box_type)
+            if box is None:
+                return None
+            # stsd payload: version/flags (4 bytes) and entry count (4 bytes), then sample entries
+            stsd_end = box[0] + box[2]
+            for entry_type, offset, header_size, size in iter_boxes(mm, box[0] + box[1] + 8, stsd_end):
+                if entry_type not in ('avc1', 'avc3'):
+                    continue
+                # visual sample entry fields take 78 bytes before the entry's child boxes
+                avcc = _find_box(mm, offset + header_size + 78, offset + size, 'avcC')
+                if avcc is None:
+                    return None
+                data = mm[avcc[0] + avcc[1]:avcc[0] + avcc[2]]
+                config = {'length_size': (data[4] & 0x03) + 1, 'sps': [], 'pps': []}
+                pos = 6
+                for key, count in (('sps', data[5] & 0x1f), ('pps', None)):
+                    if count is None:
+                        count = data[pos]
+                        pos += 1
+                    for _ in range(count):
+                        length = struct.unpack('>H', data[pos:pos + 2])[0]
+                        config[key].append(bytes(data[pos + 2:pos + 2 + length]))
+                        pos += 2 + length
+                return config
+    except (OSError, ValueError, IndexError, struct.error):
+        print("Couldn't read H.264 configuration from {}.".format(video_file_path))
+    return None
+
+
+def salvage_segment(video_file_path, output_path, avc_config=None, nominal_fps=NOMINAL_CAMERA_FRAME_RATE):
+    """
+    Rebuilds a playable file from the media data of a truncated segment. The length-prefixed NAL units in mdat are
+        walked up to the first one that is cut off or invalid, rewritten as an H.264 Annex-B stream (after the SPS/PPS
+        from `avc_config`), and remuxed with FFmpeg. Sample timing is lost with the index, so frames are timed at the
+        nominal frame rate.
+    :param video_file_path: path to truncated video file
+    :param output_path: path of the salvaged video file (written to a temporary file, then renamed)
+    :param avc_config: H.264 configuration from read_avc_config() for a complete segment of the same camera; if None,
+        the stream must carry its own SPS/PPS and NAL units are assumed to have 4-byte lengths
+    :param nominal_fps: frame rate used to time the salvaged frames
+    :return: dictionary of salvaged NAL units and media data bytes, or None if nothing could be salvaged
+    """
+    scan = scan_segment(video_file_path)
+    if scan['mdat_offset'] is None:
+        return None
+    length_size = 4 if avc_config is None else avc_config['length_size']
+    base, ext = os.path.splitext(output_path)
+    tmp_path = base + '.tmp' + ext
+    nal_units, salvaged_bytes = 0, 0
+    stream_file = tempfile.NamedTemporaryFile(suffix='.h264', dir=os.path.dirname(output_path), delete=False)
+    try:
+        with stream_file, open(video_file_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if avc_config is not None:
+                for parameter_set in avc_config['sps'] + avc_config['pps']:
+                    stream_file.write(START_CODE + parameter_set)
+            # without a moov box, media data runs to the end of the file whatever the mdat header says
+            offset, end = scan['mdat_offset'], len(mm)
+            while offset + length_size < end:
+                nal_size = int.from_bytes(mm[offset:offset + length_size], 'big')
+                if nal_size == 0 or offset + length_size + nal_size > end:
+                    break
+                nal_header = mm[offset + length_size]
+                # forbidden zero bit set, or a reserved/unspecified NAL unit type: not a NAL unit boundary
+                if nal_header & 0x80 or not 1 <= nal_header & 0x1f <= 23:
+                    break
+                stream_file.write(START_CODE)
+                stream_file.write(mm[offset + length_size:offset + length_size + nal_size])
+                nal_units += 1
+                offset += length_size + nal_size
+            salvaged_bytes = offset - scan['mdat_offset']
+        if nal_units == 0:
+            print("No NAL units found in media data of {}.".format(video_file_path))
+            return None
+        cmd = ["ffmpeg", "-v", "error", "-y", "-fflags", "+genpts", "-r", str(nominal_fps), "-f", "h264",
+               "-i", stream_file.name, "-c", "copy", tmp_path]
+        fcp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if fcp.returncode != 0 or not os.path.exists(tmp_path):
+            print("FFMPEG FAILED FOR {}".format(output_path))
+            print("STDERR:", fcp.stderr[-2000:])
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, output_path)
+    finally:
+        os.remove(stream_file.name)
+    return {'nal_units': nal_units, 'salvaged_bytes': salvaged_bytes, 'mdat_bytes': scan['mdat_size']}
+
+
+def scan_session_segments(video_files, workers=DEFAULT_SEGMENT_INTEGRITY_WORKERS):
+    """
+    Scans recorded segments in parallel (see scan_segment). Scans only read box headers through mmap, so they are
+        bound by file system metadata and page reads and run well in threads.
+    :param video_files: list of tuples (file directory, filename, segment_number, camera_name), as from find_files
+    :param workers: number of segments scanned at once
+    :return: list of scan result dictionaries, with camera and segment number, in the order of `video_files`
+    """
+    def scan(vf):
+        vfdr, vfn, vfi, vfc = vf
+        result = scan_segment(os.path.join(vfdr, vfn))
+        result['camera'], result['segment'] = vfc, vfi
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='scan') as executor:
+        return list(executor.map(scan, video_files))
+
+
+def salvage_session_segments(results, salvage_directory):
+    """
+    Salvages every truncated segment in scan results (see salvage_segment), using the SPS/PPS of the nearest complete
+        segment of the same camera. Salvaged files are written to `salvage_directory`/<camera>/, with the same file
+        name; originals are left in place.
+    :param results: list of scan result dictionaries from scan_session_segments(); updated with 'salvaged_path' and
+        'salvaged_nal_units'
+    :param salvage_directory: directory for salvaged files
+    :return: number of segments salvaged
+    """
+    complete = {}
+    for result in results:
+        if result['status'] == 'complete':
+            complete.setdefault(result['camera'], []).append(result)
+    avc_configs = {}            # {path of complete segment: avc config}
+    salvaged = 0
+    for result in results:
+        if result['status'] != 'truncated':
+            continue
+        cam_complete = complete.get(result['camera'], [])
+        avc_config = None
+        # nearest complete segment first; camera settings may have changed over the session
+        for reference in sorted(cam_complete, key=lambda r: abs(r['segment'] - result['segment'])):
+            if reference['path'] not in avc_configs:
+                avc_configs[reference['path']] = read_avc_config(reference['path'])
+            avc_config = avc_configs[reference['path']]
+            if avc_config is not None:
+                break
+        if avc_config is None:
+            print("No complete segment of {} to take SPS/PPS from; relying on in-band parameter sets.".format(
+                result['camera']))
+        output_directory = os.path.join(salvage_directory, result['camera'])
+        os.makedirs(output_directory, exist_ok=True)
+        output_path = os.path.join(output_directory, os.path.basename(result['path']))
+        salvage = salvage_segment(result['path'], output_path, avc_config=avc_config)
+        if salvage is None:
+            print("Couldn't salvage {}.".format(result['path']))
+            continue
+        result['salvaged_path'], result['salvaged_nal_units'] = output_path, salvage['nal_units']
+        salvaged += 1
+        print("Salvaged {} NAL units ({:.1f}% of media data) from {} to {}.".format(
+            salvage['nal_units'], 100. * salvage['salvaged_bytes'] / max(1, salvage['mdat_bytes']), result['path'],
+            output_path))
+    return salvaged
+
+
+def write_integrity_report(results, report_file):
+    """
+    :param results: list of scan result dictionaries
+    :param report_file: CSV file to write
+    :return: None
+    """
+    fields = ['camera', 'segment', 'path', 'status', 'size', 'boxes', 'mdat_size', 'detail', 'salvaged_path',
+              'salvaged_nal_units']
+    with open(report_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+
+def main(argv):
+    usage = """
+    segment_integrity.py [-h] -s <session-directory> [-w <workers>] [-d] [-i <filters>] [-r <report-file>]
+        [--salvage] [-o <salvage-directory>]
+    -h/--help: print usage information, then exit
+    -s/--session_directory= : session directory whose recorded segments are checked
+    -w/--workers= : number of segments scanned at once (default {})
+    -d/--drop_last_file : skip the last segment of each camera (still being written during recording)
+    -i/--input_filename= : comma-delineated filters on segment file paths (tested by `if any filter in path`)
+    -r/--report_file= : CSV report of every segment (default <session-directory>/{})
+    --salvage : rebuild a playable file from each truncated segment's media data
+    -o/--salvage_directory= : directory for salvaged segments (default <session-directory>/{})
+    """.format(DEFAULT_SEGMENT_INTEGRITY_WORKERS, DEFAULT_SEGMENT_INTEGRITY_FILENAME, DEFAULT_SALVAGE_DIRECTORY)
+    try:
+        opts, args = getopt.getopt(argv, 'hs:w:di:r:o:', ['help', 'session_directory=', 'workers=', 'drop_last_file',
+                                                          'input_filename=', 'report_file=', 'salvage',
+                                                          'salvage_directory='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    session_directory = None
+    workers = DEFAULT_SEGMENT_INTEGRITY_WORKERS
+    drop_last_file = False
+    input_filename_filters = None
+    report_file = None
+    salvage = False
+    salvage_directory = None
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-s', '--session_directory'):
+            session_directory = arg
+        elif opt in ('-w', '--workers'):
+            workers = int(arg)
+        elif opt in ('-d', '--drop_last_file'):
+            drop_last_file = True
+        elif opt in ('-i', '--input_filename'):
+            input_filename_filters = arg.split(',')
+        elif opt in ('-r', '--report_file'):
+            report_file = arg
+        elif opt == '--salvage':
+            salvage = True
+        elif opt in ('-o', '--salvage_directory'):
+            salvage_directory = arg
+    if session_directory is None:
+        print("Must supply session directory.")
+        print("Usage:", usage)
+        sys.exit(2)
+    if report_file is None:
+        report_file = os.path.join(session_directory, DEFAULT_SEGMENT_INTEGRITY_FILENAME)
+    if salvage_directory is None:
+        salvage_directory = os.path.join(session_directory, DEFAULT_SALVAGE_DIRECTORY)
+
+    recording_directories, recording_filenames, camera_names = utilities.get_recording_params(
+        session_root_directory=session_directory)
+    video_files = utilities.find_files(recording_directories=recording_directories,
+                                       file_name_formats=recording_filenames, camera_names=camera_names,
+                                       drop_last_file=drop_last_file, filter_filenames=input_filename_filters)
+    # bring the session catalog (if the session root has one) up to date with the segments recorded so far
+    session_catalog.try_update_catalog(session_directory)
+    t0 = time.time()
+    results = scan_session_segments(video_files, workers=workers)
+    scan_time = time.time() - t0
+    counts = Counter([result['status'] for result in results])
+    print("Scanned {} segments in {:.1f} seconds ({:.0f} per minute): {}".format(
+        len(results), scan_time, 60. * len(results) / max(scan_time, 1e-6), dict(counts)))
+    for result in results:
+        if result['status'] != 'complete':
+            print("  {} ({} segment {}): {}, {}".format(result['path'], result['camera'], result['segment'],
+                                                        result['status'], result['detail']))
+    if salvage is True and counts['truncated'] > 0:
+        salvaged = salvage_session_segments(results, salvage_directory)
+        print("Salvaged {} of {} truncated segments to {}.".format(salvaged, counts['truncated'], salvage_directory))
+    write_integrity_report(results, report_file)
+    print("Segment integrity report written to {}.".format(report_file))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
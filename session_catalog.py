@@ -0,0 +1,427 @@
+import os
+import re
+import sys
+import json
+import time
+import getopt
+import sqlite3
+import datetime
+from contextlib import contextmanager
+from traceback import print_exc
+
+import utilities
+from parameters import *
+
+# sessions: one row per session number; cameras: recording layout of each camera in each session; segments: one row
+#   per recorded segment, with its time span (start from the file name with aligned rollover, otherwise the end of the
+#   camera's previous segment or the session start; end is the file modification time)
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    number INTEGER PRIMARY KEY,
+    directory TEXT NOT NULL,
+    status TEXT NOT NULL,
+    start_time REAL,
+    stop_time REAL,
+    pid INTEGER,
+    segment_time REAL,
+    cameras TEXT,
+    num_segments INTEGER DEFAULT 0,
+    total_bytes INTEGER DEFAULT 0,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS cameras (
+    session INTEGER NOT NULL,
+    camera TEXT NOT NULL,
+    worker TEXT,
+    rtsp_address TEXT,
+    storage_root TEXT,
+    recording_directory TEXT,
+    recording_filename TEXT,
+    PRIMARY KEY (session, camera)
+);
+CREATE TABLE IF NOT EXISTS segments (
+    session INTEGER NOT NULL,
+    camera TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER,
+    start_time REAL,
+    end_time REAL,
+    PRIMARY KEY (session, camera, segment)
+);
+CREATE INDEX IF NOT EXISTS cameras_by_name ON cameras (camera, session);
+CREATE INDEX IF NOT EXISTS segments_by_camera_time ON segments (camera, start_time);
+CREATE INDEX IF NOT EXISTS segments_by_time ON segments (start_time);
+"""
+
+
+def scan_session_numbers(session_root_directory, directory_format=DEFAULT_SESSION_DIRECTORY_FORMAT):
+    """
+    :param session_root_directory: root directory where session-specific directories are placed
+    :param directory_format: session directory name format (parameters.DEFAULT_SESSION_DIRECTORY_FORMAT)
+    :return: sorted list of session numbers of the session directories present in `session_root_directory`
+    """
+    directory_regex = utilities.session_directory_regex(directory_format)
+    numbers = []
+    for name in os.listdir(session_root_directory):
+        rem = re.match(directory_regex, name)
+        if rem is not None:
+            numbers.append(int(rem.group('session')))
+    return sorted(numbers)
+
+
+def scan_session_segments(recording_directories, file_name_formats, camera_names, session_start=None):
+    """
+    Lists the recorded segments of a session with their sizes and time spans. Each distinct recording directory is
+        scanned once. A segment's start time is read from its file name with aligned rollover (see
+        utilities.get_segment_start_time); otherwise it is the end of the camera's previous segment, or the session
+        start for the first. Its end time is its modification time, which is when the muxer last wrote to it.
+    :param recording_directories: list of recording directories; each corresponding to camera_names
+    :param file_name_formats: list of recording file name formats; each corresponding to camera_names
+    :param camera_names: list of camera names
+    :param session_start: session start time (UNIX seconds)
+    :return: list of tuples (camera name, segment number, path, bytes, start time, end time), by camera and segment
+    """
+    directory_entries = {}
+    for rdir in set(recording_directories):
+        try:
+            with os.scandir(rdir) as it:
+                directory_entries[rdir] = [(entry.name, entry.stat()) for entry in it if entry.is_file()]
+        except FileNotFoundError:
+            directory_entries[rdir] = []
+    segments = []
+    for cn, rdir, fnf in zip(camera_names, recording_directories, file_name_formats):
+        file_name_regex = utilities.recording_file_regex(fnf)
+        camera_segments = []
+        for fn, stat in directory_entries[rdir]:
+            rem = re.search(file_name_regex, fn)
+            if rem is not None:
+                start = int(rem.group('segment_start')) if 'segment_start' in rem.groupdict() else None
+                camera_segments.append((int(rem.group('segment')), os.path.join(rdir, fn), stat.st_size, start,
+                                        stat.st_mtime))
+        previous_end = session_start
+        for segment, path, size, start, end in sorted(camera_segments):
+            segments.append((cn, segment, path, size, start if start is not None else previous_end, end))
+            previous_end = end
+    return segments
+
+
+class SessionCatalog:
+    """
+    SQLite catalog of the sessions under a session root directory (parameters.DEFAULT_SESSION_CATALOG_FILENAME): session
+        numbers and status, start and stop times, cameras and recording layout, and segments with their time spans, so
+        that session numbers are allocated and footage is found across sessions with indexed lookups. The session
+        directories stay authoritative; the catalog is updated from them (see index_session) and can be rebuilt.
+    """
+    def __init__(self, session_root_directory, create=True):
+        """
+        :param session_root_directory: root directory where session-specific directories are placed
+        :param create: T/F create the catalog if it doesn't exist yet
+        :return: None
+        """
+        self.session_root_directory = os.path.abspath(session_root_directory)
+        self.catalog_file = os.path.join(self.session_root_directory, DEFAULT_SESSION_CATALOG_FILENAME)
+        if create is False and not os.path.exists(self.catalog_file):
+            raise FileNotFoundError("No session catalog at {}".format(self.catalog_file))
+        # autocommit; writes are grouped in explicit transactions (see _transaction)
+        self.connection = sqlite3.connect(self.catalog_file, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        # readers (query tools) don't block the session writing to the catalog
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(CATALOG_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so two sessions starting at once can't allocate the same number
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def allocate_session_number(self, directory_format=DEFAULT_SESSION_DIRECTORY_FORMAT):
+        """
+        Allocates the next session number: the largest number in the catalog plus 1, skipping numbers whose directory
+            already exists. A new catalog is seeded from the session directories present under the root. Does not wrap
+            around to zero. The number is recorded as 'allocated' until the session is indexed.
+        :param directory_format: session directory name format (parameters.DEFAULT_SESSION_DIRECTORY_FORMAT)
+        :return: session number
+        """
+        with self._transaction() as db:
+            number = db.execute('SELECT MAX(number) FROM sessions').fetchone()[0]
+            if number is None:
+                number = max(scan_session_numbers(self.session_root_directory, directory_format), default=0)
+            number += 1
+            while os.path.exists(os.path.join(self.session_root_directory, directory_format.format(number))):
+                number += 1
+            db.execute('INSERT INTO sessions (number, directory, status, updated) VALUES (?, ?, ?, ?)',
+                       (number, os.path.join(self.session_root_directory, directory_format.format(number)),
+                        'allocated', time.time()))
+        return number
+
+    def index_session(self, session_directory, status=None, stop_time=None):
+        """
+        Updates the catalog entry of a session from its directory: session number and start time (_SESSION_INFO.txt),
+            cameras and recording layout (_SESSION_MANIFEST.json or the session config), and the segments recorded so
+            far. Updates are incremental: only segments that are new or whose size or time span changed are written,
+            and only segments that no longer exist are dropped from the catalog.
+        :param session_directory: session directory
+        :param status: session status to record (e.g., 'running', 'stopped'); None keeps the recorded status
+        :param stop_time: session stop time (UNIX seconds) to record; None keeps the recorded stop time
+        :return: dictionary of the session's catalog entry
+        """
+        session_directory = os.path.abspath(session_directory)
+        info_file = os.path.join(session_directory, DEFAULT_SESSION_INFO_FILENAME)
+        number = utilities.get_session_number(session_info_filename=info_file)
+        start_time = utilities.get_session_start_time_local(info_file).timestamp()
+        segment_time = utilities.get_sesssion_recording_segment_time(info_file)
+        manifest = utilities.get_session_manifest(session_directory)
+        recording_directories, recording_filenames, camera_names = utilities.get_recording_params(
+            session_root_directory=session_directory, session_number=number, verbose=False)
+        camera_info = manifest['cameras'] if manifest is not None else {}
+        segments = scan_session_segments(recording_directories, recording_filenames, camera_names,
+                                         session_start=start_time)
+        with self._transaction() as db:
+            previous = db.execute('SELECT status, stop_time FROM sessions WHERE number = ?', (number,)).fetchone()
+            if status is None:
+                status = previous['status'] if previous is not None and previous['status'] != 'allocated' else \
+                    'indexed'
+            if stop_time is None and previous is not None:
+                stop_time = previous['stop_time']
+            db.execute('INSERT OR REPLACE INTO sessions (number, directory, status, start_time, stop_time, pid, '
+                       'segment_time, cameras, num_segments, total_bytes, updated) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (number, session_directory, status, start_time, stop_time,
+                        manifest.get('parent_pid') if manifest is not None else None, segment_time,
+                        json.dumps(camera_names), len(segments), sum([s[3] for s in segments]), time.time()))
+            db.execute('DELETE FROM cameras WHERE session = ?', (number,))
+            rows = []
+            for i, cn in enumerate(camera_names):
+                ci = camera_info.get(cn, {})
+                rows.append((number, cn, ci.get('worker'), ci.get('rtsp_address'), ci.get('storage_root'),
+                             recording_directories[i] if i < len(recording_directories) else None,
+                             recording_filenames[i] if i < len(recording_filenames) else None))
+            db.executemany('INSERT INTO cameras VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            recorded = {(row[0], row[1]): tuple(row) for row in db.execute(
+                'SELECT camera, segment, path, bytes, start_time, end_time FROM segments WHERE session = ?', (number,))}
+            changed = [(number,) + tuple(s) for s in segments if recorded.get((s[0], s[1])) != tuple(s)]
+            db.executemany('INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?)', changed)
+            gone = set(recorded) - set([(s[0], s[1]) for s in segments])
+            db.executemany('DELETE FROM segments WHERE session = ? AND camera = ? AND segment = ?',
+                           [(number, camera, segment) for camera, segment in gone])
+        return self.session(number)
+
+    def session(self, number):
+        """
+        :param number: session number
+        :return: dictionary of the session's catalog entry, or None if it isn't in the catalog
+        """
+        row = self.connection.execute('SELECT * FROM sessions WHERE number = ?', (number,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def sessions(self, camera=None, start_time=None, end_time=None):
+        """
+        :param camera: (optional) only sessions that included this camera
+        :param start_time: (optional) only sessions still running or stopped after this time (UNIX seconds)
+        :param end_time: (optional) only sessions started before this time (UNIX seconds)
+        :return: list of dictionaries of session catalog entries, by session number
+        """
+        query, args = 'SELECT * FROM sessions WHERE 1', []
+        if camera is not None:
+            query += ' AND number IN (SELECT session FROM cameras WHERE camera = ?)'
+            args.append(camera)
+        if start_time is not None:
+            query += ' AND (stop_time IS NULL OR stop_time >= ?)'
+            args.append(start_time)
+        if end_time is not None:
+            query += ' AND start_time < ?'
+            args.append(end_time)
+        return [dict(row) for row in self.connection.execute(query + ' ORDER BY number', args)]
+
+    def segments(self, camera=None, start_time=None, end_time=None, session=None):
+        """
+        Finds recorded segments across sessions that overlap a time range, e.g., all footage of one camera last week.
+        :param camera: (optional) camera name
+        :param start_time: (optional) start of the time range (UNIX seconds)
+        :param end_time: (optional) end of the time range (UNIX seconds)
+        :param session: (optional) session number
+        :return: list of dictionaries (session, camera, segment, path, bytes, start_time, end_time), by start time
+        """
+        query, args = 'SELECT * FROM segments WHERE 1', []
+        if camera is not None:
+            query += ' AND camera = ?'
+            args.append(camera)
+        if session is not None:
+            query += ' AND session = ?'
+            args.append(session)
+        if start_time is not None:
+            query += ' AND end_time >= ?'
+            args.append(start_time)
+        if end_time is not None:
+            query += ' AND start_time < ?'
+            args.append(end_time)
+        return [dict(row) for row in self.connection.execute(query + ' ORDER BY start_time, camera', args)]
+
+    def rebuild(self, directory_format=DEFAULT_SESSION_DIRECTORY_FORMAT):
+        """
+        Indexes every session directory under the root, e.g., for sessions recorded before the catalog existed.
+            Sessions whose directories can't be read are reported and skipped.
+        :param directory_format: session directory name format (parameters.DEFAULT_SESSION_DIRECTORY_FORMAT)
+        :return: number of sessions indexed
+        """
+        indexed = 0
+        for number in scan_session_numbers(self.session_root_directory, directory_format):
+            session_directory = os.path.join(self.session_root_directory, directory_format.format(number))
+            try:
+                self.index_session(session_directory)
+                indexed += 1
+            except (OSError, ValueError, KeyError) as e:
+                print("Couldn't index {}: {}".format(session_directory, e))
+        return indexed
+
+
+def update_catalog(session_directory, status=None, stop_time=None, create=False):
+    """
+    Indexes a session in the catalog of its session root directory (the parent of the session directory); used by the
+        ingest session and analysis tools to keep the catalog current.
+    :param session_directory: session directory
+    :param status: session status to record; None keeps the recorded status
+    :param stop_time: session stop time (UNIX seconds) to record; None keeps the recorded stop time
+    :param create: T/F create the catalog if it doesn't exist yet
+    :return: dictionary of the session's catalog entry, or None if there is no catalog and `create` is False
+    """
+    session_root_directory = os.path.dirname(os.path.abspath(session_directory))
+    if create is False and not os.path.exists(os.path.join(session_root_directory, DEFAULT_SESSION_CATALOG_FILENAME)):
+        return None
+    catalog = SessionCatalog(session_root_directory)
+    try:
+        return catalog.index_session(session_directory, status=status, stop_time=stop_time)
+    finally:
+        catalog.close()
+
+
+def try_update_catalog(session_directory, status=None, stop_time=None, create=False, warn=print):
+    """
+    Same as update_catalog, but failures (unreadable catalog, or session files that are missing or incomplete, as in
+        older or partial sessions) are reported with `warn` and otherwise ignored: the catalog is only an index of the
+        session directories, so tools and the ingest session keep working without it.
+    :param session_directory: session directory
+    :param status: session status to record; None keeps the recorded status
+    :param stop_time: session stop time (UNIX seconds) to record; None keeps the recorded stop time
+    :param create: T/F create the catalog if it doesn't exist yet
+    :param warn: function called with the warning message (e.g., print, logbook.warning)
+    :return: dictionary of the session's catalog entry, or None if there is no catalog or it couldn't be updated
+    """
+    try:
+        return update_catalog(session_directory, status=status, stop_time=stop_time, create=create)
+    except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+        warn("Couldn't update session catalog: {}".format(e))
+        return None
+
+
+def parse_local_time(time_string):
+    """
+    :param time_string: local time as 'YYYY-mm-dd', 'YYYY-mm-dd HH:MM', or 'YYYY-mm-dd HH:MM:SS'
+    :return: UNIX seconds
+    """
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(time_string, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError("Couldn't parse time '{}'; use YYYY-mm-dd [HH:MM[:SS]].".format(time_string))
+
+
+def format_local_time(unix_time):
+    """
+    :param unix_time: UNIX seconds (or None)
+    :return: local time string, or '-' if None
+    """
+    if unix_time is None:
+        return '-'
+    return datetime.datetime.fromtimestamp(unix_time).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main(argv):
+    usage = """
+    session_catalog.py [-h] -r <session-root-directory> [--rebuild] [-c <camera>] [-s <session>] [--from <time>]
+        [--to <time>] [--last_days <days>] [--segments]
+    -h/--help: print usage information, then exit
+    -r/--root_directory= : (required) session root directory, which holds the session directories and the catalog
+    --rebuild: index every session directory under the root (creates the catalog if needed), then continue
+    -c/--camera= : only sessions/segments of this camera
+    -s/--session= : only segments of this session number
+    --from= : start of time range, local time as YYYY-mm-dd [HH:MM[:SS]]
+    --to= : end of time range, local time as YYYY-mm-dd [HH:MM[:SS]]
+    --last_days= : time range of the last N days (instead of --from/--to)
+    --segments: list the matching segments, instead of the matching sessions
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'hr:c:s:', ['help', 'root_directory=', 'rebuild', 'camera=', 'session=',
+                                                     'from=', 'to=', 'last_days=', 'segments'])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    root_directory = None
+    rebuild = False
+    camera = None
+    session = None
+    start_time = None
+    end_time = None
+    list_segments = False
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-r', '--root_directory'):
+            root_directory = arg
+        elif opt == '--rebuild':
+            rebuild = True
+        elif opt in ('-c', '--camera'):
+            camera = arg
+        elif opt in ('-s', '--session'):
+            session = int(arg)
+        elif opt == '--from':
+            start_time = parse_local_time(arg)
+        elif opt == '--to':
+            end_time = parse_local_time(arg)
+        elif opt == '--last_days':
+            start_time = time.time() - float(arg) * 86400
+        elif opt == '--segments':
+            list_segments = True
+    if root_directory is None:
+        print("Must supply session root directory.")
+        print("Usage:", usage)
+        sys.exit(2)
+    try:
+        catalog = SessionCatalog(root_directory, create=rebuild)
+    except FileNotFoundError as e:
+        print("{}; create it with --rebuild.".format(e))
+        sys.exit(1)
+    if rebuild is True:
+        print("Indexed {} sessions.".format(catalog.rebuild()))
+    if list_segments is True or session is not None:
+        segments = catalog.segments(camera=camera, start_time=start_time, end_time=end_time, session=session)
+        for s in segments:
+            print("{:>7} {:<12} {:>7} {} {} {:>10.1f} MB  {}".format(
+                s['session'], s['camera'], s['segment'], format_local_time(s['start_time']),
+                format_local_time(s['end_time']), s['bytes'] / 1024 ** 2, s['path']))
+        print("{} segments, {:.2f} GB, {:.1f} hours.".format(
+            len(segments), sum([s['bytes'] for s in segments]) / 1024 ** 3,
+            sum([s['end_time'] - s['start_time'] for s in segments if s['start_time'] is not None]) / 3600))
+    else:
+        for s in catalog.sessions(camera=camera, start_time=start_time, end_time=end_time):
+            print("{:>7} {:<10} {} {} {:>6} segments {:>9.2f} GB  {}".format(
+                s['number'], s['status'], format_local_time(s['start_time']), format_local_time(s['stop_time']),
+                s['num_segments'], s['total_bytes'] / 1024 ** 3, ','.join(json.loads(s['cameras'] or '[]'))))
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
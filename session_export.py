@@ -0,0 +1,413 @@
+import os
+import sys
+import json
+import time
+import getopt
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from traceback import print_exc
+
+import utilities
+import query_frames
+from proxy_generation import ResourceThrottle
+from parameters import *
+
+
+class TokenBucket:
+    """
+    Global bandwidth cap shared by all copy threads: each block read from the session waits until the bucket has
+        enough bytes for it. The effective rate is scaled down (or paused) by DiskPressureBackoff.
+    """
+    def __init__(self, rate=None, burst_seconds=1.0):
+        """
+        :param rate: bytes per second (None or 0 for no cap)
+        :param burst_seconds: seconds of unused rate that may be saved up for a burst
+        :return: None
+        """
+        self.rate = rate if rate else None
+        self.burst_seconds = burst_seconds
+        self.scale = 1.0
+        self.running = threading.Event()
+        self.running.set()
+        self._tokens = 0.
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def consume(self, num_bytes):
+        """
+        Blocks until `num_bytes` may be transferred. Transfers larger than the bucket go into debt, which later
+            transfers wait out, so the average rate holds for any block size.
+        :param num_bytes: size of the transfer
+        :return: None
+        """
+        self.running.wait()
+        with self._lock:
+            if self.rate is None:
+                return
+            rate = self.rate * self.scale
+            now = time.time()
+            self._tokens = min(rate * self.burst_seconds, self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= num_bytes
+            wait_time = -self._tokens / rate if self._tokens < 0 else 0.
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class DiskPressureBackoff:
+    """
+    Backs the export off while the disks are busy with live recording: samples disk busy time (see
+        proxy_generation.ResourceThrottle) in a thread, halving the bucket's rate scale while it is above the limit and
+        raising it again in steps while it is below. Without a bandwidth cap, or once the scale reaches its floor,
+        copying is paused until the disks are below the limit again.
+    """
+    def __init__(self, bucket, max_disk_busy_percent=DEFAULT_EXPORT_MAX_DISK_BUSY_PERCENT, sample_seconds=1.0,
+                 min_scale=0.05):
+        """
+        :param bucket: TokenBucket shared by the copy threads
+        :param max_disk_busy_percent: disk busy percent (0-100, across all disks) above which the export backs off
+        :param sample_seconds: length of each utilization sample
+        :param min_scale: lowest rate scale before copying is paused
+        :return: None
+        """
+        self.bucket = bucket
+        self.max_disk_busy_percent = max_disk_busy_percent
+        self.min_scale = min_scale
+        self.throttle = ResourceThrottle(max_cpu_percent=100, max_disk_busy_percent=max_disk_busy_percent,
+                                         sample_seconds=sample_seconds)
+        self.paused_seconds = 0.
+        self.backoffs = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.time()
+            _, busy = self.throttle.sample()
+            if not self.bucket.running.is_set():
+                self.paused_seconds += time.time() - t0
+            if busy is None:
+                # platform doesn't report disk busy time; nothing to back off from
+                return
+            if busy > self.max_disk_busy_percent:
+                self.backoffs += 1
+                if self.bucket.rate is None or self.bucket.scale / 2 < self.min_scale:
+                    if self.bucket.running.is_set():
+                        print("Disks {:.0f}% busy; pausing export.".format(busy))
+                    self.bucket.running.clear()
+                else:
+                    self.bucket.scale /= 2
+                    print("Disks {:.0f}% busy; export rate cut to {:.1f} MB/s.".format(
+                        busy, self.bucket.rate * self.bucket.scale / 1024 ** 2))
+            elif not self.bucket.running.is_set():
+                print("Disks {:.0f}% busy; resuming export.".format(busy))
+                self.bucket.running.set()
+            elif self.bucket.scale < 1.:
+                self.bucket.scale = min(1., self.bucket.scale + 0.1)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='disk_pressure', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.bucket.running.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def archive_recording_directory(session_directory, recording_directory, camera_name):
+    """
+    :param session_directory: session directory
+    :param recording_directory: recording directory of the camera (as from utilities.get_recording_params)
+    :param camera_name: camera name
+    :return: recording directory relative to the archived session directory: the same relative location for
+        recordings inside the session directory; `storage/<camera>` for recordings on other storage roots
+    """
+    session_directory = os.path.abspath(session_directory)
+    recording_directory = os.path.abspath(recording_directory)
+    if recording_directory == session_directory or recording_directory.startswith(session_directory + os.sep):
+        return os.path.relpath(recording_directory, session_directory)
+    return os.path.join('storage', camera_name)
+
+
+def write_archive_session_manifest(session_directory, archive_directory):
+    """
+    Writes the session manifest of the archived session, with each camera's recording directory pointing at its
+        exported segments (see archive_recording_directory), so that utilities.get_recording_params and the analysis
+        tools find the segments in the archive instead of at the original session and storage roots. Sessions
+        recorded before manifests were written get one built from their configuration.
+    :param session_directory: session directory
+    :param archive_directory: archived session directory
+    :return: archived manifest filename
+    """
+    manifest = utilities.get_session_manifest(session_directory)
+    if manifest is None:
+        manifest = OrderedDict([('session_number', utilities.get_session_number(
+            session_info_filename=os.path.join(session_directory, DEFAULT_SESSION_INFO_FILENAME)))])
+    recording_directories, recording_filenames, camera_names = utilities.get_recording_params(
+        session_root_directory=session_directory, verbose=False)
+    manifest['session_directory'] = os.path.abspath(archive_directory)
+    manifest['exported_from'] = os.path.abspath(session_directory)
+    manifest['camera_order'] = list(camera_names)
+    cameras = manifest.setdefault('cameras', OrderedDict())
+    for cn, rdir, rfile in zip(camera_names, recording_directories, recording_filenames):
+        cameras.setdefault(cn, {})
+        # relative to the archived session, so the archive can be moved
+        cameras[cn]['recording_directory'] = archive_recording_directory(session_directory, rdir, cn)
+        cameras[cn]['recording_filename'] = rfile
+    manifest_filename = os.path.join(archive_directory, DEFAULT_SESSION_MANIFEST_FILENAME)
+    with open(manifest_filename + '.part', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_filename + '.part', manifest_filename)
+    return manifest_filename
+
+
+def session_export_files(session_directory, all_segments=False, settle_time=DEFAULT_WATCH_SETTLE_TIME):
+    """
+    Lists the files of a session to export: recorded segments (from the session file index, see
+        utilities.get_recording_params), log files, and the session's `_SESSION_*` files. Unless `all_segments`, only
+        finalized segments are listed: a later segment of the same camera exists and the file hasn't been modified for
+        `settle_time` seconds, as in query_frames.watch_recording_segments. The session manifest isn't listed; the
+        archive gets a rewritten one (see write_archive_session_manifest).
+    :param session_directory: session directory
+    :param all_segments: T/F include each camera's last segment (recording has stopped)
+    :param settle_time: seconds a segment must be unmodified to be exported
+    :return: list of (source path, path relative to the archived session directory)
+    """
+    recording_directories, recording_filenames, camera_names = utilities.get_recording_params(
+        session_root_directory=session_directory, verbose=False)
+    segments = query_frames.scan_recording_segments(recording_directories=recording_directories,
+                                                    file_name_formats=recording_filenames, camera_names=camera_names)
+    last_segment = {}
+    for vfdr, vfn, vfi, vfc, mtime in segments:
+        last_segment[vfc] = max(last_segment.get(vfc, vfi), vfi)
+    session_directory = os.path.abspath(session_directory)
+    files = []
+    for vfdr, vfn, vfi, vfc, mtime in segments:
+        if all_segments is False and (vfi == last_segment[vfc] or time.time() - mtime < settle_time):
+            continue
+        files.append((os.path.abspath(os.path.join(vfdr, vfn)),
+                      os.path.join(archive_recording_directory(session_directory, vfdr, vfc), vfn)))
+    for fn in sorted(os.listdir(session_directory)):
+        if fn == DEFAULT_SESSION_MANIFEST_FILENAME:
+            continue
+        if fn.startswith('_SESSION_') and os.path.isfile(os.path.join(session_directory, fn)):
+            files.append((os.path.join(session_directory, fn), fn))
+    log_directory = os.path.join(session_directory, 'logs')
+    if os.path.isdir(log_directory):
+        for dirpath, dirnames, filenames in os.walk(log_directory):
+            for fn in sorted(filenames):
+                source = os.path.join(dirpath, fn)
+                files.append((source, os.path.relpath(source, session_directory)))
+    return files
+
+
+def load_export_manifest(manifest_file):
+    """
+    :param manifest_file: export manifest (JSON lines, one per exported file; later lines replace earlier ones)
+    :return: dictionary {relative path: manifest entry}
+    """
+    entries = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[entry['path']] = entry
+                except (ValueError, KeyError):
+                    # a line cut off by an interrupted run; its file is exported again
+                    continue
+    return entries
+
+
+def file_checksum(file_path, block_size=DEFAULT_EXPORT_BLOCK_SIZE):
+    """
+    :param file_path: path to file
+    :param block_size: read size in bytes
+    :return: SHA-256 hex digest, computed while streaming the file
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def export_file(source, destination, bucket, block_size=DEFAULT_EXPORT_BLOCK_SIZE):
+    """
+    Copies one file under the bandwidth cap and verifies it: the SHA-256 of the source is computed while copying and
+        compared with that of the written copy, read back. The copy is written beside the destination and renamed
+        once verified.
+    :param source: source file path
+    :param destination: destination file path
+    :param bucket: TokenBucket shared by the copy threads
+    :param block_size: copy block size in bytes
+    :return: manifest entry dictionary, or None if the source changed while copying or verification failed
+    """
+    stat0 = os.stat(source)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    part_path = destination + '.part'
+    sha = hashlib.sha256()
+    with open(source, 'rb') as fin, open(part_path, 'wb') as fout:
+        while True:
+            block = fin.read(block_size)
+            if len(block) == 0:
+                break
+            bucket.consume(len(block))
+            sha.update(block)
+            fout.write(block)
+        fout.flush()
+        os.fsync(fout.fileno())
+    stat1 = os.stat(source)
+    if (stat1.st_size, stat1.st_mtime) != (stat0.st_size, stat0.st_mtime):
+        print("{} changed while it was copied; skipping it.".format(source))
+        os.remove(part_path)
+        return None
+    checksum = sha.hexdigest()
+    if file_checksum(part_path, block_size) != checksum:
+        print("CHECKSUM MISMATCH FOR {}".format(destination))
+        os.remove(part_path)
+        return None
+    os.replace(part_path, destination)
+    return OrderedDict([('source', source), ('size', stat0.st_size), ('mtime', stat0.st_mtime),
+                        ('sha256', checksum), ('exported', datetime.datetime.now().isoformat())])
+
+
+def export_session(session_directory, archive_root, workers=DEFAULT_EXPORT_WORKERS, max_rate=None,
+                   all_segments=False, max_disk_busy_percent=DEFAULT_EXPORT_MAX_DISK_BUSY_PERCENT,
+                   block_size=DEFAULT_EXPORT_BLOCK_SIZE):
+    """
+    Exports a session to `archive_root`/<session directory name>/ with a pool of copy threads (see
+        session_export_files and export_file). Each verified file is appended to the export manifest in the archived
+        session, so an interrupted or repeated export copies only files that are new or have changed since. The
+        archived session gets a manifest pointing at its own copies (see write_archive_session_manifest).
+    :param session_directory: session directory
+    :param archive_root: archive root directory
+    :param workers: number of files copied at once
+    :param max_rate: bandwidth cap in bytes per second, across all copy threads (None for no cap)
+    :param all_segments: T/F include each camera's last segment (recording has stopped)
+    :param max_disk_busy_percent: disk busy percent above which the export backs off (None to never back off)
+    :param block_size: copy block size in bytes
+    :return: dictionary of counts {'exported', 'skipped', 'failed', 'bytes'}
+    """
+    archive_directory = os.path.join(archive_root, os.path.basename(os.path.abspath(session_directory)))
+    os.makedirs(archive_directory, exist_ok=True)
+    manifest_file = os.path.join(archive_directory, DEFAULT_EXPORT_MANIFEST_FILENAME)
+    manifest = load_export_manifest(manifest_file)
+    manifest_lock = threading.Lock()
+    counts = {'exported': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+    todo = []
+    for source, relative_path in session_export_files(session_directory, all_segments=all_segments):
+        entry = manifest.get(relative_path)
+        stat = os.stat(source)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime and \
+                os.path.exists(os.path.join(archive_directory, relative_path)):
+            counts['skipped'] += 1
+        else:
+            todo.append((source, relative_path))
+    print("{} files to export ({:.1f} GB); {} already exported.".format(
+        len(todo), sum([os.path.getsize(source) for source, _ in todo]) / 1024 ** 3, counts['skipped']))
+    bucket = TokenBucket(rate=max_rate)
+    backoff = None
+    if max_disk_busy_percent is not None:
+        backoff = DiskPressureBackoff(bucket, max_disk_busy_percent=max_disk_busy_percent).start()
+
+    def export(item):
+        source, relative_path = item
+        try:
+            entry = export_file(source, os.path.join(archive_directory, relative_path), bucket, block_size)
+        except OSError:
+            print("Couldn't export {}.".format(source))
+            print_exc()
+            entry = None
+        with manifest_lock:
+            if entry is None:
+                counts['failed'] += 1
+                return
+            entry['path'] = relative_path
+            entry.move_to_end('path', last=False)
+            with open(manifest_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            counts['exported'] += 1
+            counts['bytes'] += entry['size']
+        print("Exported {} ({:.1f} MB).".format(relative_path, entry['size'] / 1024 ** 2))
+
+    t0 = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='export') as executor:
+            list(executor.map(export, todo))
+    finally:
+        if backoff is not None:
+            backoff.stop()
+    write_archive_session_manifest(session_directory, archive_directory)
+    seconds = time.time() - t0
+    print("Exported {} files ({:.1f} GB) in {:.0f} seconds ({:.1f} MB/s); {} skipped, {} failed{}.".format(
+        counts['exported'], counts['bytes'] / 1024 ** 3, seconds, counts['bytes'] / 1024 ** 2 / max(seconds, 1e-6),
+        counts['skipped'], counts['failed'], '' if backoff is None else
+        '; backed off {} times, paused {:.0f} seconds'.format(backoff.backoffs, backoff.paused_seconds)))
+    return counts
+
+
+def main(argv):
+    usage = """
+    session_export.py [-h] -s <session-directory> -a <archive-root> [-w <workers>] [-r <MB/s>] [--all_segments]
+        [--max_disk_busy <percent>]
+    -h/--help: print usage information, then exit
+    -s/--session_directory= : (required) session directory to export
+    -a/--archive_root= : (required) archive root; the session is exported to a directory of the same name in it
+    -w/--workers= : number of files copied at once (default {})
+    -r/--rate= : bandwidth cap in MB/s across all copies, 0 for no cap (default {})
+    --all_segments: also export each camera's last segment (only once recording has stopped)
+    --max_disk_busy= : disk busy percent above which the export backs off, 0 to never back off (default {})
+    """.format(DEFAULT_EXPORT_WORKERS, DEFAULT_EXPORT_MAX_RATE, DEFAULT_EXPORT_MAX_DISK_BUSY_PERCENT)
+    try:
+        opts, args = getopt.getopt(argv, 'hs:a:w:r:', ['help', 'session_directory=', 'archive_root=', 'workers=',
+                                                       'rate=', 'all_segments', 'max_disk_busy='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    session_directory = None
+    archive_root = None
+    workers = DEFAULT_EXPORT_WORKERS
+    max_rate = DEFAULT_EXPORT_MAX_RATE
+    all_segments = False
+    max_disk_busy = DEFAULT_EXPORT_MAX_DISK_BUSY_PERCENT
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-s', '--session_directory'):
+            session_directory = arg
+        elif opt in ('-a', '--archive_root'):
+            archive_root = arg
+        elif opt in ('-w', '--workers'):
+            workers = int(arg)
+        elif opt in ('-r', '--rate'):
+            max_rate = float(arg)
+        elif opt == '--all_segments':
+            all_segments = True
+        elif opt == '--max_disk_busy':
+            max_disk_busy = float(arg)
+    if session_directory is None or archive_root is None:
+        print("Must supply session directory and archive root.")
+        print("Usage:", usage)
+        sys.exit(2)
+    try:
+        counts = export_session(session_directory, archive_root, workers=workers,
+                                max_rate=max_rate * 1024 ** 2 if max_rate > 0 else None, all_segments=all_segments,
+                                max_disk_busy_percent=max_disk_busy if max_disk_busy > 0 else None)
+    except KeyboardInterrupt:
+        print("Stopped; exported files are in the manifest and the rest will be exported on the next run.")
+        sys.exit()
+    if counts['failed'] > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
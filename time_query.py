@@ -0,0 +1,325 @@
+import os
+import sys
+import getopt
+import datetime
+import subprocess
+from traceback import print_exc
+
+import numpy as np
+
+import utilities
+from parameters import *
+from frame_store import FrameTimestampStore
+
+
+class SessionTimeIndex:
+    """
+    Per-session index mapping wall-clock time to recording segments, so that "what did each camera see at time T" is a
+        binary search instead of a pass over the recordings. Each segment's time span comes from the frame timestamp
+        store when the segment has been processed (query_frames.py -t), otherwise it is estimated from the session
+        start time and the recording segment duration. With aligned segment rollover, the estimate is exact up to a
+        keyframe interval: each segment starts at the time in its file name and ends at the next boundary. The index
+        is persisted in the session directory (DEFAULT_TIME_INDEX_FILENAME) and rebuilt when the recordings or the
+        store have changed since.
+    """
+    def __init__(self, session_directory, store_directory=None, nominal_fps=NOMINAL_CAMERA_FRAME_RATE):
+        """
+        :param session_directory: session directory, containing _SESSION_INFO.txt and _SESSION_CONFIG.config
+        :param store_directory: frame timestamp store location (default: DEFAULT_FRAME_TIMESTAMP_STORE in the session)
+        :param nominal_fps: nominal camera frame rate, for frame offsets in segments not in the store
+        :return: None
+        """
+        self.session_directory = session_directory
+        if store_directory is None:
+            store_directory = os.path.join(session_directory, DEFAULT_FRAME_TIMESTAMP_STORE)
+        self.store = None
+        if os.path.exists(os.path.join(store_directory, 'index.json')):
+            self.store = FrameTimestampStore(store_directory=store_directory)
+        self.nominal_fps = nominal_fps
+        self.index_file = os.path.join(session_directory, DEFAULT_TIME_INDEX_FILENAME)
+        self.recording_directories, self.file_name_formats, self.camera_names = utilities.get_recording_params(
+            session_root_directory=session_directory, verbose=False)
+        # {camera: {'segment': array, 'start': array, 'end': array, 'frames': array, 'estimated': array,
+        #   'path': array}, ...}, each sorted by segment start time
+        self.cameras = {}
+
+    def _is_stale(self):
+        # the index is out of date if recordings were added or the store was written after it was saved
+        if not os.path.exists(self.index_file):
+            return True
+        index_mtime = os.path.getmtime(self.index_file)
+        watched = [d for d in set(self.recording_directories) if os.path.exists(d)]
+        if self.store is not None:
+            watched.append(self.store.index_file)
+        # status change time also catches files copied or moved in with an older modification time
+        return any([max(os.stat(w).st_mtime, os.stat(w).st_ctime) > index_mtime for w in watched])
+
+    def load(self, rebuild=False):
+        """
+        Loads the persisted index, building (and saving) it first if it is missing, out of date, or `rebuild` is True.
+        :param rebuild: T/F force the index to be rebuilt
+        :return: self
+        """
+        if rebuild is True or self._is_stale():
+            self.build()
+            self.save()
+            return self
+        with np.load(self.index_file) as data:
+            cameras = data['camera']
+            for cam in np.unique(cameras):
+                sel = cameras == cam
+                self.cameras[str(cam)] = {field: data[field][sel] for field in
+                                          ('segment', 'start', 'end', 'frames', 'estimated', 'path')}
+        return self
+
+    def build(self):
+        """
+        Scans the recording directories and the frame timestamp store to determine the time span of every segment.
+        :return: None
+        """
+        info_file = os.path.join(self.session_directory, DEFAULT_SESSION_INFO_FILENAME)
+        session_start = utilities.get_session_start_time_local(info_file).timestamp()
+        segment_seconds = utilities.get_sesssion_recording_segment_time(info_file) * 60
+        files = utilities.find_files(recording_directories=self.recording_directories,
+                                     file_name_formats=self.file_name_formats, camera_names=self.camera_names,
+                                     verbose=False)
+        file_name_formats = dict(zip(self.camera_names, self.file_name_formats))
+        self.cameras = {}
+        rows = {}
+        for vfdr, vfn, vfi, vfc in files:
+            start, end = session_start + vfi * segment_seconds, session_start + (vfi + 1) * segment_seconds
+            segment_start = utilities.get_segment_start_time(file_name_formats[vfc], vfn)
+            if segment_start is not None:
+                start, end = segment_start, (np.floor(segment_start / segment_seconds) + 1) * segment_seconds
+            frames, estimated = int(round(segment_seconds * self.nominal_fps)), True
+            if self.store is not None and self.store.has(vfc, vfi):
+                ts = self.store.load(vfc, vfi)['timestamp']
+                valid = ts[np.isfinite(ts)]
+                if len(valid) > 0:
+                    start, end = float(valid[0]), float(valid[-1]) + 1. / self.nominal_fps
+                    frames, estimated = len(ts), False
+            rows.setdefault(vfc, []).append((vfi, start, end, frames, estimated, os.path.join(vfdr, vfn)))
+        for cam, cam_rows in rows.items():
+            cam_rows = sorted(cam_rows, key=lambda x: x[1])
+            segment, start, end, frames, estimated, path = zip(*cam_rows)
+            self.cameras[cam] = {'segment': np.array(segment, dtype=np.int64), 'start': np.array(start),
+                                 'end': np.array(end), 'frames': np.array(frames, dtype=np.int64),
+                                 'estimated': np.array(estimated, dtype=bool), 'path': np.array(path)}
+
+    def save(self):
+        """
+        Writes the index to the session directory as flat arrays (no pickled objects), write-then-rename.
+        :return: None
+        """
+        cams = sorted(self.cameras.keys())
+        arrays = {'camera': np.concatenate([np.full(len(self.cameras[c]['segment']), c) for c in cams])
+                  if len(cams) > 0 else np.zeros(0, dtype=str)}
+        for field in ('segment', 'start', 'end', 'frames', 'estimated', 'path'):
+            arrays[field] = (np.concatenate([self.cameras[c][field] for c in cams]) if len(cams) > 0
+                             else np.zeros(0))
+        tmp_file = self.index_file + '.tmp.npz'
+        np.savez(tmp_file, **arrays)
+        os.replace(tmp_file, self.index_file)
+
+    def _frame_offset(self, camera, i, t, side='left'):
+        # frame index within segment i of the camera at (or after, for side='left') wall-clock time t
+        cam = self.cameras[camera]
+        if bool(cam['estimated'][i]) is True or self.store is None:
+            offset = (t - cam['start'][i]) * self.nominal_fps
+            offset = np.ceil(offset) if side == 'left' else np.floor(offset)
+            return int(min(max(offset, 0), cam['frames'][i] - 1))
+        ts = self.store.load(camera, cam['segment'][i])['timestamp']
+        valid_idx = np.flatnonzero(np.isfinite(ts))
+        j = np.searchsorted(ts[valid_idx], t, side=side)
+        if side == 'right':
+            j -= 1
+        return int(valid_idx[min(max(j, 0), len(valid_idx) - 1)])
+
+    def locate(self, start_time, end_time=None, cameras=None):
+        """
+        Maps a wall-clock time range to the recording segments and frame ranges covering it, for each camera.
+        :param start_time: range start, seconds since epoch
+        :param end_time: range end, seconds since epoch (default: single frame at `start_time`)
+        :param cameras: list of camera names (default: all cameras in the index)
+        :return: dictionary {camera: [(segment-number, file-path, first-frame, last-frame, estimated), ...], ...};
+            cameras with no recording at that time have an empty list
+        """
+        if end_time is None:
+            end_time = start_time
+        if len(self.cameras) == 0:
+            self.load()
+        matches = {}
+        for camera in (cameras if cameras is not None else sorted(self.cameras.keys())):
+            matches[camera] = []
+            if camera not in self.cameras:
+                continue
+            cam = self.cameras[camera]
+            # segments that start at or before the range end, and end after the range start
+            first = max(np.searchsorted(cam['start'], start_time, side='right') - 1, 0)
+            last = np.searchsorted(cam['start'], end_time, side='right')
+            for i in range(first, last):
+                if cam['end'][i] <= start_time:
+                    continue
+                first_frame = self._frame_offset(camera, i, max(start_time, cam['start'][i]), side='left')
+                last_frame = (self._frame_offset(camera, i, end_time, side='right')
+                              if end_time < cam['end'][i] else int(cam['frames'][i]) - 1)
+                matches[camera].append((int(cam['segment'][i]), str(cam['path'][i]), first_frame,
+                                        max(first_frame, last_frame), bool(cam['estimated'][i])))
+        return matches
+
+
+def read_segment_frames(file_path, first_frame, last_frame):
+    """
+    Decodes a frame range from one recording segment. The seek lands on the keyframe at or before `first_frame` and
+        decodes forward from there (OpenCV/FFmpeg frame-accurate seek), so only one GOP is decoded before the range.
+    :param file_path: path to video file
+    :param first_frame: first frame index to return
+    :param last_frame: last frame index to return (inclusive)
+    :return: list of tuples (frame-index, frame-pixels)
+    """
+    import cv2
+    cap = cv2.VideoCapture(file_path)
+    assert cap.isOpened(), "Cannot open file \"{}\"".format(file_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+    frames = []
+    for idx in range(first_frame, last_frame + 1):
+        ret, frame = cap.read()
+        if frame is None:
+            break
+        frames.append((idx, frame))
+    cap.release()
+    return frames
+
+
+def write_segment_clip(file_path, first_frame, last_frame, output_path, nominal_fps=NOMINAL_CAMERA_FRAME_RATE):
+    """
+    Writes a frame range of one recording segment to a new file with FFmpeg stream copy (no re-encoding). The clip
+        starts at the keyframe at or before `first_frame`, since a stream copy cannot start between keyframes.
+    :param file_path: path to video file
+    :param first_frame: first frame index of the range
+    :param last_frame: last frame index of the range (inclusive)
+    :param output_path: path of the clip to write
+    :param nominal_fps: frame rate used to convert frame indices to seek positions
+    :return: T/F FFmpeg succeeded
+    """
+    cmd = ["ffmpeg", "-v", "error", "-y", "-ss", "{:.3f}".format(first_frame / nominal_fps), "-i", file_path,
+           "-t", "{:.3f}".format((last_frame - first_frame + 1) / nominal_fps), "-c", "copy",
+           "-avoid_negative_ts", "make_zero", output_path]
+    ccp = subprocess.run(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if ccp.returncode != 0:
+        print("FFMPEG CLIP FAILED FOR {}".format(file_path))
+        print("STDERR:", ccp.stderr)
+        return False
+    return True
+
+
+def parse_query_time(time_string):
+    """
+    :param time_string: seconds since epoch, or local time as 'YYYY-MM-DD HH:MM:SS[.ffffff]'
+    :return: seconds since epoch
+    """
+    try:
+        return float(time_string)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(time_string, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError("Could not parse time \"{}\"; use epoch seconds or 'YYYY-MM-DD HH:MM:SS'.".format(time_string))
+
+
+def main(argv):
+    usage = """
+    time_query.py [-h] -s <session-directory> -t <time> [-e <end-time> | -d <duration>] [-c <cameras>]
+        [-f <frames-directory> | -k <clips-directory>] [--rebuild]
+    -h/--help: print usage information, then exit
+    -s/--session_directory= : (required) session directory
+    -t/--time= : (required) query time, as epoch seconds or local 'YYYY-MM-DD HH:MM:SS[.ffffff]'
+    -e/--end_time= : end of query range (same formats; default: single frame at -t)
+    -d/--duration= : length of query range in seconds (alternative to -e)
+    -c/--cameras= : comma-delineated list of cameras (default all)
+    -f/--frames_directory= : decode the matching frames and write them as JPEG images in this directory
+    -k/--clips_directory= : write the matching range of each segment as a stream-copied clip in this directory
+    --store_directory= : frame timestamp store location (default: frame_timestamps in the session directory)
+    --rebuild: rebuild the session time index even if it is up to date
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'hs:t:e:d:c:f:k:', ['help', 'session_directory=', 'time=', 'end_time=',
+                                                            'duration=', 'cameras=', 'frames_directory=',
+                                                            'clips_directory=', 'store_directory=', 'rebuild'])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    session_directory = None
+    start_time = None
+    end_time = None
+    duration = None
+    cameras = None
+    frames_directory = None
+    clips_directory = None
+    store_directory = None
+    rebuild = False
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-s', '--session_directory'):
+            session_directory = arg
+        elif opt in ('-t', '--time'):
+            start_time = parse_query_time(arg)
+        elif opt in ('-e', '--end_time'):
+            end_time = parse_query_time(arg)
+        elif opt in ('-d', '--duration'):
+            duration = float(arg)
+        elif opt in ('-c', '--cameras'):
+            cameras = arg.split(',')
+        elif opt in ('-f', '--frames_directory'):
+            frames_directory = arg
+        elif opt in ('-k', '--clips_directory'):
+            clips_directory = arg
+        elif opt == '--store_directory':
+            store_directory = arg
+        elif opt == '--rebuild':
+            rebuild = True
+    if session_directory is None or start_time is None:
+        print("Must supply session directory and query time.")
+        print("Usage:", usage)
+        sys.exit(2)
+    if end_time is None and duration is not None:
+        end_time = start_time + duration
+
+    time_index = SessionTimeIndex(session_directory=session_directory, store_directory=store_directory)
+    time_index.load(rebuild=rebuild)
+    matches = time_index.locate(start_time=start_time, end_time=end_time, cameras=cameras)
+    print("\n{:>10} {:>8} {:>8} {:>8} {:>10}  {}".format('camera', 'segment', 'first', 'last', 'estimated', 'file'))
+    for camera, segments in matches.items():
+        if len(segments) == 0:
+            print("{:>10} {:>8}".format(camera, '--'))
+        for segment, path, first_frame, last_frame, estimated in segments:
+            print("{:>10} {:>8} {:>8} {:>8} {:>10}  {}".format(camera, segment, first_frame, last_frame,
+                                                                str(estimated), path))
+
+    if frames_directory is not None:
+        import cv2
+        os.makedirs(frames_directory, exist_ok=True)
+        for camera, segments in matches.items():
+            for segment, path, first_frame, last_frame, estimated in segments:
+                for idx, frame in read_segment_frames(path, first_frame, last_frame):
+                    cv2.imwrite(os.path.join(frames_directory, '{}_{:05d}_{:06d}.jpg'.format(camera, segment, idx)),
+                                frame)
+        print("Frames written to {}.".format(frames_directory))
+    if clips_directory is not None:
+        os.makedirs(clips_directory, exist_ok=True)
+        for camera, segments in matches.items():
+            for segment, path, first_frame, last_frame, estimated in segments:
+                write_segment_clip(path, first_frame, last_frame, os.path.join(
+                    clips_directory, '{}_{:05d}_{:06d}{}'.format(camera, segment, first_frame,
+                                                                 os.path.splitext(path)[1])))
+        print("Clips written to {}.".format(clips_directory))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import json
+import time
+import getopt
+import shutil
+import datetime
+import itertools
+import threading
+import subprocess
+from traceback import print_exc
+from collections import OrderedDict
+
+import utilities
+from parameters import *
+
+# transport settings compared when no grid is given: camera config key and the values tried for it
+DEFAULT_TRANSPORT_GRID = OrderedDict([('rtsp_protocols', ['udp', 'tcp']),
+                                      ('rtsp_latency', ['200', '2000'])])
+
+# fakesink last-message fields, as printed by `gst-launch-1.0 -v`
+PTS_PATTERN = re.compile(r'pts: (\d+):(\d+):(\d+(?:\.\d+)?)')
+BYTES_PATTERN = re.compile(r'\((\d+) bytes')
+
+
+def parse_grid(grid_string):
+    """
+    Parses a transport settings grid from the command line, e.g. 'rtsp_protocols=udp,tcp;rtsp_latency=200,2000'.
+    :param grid_string: semicolon-delineated list of <camera config key>=<comma-delineated values>
+    :return: OrderedDict of {camera config key: [values]}
+    """
+    grid = OrderedDict()
+    for item in grid_string.split(';'):
+        if len(item.strip()) == 0:
+            continue
+        key, values = item.split('=', 1)
+        if not key.strip().startswith('rtsp_'):
+            raise AttributeError("Grid key {} is not an RTSP camera config key.".format(key))
+        grid[key.strip()] = [v.strip() for v in values.split(',')]
+    return grid
+
+
+def transport_settings(grid):
+    """
+    :param grid: OrderedDict of {camera config key: [values]}
+    :return: list of dictionaries of {camera config key: value}, one for each combination of values
+    """
+    keys = list(grid.keys())
+    return [OrderedDict(zip(keys, values)) for values in itertools.product(*[grid[key] for key in keys])]
+
+
+def launch_command(camera_config):
+    """
+    Builds a gst-launch-1.0 command that receives the camera like the session's camera pipeline does (same rtspsrc
+        properties, from utilities.get_rtspsrc_properties) and prints every received frame from a fakesink.
+    :param camera_config: dictionary of one camera's configuration block, including any transport settings
+    :return: command as a list of arguments
+    """
+    cam_connect = 'rtsp://{}@{}'.format(camera_config['rtsp_authentication'], camera_config['rtsp_address'])
+    cmd = ['gst-launch-1.0', '-v', 'rtspsrc', 'location={}'.format(cam_connect)]
+    cmd += ['{}={}'.format(prop, val) for prop, val in utilities.get_rtspsrc_properties(camera_config).items()]
+    cmd += ['!', 'rtph264depay', '!', 'h264parse', '!', 'video/x-h264,alignment=au', '!',
+            'fakesink', 'silent=false', 'sync=false']
+    # gst-launch output is block-buffered when piped, which would bunch up arrival times
+    if shutil.which('stdbuf') is not None:
+        cmd = ['stdbuf', '-oL'] + cmd
+    return cmd
+
+
+def receive_frames(cmd, duration):
+    """
+    Runs a receiving command for a fixed time and records the arrival of each frame printed by its fakesink.
+    :param cmd: command from launch_command()
+    :param duration: seconds to receive
+    :return: list of (arrival time, presentation timestamp in seconds, bytes, discontinuity flag), launch time
+    """
+    frames = []
+
+    def reader(stream):
+        for line in stream:
+            if 'last-message' not in line:
+                continue
+            pts_match = PTS_PATTERN.search(line)
+            if pts_match is None:
+                continue
+            arrival = time.time()
+            pts = int(pts_match.group(1)) * 3600 + int(pts_match.group(2)) * 60 + float(pts_match.group(3))
+            bytes_match = BYTES_PATTERN.search(line)
+            frames.append((arrival, pts, int(bytes_match.group(1)) if bytes_match is not None else 0,
+                           'discont' in line))
+
+    t0 = time.time()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    reader_thread = threading.Thread(target=reader, args=(proc.stdout,), daemon=True)
+    reader_thread.start()
+    try:
+        proc.wait(timeout=duration)
+    except subprocess.TimeoutExpired:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    reader_thread.join(timeout=5)
+    return frames, t0
+
+
+def transport_metrics(frames, launch_time, nominal_fps=NOMINAL_CAMERA_FRAME_RATE, gap_factor=DEFAULT_FRAME_GAP_FACTOR):
+    """
+    Summarizes received frames. Loss is estimated from the presentation timestamp span at the nominal frame rate, and
+        gaps are frame-to-frame timestamp steps longer than `gap_factor` nominal frame periods. Jitter is the RFC 3550
+        interarrival jitter, computed from arrival times at the end of the receiving pipeline (after rtspsrc's jitter
+        buffer), so it is the jitter left for the rest of the session pipelines.
+    :param frames: list of (arrival time, presentation timestamp, bytes, discontinuity flag) from receive_frames()
+    :param launch_time: time at which receiving was started
+    :param nominal_fps: nominal camera frame rate
+    :param gap_factor: frame period multiple above which a timestamp step is counted as a gap
+    :return: dictionary of metrics
+    """
+    metrics = OrderedDict([('frames', len(frames)), ('startup_seconds', None), ('expected_frames', None),
+                           ('lost_frames', None), ('loss_percent', None), ('gap_events', None),
+                           ('discontinuities', None), ('jitter_ms', None), ('max_transit_deviation_ms', None),
+                           ('bitrate_mbps', None)])
+    if len(frames) < 2:
+        return metrics
+    frames = sorted(frames, key=lambda fr: fr[0])
+    pts = [fr[1] for fr in frames]
+    expected = int(round((max(pts) - min(pts)) * nominal_fps)) + 1
+    metrics['startup_seconds'] = frames[0][0] - launch_time
+    metrics['expected_frames'] = expected
+    metrics['lost_frames'] = max(0, expected - len(frames))
+    metrics['loss_percent'] = 100. * metrics['lost_frames'] / expected
+    sorted_pts = sorted(pts)
+    metrics['gap_events'] = sum([1 for a, b in zip(sorted_pts[:-1], sorted_pts[1:])
+                                 if b - a > gap_factor / nominal_fps])
+    # the first buffer is always flagged as a discontinuity
+    metrics['discontinuities'] = sum([1 for fr in frames[1:] if fr[3] is True])
+    jitter, max_deviation = 0., 0.
+    for previous, current in zip(frames[:-1], frames[1:]):
+        deviation = abs((current[0] - previous[0]) - (current[1] - previous[1]))
+        jitter += (deviation - jitter) / 16.
+        max_deviation = max(max_deviation, deviation)
+    metrics['jitter_ms'] = jitter * 1000.
+    metrics['max_transit_deviation_ms'] = max_deviation * 1000.
+    receive_time = frames[-1][0] - frames[0][0]
+    if receive_time > 0:
+        metrics['bitrate_mbps'] = sum([fr[2] for fr in frames]) * 8 / receive_time / 1e6
+    return metrics
+
+
+def benchmark_camera(camera_config, settings, duration):
+    """
+    Receives one camera with each transport setting in turn.
+    :param camera_config: dictionary of the camera's configuration block
+    :param settings: list of dictionaries of {camera config key: value} from transport_settings()
+    :param duration: seconds to receive with each setting
+    :return: list of run dictionaries, with the settings, resulting rtspsrc properties, and metrics
+    """
+    runs = []
+    for setting in settings:
+        setting_config = dict(camera_config)
+        setting_config.update(setting)
+        run = OrderedDict([('camera', camera_config['name']), ('settings', setting),
+                           ('rtspsrc', utilities.get_rtspsrc_properties(setting_config))])
+        print("Receiving {} for {} seconds with {}.".format(camera_config['name'], duration, dict(setting)))
+        frames, launch_time = receive_frames(launch_command(setting_config), duration)
+        run.update(transport_metrics(frames, launch_time))
+        runs.append(run)
+        if run['loss_percent'] is None:
+            print("  no frames received.")
+        else:
+            print("  frames={frames}, loss={loss_percent:.2f}%, gaps={gap_events}, jitter={jitter_ms:.1f} ms".format(
+                **run))
+    return runs
+
+
+def main(argv):
+    usage = """
+    transport_benchmark.py [-h] -c <config-file> [-n <cameras>] [-d <duration>] [-g <grid>] [-o <output>]
+    -h/--help: print usage information, then exit
+    -c/--config_file= : session config file; cameras are received with their __CAMERA__ settings, overridden by the grid
+    -n/--cameras= : comma-delineated list of camera names to test (default: all cameras in the config file)
+    -d/--duration= : seconds each camera is received with each setting (default {})
+    -g/--grid= : settings to compare, as <key>=<values>[;<key>=<values>...] with comma-delineated values and keys
+        from the __CAMERA__ RTSP settings (default 'rtsp_protocols=udp,tcp;rtsp_latency=200,2000')
+    -o/--output= : JSON report file (default transport_benchmark_<datetime>.json)
+    """.format(DEFAULT_TRANSPORT_BENCHMARK_DURATION)
+    try:
+        opts, args = getopt.getopt(argv, 'hc:n:d:g:o:', ['help', 'config_file=', 'cameras=', 'duration=', 'grid=',
+                                                         'output='])
+    except getopt.GetoptError:
+        print("Usage:", usage)
+        print_exc()
+        sys.exit(2)
+    config_file = None
+    camera_names = None
+    duration = DEFAULT_TRANSPORT_BENCHMARK_DURATION
+    grid = DEFAULT_TRANSPORT_GRID
+    output_file = 'transport_benchmark_{}.json'.format(datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print("Usage:", usage)
+            sys.exit()
+        elif opt in ('-c', '--config_file'):
+            config_file = arg
+        elif opt in ('-n', '--cameras'):
+            camera_names = arg.split(',')
+        elif opt in ('-d', '--duration'):
+            duration = float(arg)
+        elif opt in ('-g', '--grid'):
+            grid = parse_grid(arg)
+        elif opt in ('-o', '--output'):
+            output_file = arg
+    if config_file is None:
+        print("Must supply a session config file.")
+        print("Usage:", usage)
+        sys.exit(2)
+
+    camera_config, _, _, _ = utilities.parse_config_file(config_file)
+    if camera_names is not None:
+        camera_config = [cc for cc in camera_config if cc['name'] in camera_names]
+    settings = transport_settings(grid)
+    # check every combination before receiving anything
+    try:
+        for cc in camera_config:
+            for setting in settings:
+                setting_config = dict(cc)
+                setting_config.update(setting)
+                utilities.get_rtspsrc_properties(setting_config)
+    except AttributeError as e:
+        print(e)
+        sys.exit(2)
+
+    report = OrderedDict([('datetime', datetime.datetime.now().isoformat()),
+                          ('config_file', os.path.abspath(config_file)), ('duration', duration),
+                          ('nominal_frame_rate', NOMINAL_CAMERA_FRAME_RATE),
+                          ('grid', grid), ('runs', [])])
+    for cc in camera_config:
+        report['runs'] += benchmark_camera(cc, settings, duration)
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    # lowest loss first, then lowest jitter
+    for cc in camera_config:
+        cam_runs = [run for run in report['runs'] if run['camera'] == cc['name'] and run['loss_percent'] is not None]
+        if len(cam_runs) == 0:
+            print("{}: no frames received with any setting.".format(cc['name']))
+            continue
+        best = min(cam_runs, key=lambda run: (run['loss_percent'], run['jitter_ms']))
+        print("{}: best setting {} (loss {:.2f}%, jitter {:.1f} ms)".format(
+            cc['name'], dict(best['settings']), best['loss_percent'], best['jitter_ms']))
+    print("Benchmark report written to {}.".format(output_file))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
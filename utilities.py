@@ -1,9 +1,13 @@
 import os
 import re
+import json
+import shutil
 import pickle
 import cv2
 import ast
+import numpy as np
 from numpy import array
+from collections import OrderedDict
 from parameters import *
     
 
@@ -28,6 +32,16 @@ def get_timestamp_geometry(abs_path=None):
     return g
 
 
+def get_timestamp_digit_pixels(abs_path=None):
+    path = './resources/timestamp_digits.pkl'
+    if abs_path is not None:
+        path = abs_path
+
+    with open(path, 'rb') as pf:
+        digits = pickle.load(pf)
+    return digits
+
+
 def get_timestamp_pixel_limits():
     """
     Provides x/y coordinates (only) for timestamp pixel extraction. Note that return order is y1, y2, x1, x2. Timestamp
@@ -111,21 +125,229 @@ def parse_frame_timestamp(timestamp_geometry, precomputed_checksums, frame_pixel
     return ast.literal_eval(''.join(map(str, ts_dig))), None
 
 
-def parse_config_file(config_file):
+def parse_frame_timestamps_batch(timestamp_geometry, precomputed_checksums, frames=None, timestamp_pixels=None):
     """
-    Parses an entire session configuration file into sections (in this order): cameras, image snapshot, video snapshot,
-        and recording.
+    Vectorized version of `parse_frame_timestamp()` that parses a stack of frames at once. The gray-scale conversion
+        uses the same fixed-point weights as cv2.cvtColor(..., cv2.COLOR_BGR2GRAY), and the same threshold and 6-area
+        checksums are used, so results are identical to the single-frame parser.
+    :param timestamp_geometry: dictionary of parameters used for determining area of each digit in checksum
+        (load using utilities.get_timestamp_geometry)
+    :param precomputed_checksums: dictionary of checksum:digit pairs (load using utilities.get_precomputed_checksums())
+    :param frames: numpy array of stacked full (4K) BGR video frames; dimensions should be Nx2160x3840x3
+    :param timestamp_pixels: numpy array of stacked timestamp areas (NxHxWx3), defined by `get_timestamp_pixel_limits()`
+    :return: numpy array of timestamps (float64, NaN where checksum error), boolean numpy array of valid timestamps
+    """
+    g = timestamp_geometry
+    w, h, x0, y0, n = g['w'], g['h'], g['x0'], g['y0'], g['n']
+    h13, h23, w12 = g['h13'], g['h23'], g['w12']
+    if frames is not None:
+        tsimg = frames[:, y0:(y0+h), x0:(x0+(n*w)), :]
+    elif timestamp_pixels is not None:
+        tsimg = timestamp_pixels
+    else:
+        raise ValueError("One of `frames` or `timestamp_pixels` must be specified.")
+    num = tsimg.shape[0]
+    # 15-bit fixed-point BGR->gray with rounding, which matches OpenCV 4 exactly for all colors
+    # then the same fixed threshold (1/2 intensity) as the single-frame parser
+    bgr = tsimg.astype(np.uint32)
+    tsgray = (bgr[..., 0] * 3735 + bgr[..., 1] * 19235 + bgr[..., 2] * 9798 + 16384) >> 15
+    tsmask = (tsgray > 127).astype(np.uint8)
+    # split into digit cells (N x h x n x w), then sum each of the 6 checksum areas per cell -> N x n x 3 x 2
+    cells = tsmask.reshape(num, h, n, w)
+    rows = np.stack([cells[:, :h13].sum(axis=1), cells[:, h13:h23].sum(axis=1), cells[:, h23:].sum(axis=1)], axis=2)
+    cs = np.stack([rows[..., :w12].sum(axis=-1), rows[..., w12:].sum(axis=-1)], axis=-1)
+    # compare every cell against every candidate digit; need an exact match, as in the single-frame parser
+    ref_digits = np.array(sorted(precomputed_checksums.keys()))
+    ref_cs = np.stack([precomputed_checksums[d] for d in ref_digits])
+    err = np.abs(cs[:, :, None, :, :].astype(np.int16) - ref_cs[None, None].astype(np.int16)).sum(axis=(-2, -1))
+    digits = ref_digits[err.argmin(axis=-1)]
+    exact = err.min(axis=-1) == 0
+    # disregard the decimal point in the UNIX time (always reported in .00 precision)
+    digit_idx = [j for j in range(n) if j != 10]
+    valid = exact[:, digit_idx].all(axis=1)
+    int_part = np.zeros(num, dtype=np.int64)
+    for j in range(10):
+        int_part = int_part * 10 + digits[:, j]
+    frac_part = np.zeros(num, dtype=np.int64)
+    for j in range(11, n):
+        frac_part = frac_part * 10 + digits[:, j]
+    timestamps = (int_part * 10 ** (n - 11) + frac_part) / float(10 ** (n - 11))
+    timestamps[~valid] = np.nan
+    return timestamps, valid
+
+
+class TimestampDecoder:
+    """
+    Stateful frame timestamp parser for consecutive frames of one camera. Camera timestamps advance monotonically by
+        about 1/30 second per frame, so only the low-order digit cells that can change within `max_frame_delta` of
+        the previous value are parsed. The leading cells are carried over when their pixel mask is identical to the
+        previous frame's. If a leading cell changed, a parsed cell has no exact checksum match, or the result is not a
+        plausible advance, the frame is fully re-decoded with `parse_frame_timestamp()`.
+        Repeats, backward steps, and jumps larger than `max_frame_delta` are flagged as anomalies as they are found.
+    """
+    def __init__(self, timestamp_geometry, precomputed_checksums, max_frame_delta=DEFAULT_TIMESTAMP_MAX_FRAME_DELTA,
+                 verify_interval=DEFAULT_TIMESTAMP_VERIFY_INTERVAL, anomaly_callback=None):
+        """
+        :param timestamp_geometry: dictionary of timestamp geometry (load using utilities.get_timestamp_geometry)
+        :param precomputed_checksums: dictionary of checksum:digit pairs (load using utilities.get_precomputed_checksums)
+        :param max_frame_delta: largest frame-to-frame timestamp advance, in seconds, that is not an anomaly
+        :param verify_interval: cross-check the incremental result with a full decode every N frames (0 = never)
+        :param anomaly_callback: optional function called with each anomaly tuple when it is found
+        :return: None
+        """
+        self.geometry = timestamp_geometry
+        self.checksums = precomputed_checksums
+        g = timestamp_geometry
+        self.w, self.h, self.n = g['w'], g['h'], g['n']
+        self.h13, self.h23, self.w12 = g['h13'], g['h23'], g['w12']
+        # cell index in the overlay for each digit, most significant first (cell 10 is the decimal point)
+        self.digit_cells = [j for j in range(self.n) if j != 10]
+        self.num_decimals = self.n - 11
+        # exact checksum lookup, avoiding the nearest-candidate search for the cells that are checked
+        self.checksum_lookup = {tuple(np.asarray(cs).flatten()): dig for dig, cs in precomputed_checksums.items()}
+        self.max_frame_delta = int(round(max_frame_delta * 10 ** self.num_decimals))
+        self.verify_interval = verify_interval
+        self.anomaly_callback = anomaly_callback
+        self.anomalies = []         # [(frame index, previous timestamp, timestamp, kind), ...]
+        self.stats = {'frames': 0, 'incremental': 0, 'full': 0, 'verify': 0, 'failures': 0}
+        self.previous = None        # previous timestamp in integer units of the last decimal place
+        self.previous_mask = None   # previous binary mask of the timestamp area
+        self.frame_index = -1
+
+    def reset(self):
+        """
+        Forgets the previous timestamp (e.g., before decoding a different camera); anomalies and stats are kept.
+        :return: None
+        """
+        self.previous = None
+        self.previous_mask = None
+
+    def _digits(self, value):
+        return '{:0{}d}'.format(value, len(self.digit_cells))
+
+    def _to_timestamp(self, value):
+        return value / float(10 ** self.num_decimals)
+
+    def _flag(self, previous, value, kind):
+        anomaly = (self.frame_index, self._to_timestamp(previous), self._to_timestamp(value)
+                   if value is not None else None, kind)
+        self.anomalies.append(anomaly)
+        if self.anomaly_callback is not None:
+            self.anomaly_callback(anomaly)
+
+    def _full_decode(self, tsimg):
+        self.stats['full'] += 1
+        ts, px_err = parse_frame_timestamp(self.geometry, self.checksums, timestamp_pixels=tsimg)
+        if ts is None:
+            return None, px_err
+        return int(round(ts * 10 ** self.num_decimals)), None
+
+    def _check_transition(self, value):
+        # check a fully-decoded value against the previous one and flag anomalies
+        if self.previous is not None:
+            delta = value - self.previous
+            if delta == 0:
+                self._flag(self.previous, value, 'repeat')
+            elif delta < 0:
+                self._flag(self.previous, value, 'backward')
+            elif delta > self.max_frame_delta:
+                self._flag(self.previous, value, 'jump')
+
+    def decode(self, frame_pixels=None, timestamp_pixels=None):
+        """
+        Parses the timestamp of the next frame. Same arguments and return as `parse_frame_timestamp()`.
+        :param frame_pixels: numpy array of full (4K) color video frame; dimensions should be 2160x3840x3
+        :param timestamp_pixels: numpy array of timestamp area, defined by `get_timestamp_pixel_limits()`
+        :return: timestamp (None if checksum error), pixels from error digit (if no exact checksum match)
+        """
+        self.frame_index += 1
+        self.stats['frames'] += 1
+        g = self.geometry
+        if frame_pixels is not None:
+            tsimg = frame_pixels[g['y0']:(g['y0']+self.h), g['x0']:(g['x0']+(self.n*self.w)), :]
+        elif timestamp_pixels is not None:
+            tsimg = timestamp_pixels
+        else:
+            raise ValueError("One of `frame_pixels` or `timestamp_pixels` must be specified.")
+
+        # same gray-scale conversion and threshold as parse_frame_timestamp()
+        tsmask = cv2.cvtColor(tsimg, cv2.COLOR_BGR2GRAY) > 127
+        value = None
+        if self.previous is not None:
+            value = self._incremental_decode(tsmask)
+        if value is None:
+            # no previous value, or the incremental check failed, so parse every cell
+            value, px_err = self._full_decode(tsimg)
+            if value is None:
+                self.stats['failures'] += 1
+                if self.previous is not None:
+                    self._flag(self.previous, None, 'unreadable')
+                return None, px_err
+            self._check_transition(value)
+        elif self.verify_interval > 0 and self.frame_index % self.verify_interval == 0:
+            # periodically cross-check the carried-over leading cells
+            self.stats['verify'] += 1
+            full_value, _ = self._full_decode(tsimg)
+            if full_value is not None and full_value != value:
+                self._flag(value, full_value, 'verify_mismatch')
+                self._check_transition(full_value)
+                value = full_value
+        else:
+            self.stats['incremental'] += 1
+        self.previous = value
+        self.previous_mask = tsmask
+        return self._to_timestamp(value), None
+
+    def _incremental_decode(self, tsmask):
+        """
+        Decodes only the digit cells that differ between the previous value and the previous value plus the maximum
+            frame delta; every value in between shares the leading cells, which must be pixel-identical to the
+            previous frame. Returns None if a leading cell changed, any parsed cell has no exact checksum match, or the
+            result is not an advance within the maximum frame delta.
+        """
+        prev_digits = self._digits(self.previous)
+        max_digits = self._digits(self.previous + self.max_frame_delta)
+        if len(max_digits) != len(prev_digits):
+            return None
+        first = 0
+        while first < len(prev_digits) and prev_digits[first] == max_digits[first]:
+            first += 1
+        w, h13, h23, w12 = self.w, self.h13, self.h23, self.w12
+        # a jump that changes only leading cells would otherwise go unnoticed
+        lead = self.digit_cells[first] * w if first < len(prev_digits) else tsmask.shape[1]
+        if tsmask.shape != self.previous_mask.shape or \
+                not np.array_equal(tsmask[:, :lead], self.previous_mask[:, :lead]):
+            return None
+        new_digits = list(prev_digits)
+        for k in range(first, len(prev_digits)):
+            j = self.digit_cells[k]
+            # same 6-area checksum as parse_frame_timestamp(), on one cell only
+            pixels = tsmask[:, j*w:(j+1)*w]
+            cs = (int(pixels[:h13, :w12].sum()), int(pixels[:h13, w12:].sum()),
+                  int(pixels[h13:h23, :w12].sum()), int(pixels[h13:h23, w12:].sum()),
+                  int(pixels[h23:, :w12].sum()), int(pixels[h23:, w12:].sum()))
+            dig = self.checksum_lookup.get(cs)
+            if dig is None:
+                return None
+            new_digits[k] = str(dig)
+        value = int(''.join(new_digits))
+        if 0 < value - self.previous <= self.max_frame_delta:
+            return value
+        return None
+
+
+def _parse_config_blocks(config_file):
+    """
+    Parses an entire session configuration file into its blocks, without checking block counts.
     :param config_file: path to configuration file
-    :return: configuration dictionaries of key-value pairs; list of dicts for cameras section, single dict for others.
+    :return: dictionary of {block_header: [block dict, block dict, ...]} for every known block header
     """
-    camera_config = []
-    image_snap_config = []
-    video_snap_config = []
-    recording_config = []
-    block_mapping = {'__CAMERA__': camera_config,
-                     '__IMAGE-SNAPSHOT__': image_snap_config,
-                     '__VIDEO-SNAPSHOT__': video_snap_config,
-                     '__PERSISTENT-RECORDING__': recording_config}
+    block_mapping = {'__CAMERA__': [],
+                     '__IMAGE-SNAPSHOT__': [],
+                     '__VIDEO-SNAPSHOT__': [],
+                     '__PERSISTENT-RECORDING__': [],
+                     '__WORKER__': [],
+                     '__WATCHDOG__': []}
     # open configuration file and parse it out
     with open(config_file, 'r') as f:
         current_block = None
@@ -153,6 +375,72 @@ def parse_config_file(config_file):
         # add the last block of the file (if it's non-empty)
         if block_destination is not None and len(current_block) > 0:
             block_destination.append(current_block)
+    return block_mapping
+
+
+def get_rtspsrc_properties(camera_config):
+    """
+    Translates the optional RTSP transport and jitter buffer keys of a camera configuration block into rtspsrc element
+        properties, checking each value. Keys (all optional, rtspsrc defaults apply when absent):
+        rtsp_protocols ('tcp', 'udp', 'udp-mcast', 'http', or several joined with '+'), rtsp_latency (milliseconds),
+        rtsp_buffer_mode ('none', 'slave', 'buffer', 'auto', 'synced'), rtsp_drop_on_latency ('true'/'false'),
+        rtsp_multicast_interface (network interface name, for multicast), rtsp_udp_buffer_size (bytes),
+        rtsp_timeout (seconds without UDP data before retrying with TCP), rtsp_tcp_timeout (seconds).
+    :param camera_config: dictionary of one camera's configuration block
+    :return: OrderedDict of {rtspsrc property: value string}, in a fixed order
+    """
+    cam_name = camera_config.get('name')
+    properties = OrderedDict()
+    try:
+        if 'rtsp_protocols' in camera_config:
+            protocols = [pr.strip().lower() for pr in camera_config['rtsp_protocols'].split('+')]
+            if any([pr not in ('tcp', 'udp', 'udp-mcast', 'http') for pr in protocols]):
+                raise ValueError("unknown protocol in {}".format(camera_config['rtsp_protocols']))
+            properties['protocols'] = '+'.join(protocols)
+        if 'rtsp_latency' in camera_config:
+            latency = int(camera_config['rtsp_latency'])
+            if latency < 0:
+                raise ValueError("negative latency")
+            properties['latency'] = str(latency)
+        if 'rtsp_buffer_mode' in camera_config:
+            buffer_mode = camera_config['rtsp_buffer_mode'].lower()
+            if buffer_mode not in ('none', 'slave', 'buffer', 'auto', 'synced'):
+                raise ValueError("unknown buffer mode {}".format(buffer_mode))
+            properties['buffer-mode'] = buffer_mode
+        if 'rtsp_drop_on_latency' in camera_config:
+            drop_on_latency = camera_config['rtsp_drop_on_latency'].lower()
+            if drop_on_latency not in ('true', 'false'):
+                raise ValueError("rtsp_drop_on_latency must be 'true' or 'false'")
+            properties['drop-on-latency'] = drop_on_latency
+        if 'rtsp_multicast_interface' in camera_config:
+            properties['multicast-iface'] = camera_config['rtsp_multicast_interface']
+        if 'rtsp_udp_buffer_size' in camera_config:
+            properties['udp-buffer-size'] = str(int(camera_config['rtsp_udp_buffer_size']))
+        # rtspsrc timeouts are in microseconds
+        if 'rtsp_timeout' in camera_config:
+            properties['timeout'] = str(int(float(camera_config['rtsp_timeout']) * 1e6))
+        if 'rtsp_tcp_timeout' in camera_config:
+            properties['tcp-timeout'] = str(int(float(camera_config['rtsp_tcp_timeout']) * 1e6))
+    except ValueError as e:
+        raise AttributeError("Invalid RTSP setting for camera {}: {}".format(cam_name, e))
+    return properties
+
+
+def parse_config_file(config_file):
+    """
+    Parses an entire session configuration file into sections (in this order): cameras, image snapshot, video snapshot,
+        and recording. Worker blocks are parsed separately by `parse_worker_config()`.
+    :param config_file: path to configuration file
+    :return: configuration dictionaries of key-value pairs; list of dicts for cameras section, single dict for others.
+    """
+    blocks = _parse_config_blocks(config_file)
+    camera_config = blocks['__CAMERA__']
+    image_snap_config = blocks['__IMAGE-SNAPSHOT__']
+    video_snap_config = blocks['__VIDEO-SNAPSHOT__']
+    recording_config = blocks['__PERSISTENT-RECORDING__']
+    # check RTSP transport settings now, rather than at pipeline construction
+    for single_camera_config in camera_config:
+        get_rtspsrc_properties(single_camera_config)
 
     # check number of configuration blocks for these configs
     if len(image_snap_config) > 1:
@@ -172,6 +460,118 @@ def parse_config_file(config_file):
     return camera_config, image_snap_config, video_snap_config, recording_config
 
 
+def parse_worker_config(config_file):
+    """
+    Parses the __WORKER__ blocks of a session configuration file, each describing a GStreamer Daemon instance that
+        serves a share of the cameras. If there are no worker blocks, a single local worker is implied, which the
+        session launches itself (the original single-host behavior). Defaults are filled in for optional keys. A worker
+        with `instances==K` is expanded into K workers named '<name>-<k>' on consecutive ports starting at `port`.
+    :param config_file: path to configuration file
+    :return: list of worker configuration dictionaries, in listed order
+    """
+    worker_config = _parse_config_blocks(config_file)['__WORKER__']
+    if len(worker_config) == 0:
+        return [{'name': DEFAULT_LOCAL_WORKER_NAME, 'address': DEFAULT_GSTD_ADDRESS, 'port': str(DEFAULT_GSTD_PORT),
+                 'launch': 'true'}]
+    expanded_config = []
+    for i, wc in enumerate(worker_config):
+        wc.setdefault('name', 'worker{}'.format(i))
+        wc.setdefault('address', DEFAULT_GSTD_ADDRESS)
+        wc.setdefault('port', str(DEFAULT_GSTD_PORT))
+        wc.setdefault('launch', 'false')
+        # a worker with K instances stands for K daemons on consecutive ports, each serving its own camera group
+        num_instances = int(wc.pop('instances', 1))
+        if num_instances < 1:
+            raise AttributeError("Worker {} needs at least one instance.".format(wc['name']))
+        if num_instances == 1:
+            expanded_config.append(wc)
+            continue
+        for k in range(num_instances):
+            instance_config = dict(wc)
+            instance_config['name'] = '{}-{}'.format(wc['name'], k)
+            instance_config['port'] = str(int(wc['port']) + k)
+            if 'capacity' in wc:
+                # capacity is declared for the worker as a whole; split it across instances
+                instance_config['capacity'] = str(int(wc['capacity']) // num_instances +
+                                                  (1 if k < int(wc['capacity']) % num_instances else 0))
+            expanded_config.append(instance_config)
+    names = set()
+    for wc in expanded_config:
+        if wc['name'] in names:
+            raise AttributeError("Worker name collision. Check configuration file.")
+        names.add(wc['name'])
+    return expanded_config
+
+
+def parse_watchdog_config(config_file):
+    """
+    Parses the __WATCHDOG__ block of a session configuration file, which enables and tunes the camera stall watchdog.
+    :param config_file: path to configuration file
+    :return: dictionary of key-value pairs (strings); empty if there is no watchdog block
+    """
+    watchdog_config = _parse_config_blocks(config_file)['__WATCHDOG__']
+    if len(watchdog_config) > 1:
+        raise AttributeError("More than one configuration block found for __WATCHDOG__.")
+    return watchdog_config[0] if len(watchdog_config) == 1 else {}
+
+
+def partition_cameras(camera_configs, worker_configs):
+    """
+    Partitions cameras across workers (GStreamer Daemon instances). A camera can be pinned to a worker with the
+        camera-level `worker` key. If every worker declares a `capacity` (number of cameras), the remaining cameras
+        go to the worker with the lowest fraction of its capacity used; otherwise they are dealt round-robin.
+    :param camera_configs: list of camera configuration dictionaries
+    :param worker_configs: list of worker configuration dictionaries (see `parse_worker_config()`)
+    :return: dictionary of {camera_name: worker_name}, in camera order
+    """
+    worker_names = [wc['name'] for wc in worker_configs]
+    load = {wn: 0 for wn in worker_names}
+    for cc in camera_configs:
+        if 'worker' in cc:
+            if cc['worker'] not in load:
+                raise AttributeError("Camera {} pinned to worker {}, which is not configured.".format(
+                    cc['name'], cc['worker']))
+            load[cc['worker']] += 1
+    by_capacity = all(['capacity' in wc for wc in worker_configs])
+    if by_capacity:
+        capacity = {wc['name']: int(wc['capacity']) for wc in worker_configs}
+        if sum(capacity.values()) < len(camera_configs):
+            raise AttributeError("Total worker capacity ({}) is less than the number of cameras ({}).".format(
+                sum(capacity.values()), len(camera_configs)))
+    partition = OrderedDict()
+    rr = 0
+    for cc in camera_configs:
+        if 'worker' in cc:
+            partition[cc['name']] = cc['worker']
+            continue
+        if by_capacity:
+            open_workers = [wn for wn in worker_names if load[wn] < capacity[wn]]
+            if len(open_workers) == 0:
+                raise AttributeError("Pinned cameras exceed worker capacity.")
+            # ties go to the worker listed first
+            wn = min(open_workers, key=lambda w: load[w] / capacity[w])
+        else:
+            wn = worker_names[rr % len(worker_names)]
+            rr += 1
+        partition[cc['name']] = wn
+        load[wn] += 1
+    return partition
+
+
+def get_session_manifest(session_directory):
+    """
+    Loads the session manifest, which merges the layout of every camera in the session (worker, storage, recording
+        location) into one logical session, regardless of how many hosts or daemons served the cameras.
+    :param session_directory: top level directory of video ingest session
+    :return: manifest dictionary, or None if the session has no manifest (sessions before manifests were written)
+    """
+    manifest_filename = os.path.join(session_directory, DEFAULT_SESSION_MANIFEST_FILENAME)
+    if not os.path.exists(manifest_filename):
+        return None
+    with open(manifest_filename, 'r') as f:
+        return json.load(f)
+
+
 def get_session_start_time_local(session_info_filename):
     """
     Finds the local time at which the session was started, according to the _SESSION_INFO.txt file.
@@ -223,6 +623,113 @@ def get_session_number(session_info_filename=None):
     return int(sn)
 
 
+def get_session_storage_assignment(session_info_filename):
+    """
+    Finds the storage root assigned to each camera for persistent recording, according to the _SESSION_INFO.txt file.
+        Only sessions with multiple storage roots configured (`storage_roots`) record these assignments.
+    :param session_info_filename: path to session info filename
+    :return: dictionary of {camera_name: storage_root}; empty if no storage roots were assigned
+    """
+    prefix = "Recording storage root for "
+    separator = "-" * 50
+    assignment = {}
+    with open(session_info_filename, 'r') as f:
+        for line in f:
+            if line.startswith(prefix):
+                cam_name, root = line[len(prefix):].split(': ', 1)
+                root = root.strip()
+                # earlier sessions wrote the closing separator on the same line as the last camera's root
+                if root.endswith(separator):
+                    root = root[:-len(separator)]
+                assignment[cam_name] = root
+    return assignment
+
+
+def assign_storage_roots(camera_configs, storage_roots, method=DEFAULT_STORAGE_ASSIGNMENT):
+    """
+    Places each camera's persistent recording on one of the given storage roots, so that segment writes are spread
+        across disks. A camera can be pinned to a root with the camera-level `storage_root` key; pinned cameras are
+        placed first and count toward the load of their root. The remaining cameras are placed in listed order, either
+        'round-robin' or 'balanced' (root with the most free space per camera writing to it, which assumes each camera
+        writes at parameters.ESTIMATED_CAMERA_BITRATE).
+    :param camera_configs: list of camera configuration dictionaries
+    :param storage_roots: list of storage root directories
+    :param method: 'round-robin' or 'balanced'
+    :return: dictionary of {camera_name: storage_root}, in camera order
+    """
+    if len(storage_roots) == 0:
+        raise AttributeError("Need at least one storage root to assign camera recordings.")
+    if method not in ('round-robin', 'balanced'):
+        raise AttributeError("Unknown storage assignment method '{}'; use 'round-robin' or 'balanced'.".format(method))
+    load = {root: 0 for root in storage_roots}
+    pinned = {}
+    for cc in camera_configs:
+        if 'storage_root' in cc:
+            if cc['storage_root'] not in load:
+                raise AttributeError("Camera {} pinned to storage root {}, which is not in `storage_roots`.".format(
+                    cc['name'], cc['storage_root']))
+            pinned[cc['name']] = cc['storage_root']
+            load[cc['storage_root']] += 1
+    free = {}
+    if method == 'balanced':
+        for root in storage_roots:
+            free[root] = shutil.disk_usage(root).free
+    assignment = OrderedDict()
+    rr = 0
+    for cc in camera_configs:
+        cam_name = cc['name']
+        if cam_name in pinned:
+            assignment[cam_name] = pinned[cam_name]
+            continue
+        if method == 'round-robin':
+            root = storage_roots[rr % len(storage_roots)]
+            rr += 1
+        else:
+            # ties go to the root listed first
+            root = max(storage_roots, key=lambda r: free[r] / (load[r] + 1))
+        assignment[cam_name] = root
+        load[root] += 1
+    return assignment
+
+
+def resolve_recording_directory(file_dir, session_directory, session_number, storage_root=None):
+    """
+    Converts the directory portion of the recording filename template to an absolute directory. Relative directories
+        (starting with './') are placed inside the session directory, or inside a session directory of the same name
+        under the storage root, if the camera was assigned one. Absolute directories are left as-is.
+    :param file_dir: directory portion of the recording filename template (may contain formatters)
+    :param session_directory: absolute directory of the video ingest session
+    :param session_number: session number, used for naming the session directory on a storage root
+    :param storage_root: (optional) storage root assigned to the camera
+    :return: absolute directory (formatters not filled in)
+    """
+    if not file_dir.startswith('./'):
+        return file_dir
+    if storage_root is None:
+        return os.path.join(session_directory, file_dir[2:])
+    return os.path.join(storage_root, DEFAULT_SESSION_DIRECTORY_FORMAT.format(session_number), file_dir[2:])
+
+
+def resolve_manifest_directory(directory, manifest_session_directory, session_directory):
+    """
+    Resolves a recording directory from a session manifest against where the session directory is now. Relative
+        directories are relative to the session directory; absolute directories inside the session directory the
+        manifest was written for are moved along with it; others (e.g., storage roots) are kept as written.
+    :param directory: recording directory from the manifest
+    :param manifest_session_directory: session directory recorded in the manifest (None if not recorded)
+    :param session_directory: current session directory
+    :return: recording directory
+    """
+    if not os.path.isabs(directory):
+        return os.path.join(session_directory, directory)
+    if manifest_session_directory is not None:
+        manifest_session_directory = manifest_session_directory.rstrip(os.sep)
+        if directory == manifest_session_directory or directory.startswith(manifest_session_directory + os.sep):
+            return os.path.normpath(os.path.join(session_directory,
+                                                 os.path.relpath(directory, manifest_session_directory)))
+    return directory
+
+
 def get_recording_params(session_root_directory, session_number=None, camera_configs=None, recording_config=None,verbose = True):
     """
     Determine relevant parameters from video ingest session configuration: list of recording directories where video
@@ -230,7 +737,12 @@ def get_recording_params(session_root_directory, session_number=None, camera_con
         camera, might be the same), list of camera names. Note: length of all return lists = number of cameras.
         Providing configuration dictionaries as inputs is optional; if either is left as None, the the session
         configuration will be loaded and parsed automatically from _SESSION_CONFIG.config. Providing session_number is
-        also optional; it will be loaded from _SESSION_INFO.txt if not provided.
+        also optional; it will be loaded from _SESSION_INFO.txt if not provided. If recording was striped across
+        multiple storage roots, each camera's directory is on its assigned root (according to _SESSION_INFO.txt). If
+        configurations are not provided and the session has a manifest (_SESSION_MANIFEST.json) with every camera's
+        recording location (i.e., recording was enabled), the merged layout in the manifest is used, with directories
+        inside the session directory re-based on `session_root_directory` (see resolve_manifest_directory), so that
+        sessions moved after recording still resolve.
     :param session_root_directory: directory of video ingest session, which contains automatic copy of config file
     :param session_number: (optional) session number corresponding to this directory
     :param camera_configs: (optional) list of camera configuration dictionaries (used to get camera names)
@@ -239,6 +751,17 @@ def get_recording_params(session_root_directory, session_number=None, camera_con
     :return: list of recording directories for each camera, file name format for each camera, list of camera names
     """
     if camera_configs is None or recording_config is None:
+        manifest = get_session_manifest(session_root_directory)
+        if manifest is not None and all(['recording_directory' in manifest['cameras'][cn]
+                                         for cn in manifest['camera_order']]):
+            if verbose: print("Loading session manifest instead of using configuration input arguments.")
+            cameras = manifest['cameras']
+            return ([resolve_manifest_directory(directory=cameras[cn]['recording_directory'],
+                                                manifest_session_directory=manifest.get('session_directory'),
+                                                session_directory=session_root_directory)
+                     for cn in manifest['camera_order']],
+                    [cameras[cn]['recording_filename'] for cn in manifest['camera_order']],
+                    list(manifest['camera_order']))
         if verbose: print("Loading configuration file instead of using configuration input arguments.")
         camera_configs, _, _, recording_config = parse_config_file(
             config_file=os.path.join(session_root_directory, "_SESSION_CONFIG.config"))
@@ -258,18 +781,60 @@ def get_recording_params(session_root_directory, session_number=None, camera_con
     #("File template name: {}".format(file_name))
     #print("File location: {}".format(file_location))
     
-    # check if it's a relative file path, and if so change it to absolute using session_root_directory
-    if file_dir.startswith('./'):
-        file_dir = os.path.join(session_root_directory, file_dir[2:])
+    # recordings may be striped across multiple storage roots; if so, the assignment was written to the info file
+    storage_assignment = {}
+    if 'storage_roots' in recording_config:
+        storage_assignment = get_session_storage_assignment(
+            session_info_filename=os.path.join(session_root_directory, DEFAULT_SESSION_INFO_FILENAME))
+    # check if it's a relative file path, and if so change it to absolute using session_root_directory/storage root
     # put session number and camera name in directory or filename, if indicated
-    rec_dirs = [file_dir.format(cam_name=cam_name, session_num=session_number) for cam_name in cam_names]
-    file_names = [file_name.format(cam_name=cam_name, session_num=session_number) for cam_name in cam_names]
+    rec_dirs = [resolve_recording_directory(file_dir=file_dir, session_directory=session_root_directory,
+                                            session_number=session_number,
+                                            storage_root=storage_assignment.get(cam_name)).format(
+                    cam_name=cam_name, session_num=session_number) for cam_name in cam_names]
+    # '{segment_start}' stays a placeholder; it differs per segment (see get_segment_start_time)
+    file_names = [file_name.format(cam_name=cam_name, session_num=session_number, segment_start='{segment_start}')
+                  for cam_name in cam_names]
     # list of recording directories corresponding to each camera (might all be the same if not delineated by camera)
     # list of file names corresponding to each camera (might all be the same if not delineated by camera)
     # list of camera names
     return rec_dirs, file_names, cam_names
 
 
+def recording_file_regex(file_name_format):
+    """
+    :param file_name_format: recording file name format (as from get_recording_params), with '%d' or '%0Nd' for the
+        segment number and optionally '{segment_start}' for the segment start time
+    :return: regular expression for matching file names, with groups 'segment' and (if present) 'segment_start'
+    """
+    file_name_regex = re.sub('%(0[0-9]{1})*d', '(?P<segment>[0-9]+)', file_name_format)
+    return file_name_regex.replace('{segment_start}', '(?P<segment_start>[0-9]+)')
+
+
+def session_directory_regex(directory_format=DEFAULT_SESSION_DIRECTORY_FORMAT):
+    """
+    :param directory_format: session directory name format, with one '{}'-style field for the session number
+    :return: regular expression matching whole session directory names, with group 'session' for the session number
+    """
+    prefix, _, rest = directory_format.partition('{')
+    suffix = rest.partition('}')[2]
+    return '^' + re.escape(prefix) + '(?P<session>[0-9]+)' + re.escape(suffix) + '$'
+
+
+def get_segment_start_time(file_name_format, filename):
+    """
+    Reads the segment start time from a recording file name, for recordings with aligned segment rollover
+        (`aligned_rollover==true`), whose file name formats contain '{segment_start}'.
+    :param file_name_format: recording file name format (as from get_recording_params)
+    :param filename: recording file name
+    :return: segment start time (UNIX seconds), or None if the file name doesn't carry one
+    """
+    rem = re.search(recording_file_regex(file_name_format), filename)
+    if rem is None or 'segment_start' not in rem.groupdict():
+        return None
+    return int(rem.group('segment_start'))
+
+
 def find_files(recording_directories, file_name_formats, camera_names, drop_last_file=False, first_file_index=0,
                filter_filenames=None, verbose = True):
     """
@@ -287,7 +852,7 @@ def find_files(recording_directories, file_name_formats, camera_names, drop_last
     :param verbose: bool - allow or supress function print statements
     :return: list of tuples of form (file directory, filename, segment_number, camera_name) for matching recordings
     """
-    file_name_regexs = [re.sub('%(0[0-9]{1})*d', '([0-9]+)', fnf) for fnf in file_name_formats]
+    file_name_regexs = [recording_file_regex(fnf) for fnf in file_name_formats]
     match_files = []
     for cn, rdir, fnr in zip(camera_names, recording_directories, file_name_regexs):
         directory_files = os.listdir(rdir)
@@ -296,8 +861,8 @@ def find_files(recording_directories, file_name_formats, camera_names, drop_last
         for fl in directory_files:
             rem = re.search(fnr, fl)
             if rem is not None:
-                # extract the first group match, which contains the segment index
-                remi = int(rem.group(1))
+                # extract the group match that contains the segment index
+                remi = int(rem.group('segment'))
                 if remi >= first_file_index:
                     cam_files.append((rdir, fl, remi, cn))
         # sort files by segment index and drop the last one, if requested, while adding to all matches